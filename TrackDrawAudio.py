@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audio playback for TrackDraw 2016.
+
+Player plays waveforms through a sounddevice output stream. Samples are read
+by the stream's callback straight from a view of the waveform being played,
+so starting playback never copies or normalizes the whole signal and the Qt
+event loop keeps running while the sound plays. The callback keeps track of
+the current sample position, which the GUI polls to draw a playhead.
+
+WavWriter and writeWav() export waveforms as WAV files in chunks, from an
+array or from any iterable of blocks such as synth.synthesize_stream(), so
+a long render is encoded while it is produced. Neither uses Qt, so they can
+be used from scripts and batch jobs as well.
+"""
+
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+
+
+class Player:
+    """
+    Non-blocking player for waveforms held in memory.
+
+    Attributes:
+        stream (sounddevice.OutputStream) -- currently open stream, or None.
+        fs (int) -- sampling rate of the sound being played.
+        start (int) -- index in the full waveform of the first sample played.
+        stop_ind (int) -- index in the full waveform after the last sample
+            played.
+        nsamples (int) -- number of samples in the full waveform.
+
+    Only one sound plays at a time. Calling play() while a sound is playing
+    stops the old sound immediately and starts the new one.
+    """
+    def __init__(self):
+        self.stream = None
+        self.fs = None
+        self.start = 0
+        self.stop_ind = 0
+        self.nsamples = 0
+        self._view = None
+        self._gain = 1.0
+        self._pos = 0
+        self._lock = threading.Lock()
+        self._CallbackStop = None
+
+    def play(self, waveform, fs, start=0, stop=None, gain=1.0):
+        """
+        Starts playing a waveform, or part of it.
+
+        Arguments:
+            waveform (np.array) -- signal to be played, (nsamples,) or
+                (nsamples, nchannels).
+            fs (int) -- sampling rate in Hz.
+            start (int) -- first sample to be played.
+            stop (int) -- sample after the last one to be played, defaults to
+                the end of the waveform.
+            gain (float) -- linear gain applied while playing, e.g. to
+                normalize the waveform without copying it.
+        """
+        import sounddevice as sd
+        self.stop()
+        waveform = np.asarray(waveform)
+        if stop is None:
+            stop = len(waveform)
+        start = max(0, min(int(start), len(waveform)))
+        stop = max(start, min(int(stop), len(waveform)))
+        with self._lock:
+            self._view = waveform[start:stop]
+            self._gain = gain
+            self._pos = 0
+        self.fs = fs
+        self.start = start
+        self.stop_ind = stop
+        self.nsamples = len(waveform)
+        self._CallbackStop = sd.CallbackStop
+        nchannels = 1 if waveform.ndim == 1 else waveform.shape[1]
+        self.stream = sd.OutputStream(samplerate=fs, channels=nchannels,
+                                      dtype="float32",
+                                      callback=self._callback)
+        self.stream.start()
+
+    def stop(self):
+        """ Stops playback immediately, discarding any buffered audio. """
+        stream = self.stream
+        self.stream = None
+        if stream is not None:
+            stream.abort()
+            stream.close()
+
+    @property
+    def active(self):
+        """ True while a sound is playing. """
+        return(self.stream is not None and self.stream.active)
+
+    @property
+    def position(self):
+        """ Index in the full waveform of the next sample to be played. """
+        with self._lock:
+            return(self.start + self._pos)
+
+    def _callback(self, outdata, frames, time, status):
+        """ Called by sounddevice from its audio thread for every block. """
+        with self._lock:
+            chunk = self._view[self._pos:self._pos + frames]
+            n = len(chunk)
+            if chunk.ndim == 1:
+                np.multiply(chunk, self._gain, out=outdata[0:n, 0],
+                            casting="unsafe")
+            else:
+                np.multiply(chunk, self._gain, out=outdata[0:n],
+                            casting="unsafe")
+            outdata[n:] = 0
+            self._pos = self._pos + n
+        if n < frames:
+            raise self._CallbackStop()
+
+
+##### WAV export #####
+# Sample formats: (WAVE format tag, bytes per sample)
+SAMPLE_FORMATS = {"int16": (1, 2),
+                  "int24": (1, 3),
+                  "float32": (3, 4)}
+
+
+class WavWriter:
+    """
+    Writes a WAV file chunk by chunk.
+
+    Arguments:
+        path (str) -- file to be written.
+        fs (int) -- sampling rate in Hz.
+        nchannels (int) -- number of channels.
+        sample_format (str) -- "int16", "int24" or "float32".
+        gain (float) -- linear gain applied to every sample. Integer formats
+            clip samples outside [-1, 1) after the gain.
+
+    The header is written with placeholder sizes which close() fills in, so
+    the length of the sound doesn't have to be known in advance. Can be used
+    as a context manager.
+
+    Attributes:
+        nsamples (int) -- number of samples (frames) written so far.
+        nbytes (int) -- number of bytes of sample data written so far.
+    """
+    def __init__(self, path, fs, nchannels=1, sample_format="int16",
+                 gain=1.0):
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError("Unknown sample format: " + str(sample_format))
+        self.fs = int(fs)
+        self.nchannels = nchannels
+        self.sample_format = sample_format
+        self.gain = gain
+        self.nsamples = 0
+        self.nbytes = 0
+        self.file = open(path, "wb")
+        self.writeHeader()
+
+    def writeHeader(self):
+        tag, width = SAMPLE_FORMATS[self.sample_format]
+        block_align = self.nchannels*width
+        fmt = struct.pack("<HHIIHH", tag, self.nchannels, self.fs,
+                          self.fs*block_align, block_align, 8*width)
+        header = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        if tag != 1:
+            # Non-PCM formats need a fact chunk with the number of frames
+            header = header + b"fact" + struct.pack("<II", 4, self.nsamples)
+        riff_size = 4 + len(header) + 8 + self.nbytes + self.nbytes % 2
+        self.file.seek(0)
+        self.file.write(b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+                        + header + b"data" + struct.pack("<I", self.nbytes))
+
+    def encode(self, chunk):
+        """ Returns the bytes of a chunk of float samples. """
+        chunk = np.asarray(chunk)
+        if self.gain != 1:
+            chunk = chunk*self.gain
+        if self.sample_format == "float32":
+            return(np.asarray(chunk, dtype="<f4").tobytes())
+        if self.sample_format == "int16":
+            scaled = np.clip(np.round(chunk*2**15), -2**15, 2**15 - 1)
+            return(scaled.astype("<i2").tobytes())
+        scaled = np.clip(np.round(chunk*2**23), -2**23, 2**23 - 1)
+        # Lowest three bytes of each little-endian int32
+        packed = scaled.astype("<i4").reshape(-1, 1).view(np.uint8)
+        return(packed[:, 0:3].tobytes())
+
+    def write(self, chunk):
+        """
+        Appends samples.
+
+        Arguments:
+            chunk (np.array) -- (n,) or (n, nchannels) float samples.
+        """
+        data = self.encode(chunk)
+        self.file.write(data)
+        self.nsamples = self.nsamples + len(chunk)
+        self.nbytes = self.nbytes + len(data)
+
+    def close(self):
+        """ Fills in the sizes in the header and closes the file. """
+        if self.file is None:
+            return
+        if self.nbytes % 2:
+            self.file.write(b"\0")
+        self.writeHeader()
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def writeWav(path, source, fs, nchannels=1, sample_format="int16",
+             normalize=False, peak=None, level=0.99, chunk_size=65536,
+             progress=None):
+    """
+    Exports a waveform or a stream of blocks as a WAV file.
+
+    Arguments:
+        path (str) -- file to be written.
+        source (np.array or iterable) -- the whole waveform, or an iterable
+            of blocks of it, e.g. synth.synthesize_stream().
+        fs (int) -- sampling rate in Hz.
+        nchannels (int) -- number of channels.
+        sample_format (str) -- see WavWriter.
+        normalize (boolean) -- if True, the sound is scaled so that its peak
+            is at level.
+        peak (float) -- peak of the sound if already known, e.g. from
+            TrackDrawData.Sound.peak.
+        level (float) -- peak level after normalization, 1 being full scale.
+        chunk_size (int) -- number of samples encoded at a time.
+        progress (function) -- called as progress(nsamples) after every
+            chunk written. If it returns False, the export stops early.
+
+    A waveform is encoded chunk by chunk, so only one encoded chunk is held
+    in memory besides it. Blocks from a stream are encoded as they arrive,
+    unless the stream is to be normalized without a known peak: since the
+    gain can't be known before the last block, the blocks are then spooled
+    to a temporary file as float32 first and encoded from there.
+
+    Returns a dict with the number of samples, bytes, seconds of audio and
+    seconds taken, and the throughput in MB/s and as a multiple of real
+    time, for reporting on large exports.
+    """
+    start = time.perf_counter()
+    spool = None
+    if isinstance(source, np.ndarray):
+        if normalize and peak is None:
+            peak = float(np.max(np.abs(source))) if len(source) else 0.0
+        chunks = (source[i:i + chunk_size]
+                  for i in range(0, len(source), chunk_size))
+    elif normalize and peak is None:
+        spool = tempfile.TemporaryFile()
+        peak = 0.0
+        for block in source:
+            block = np.asarray(block, dtype=np.float32)
+            if len(block):
+                peak = max(peak, float(np.max(np.abs(block))))
+            spool.write(block.tobytes())
+        chunks = _readSpool(spool, nchannels, chunk_size)
+    else:
+        chunks = source
+    gain = 1.0
+    if normalize and peak:
+        gain = level/peak
+    try:
+        with WavWriter(path, fs, nchannels, sample_format, gain) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+                if progress is not None:
+                    if progress(writer.nsamples) is False:
+                        break
+    finally:
+        if spool is not None:
+            spool.close()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    seconds = writer.nsamples/fs
+    return({"nsamples": writer.nsamples,
+            "nbytes": writer.nbytes,
+            "seconds": seconds,
+            "elapsed": elapsed,
+            "mb_per_s": writer.nbytes/elapsed/1e6,
+            "realtime": seconds/elapsed})
+
+def _readSpool(spool, nchannels, chunk_size):
+    """ Yields chunks of float32 samples back from a spool file. """
+    spool.seek(0)
+    nbytes = 4*nchannels*chunk_size
+    while True:
+        data = spool.read(nbytes)
+        if not data:
+            return
+        chunk = np.frombuffer(data, dtype=np.float32)
+        if nchannels > 1:
+            chunk = chunk.reshape(-1, nchannels)
+        yield(chunk)
+##### End WAV export #####
@@ -7,8 +7,10 @@ version: 0.1.0
 """
 
 
+import bisect
+import copy
+import hashlib
 import numpy as np
-import matplotlib.mlab as mlab
 
 class Sound:
     """
@@ -18,22 +20,44 @@ class Sound:
         fs (int) -- sample rate in Hz.
         waveform (np.array) -- signal of the sound.
         nchannels (int) -- number of channels in the sound file.
+        dtype (np.dtype) -- type the waveform is stored as.
+        source (np.array) -- optional samples of the file the sound was read
+            from, usually a read-only np.memmap, before any resampling.
+        source_fs (int) -- sample rate of source in Hz.
 
     Attributes:
         fs -- see above
         waveform -- see above
         nchannels -- see above
+        source -- see above
+        source_fs -- see above
         nsamples (int) -- number of samples in signal.
         dur (float) -- length of signal in seconds.
+        mono (np.array) -- the waveform averaged over channels.
+        peak (float) -- largest absolute sample value.
+        rms (float) -- root mean square of the mono signal.
+        normalized (np.array) -- mono signal scaled to a peak of 1.
 
     Used to store all the necessary elements to analyze or play back a sound.
     Only the sound's waveform and fs need to be provided, everything else
     is derived or has default values.
+
+    Derived values (mono, peak, rms, normalized, envelopes and anything
+    stored with analysis()) are computed the first time they are asked for
+    and cached until a new waveform is assigned. The waveform must not be
+    changed in place, or the cache goes stale; to discourage that, it is
+    stored read-only. Waveforms which already are read-only arrays of the
+    right type, such as memory-mapped project audio, are used without
+    copying, so their samples are only read once needed.
     """
-    def __init__(self, waveform, fs, nchannels=1):
+    def __init__(self, waveform, fs, nchannels=1, dtype=np.float32,
+                 source=None, source_fs=None):
         self.fs = fs
+        self.dtype = dtype
         self.waveform = waveform
         self.nchannels = nchannels
+        self.source = source
+        self.source_fs = fs if source_fs is None else source_fs
 
     @property
     def waveform(self):
@@ -41,40 +65,468 @@ class Sound:
     # Automatically update nsamples and dur whenever waveform changes
     @waveform.setter
     def waveform(self, val):
+        val = np.asarray(val, dtype=self.dtype)
+        if val.flags.writeable:
+            val = val.copy()
+            val.flags.writeable = False
         self._waveform = val
+        self._cache = {}
         self.nsamples = len(self._waveform)
         self.dur = self.nsamples/self.fs
 
+    def analysis(self, key, compute=None):
+        """
+        Returns a cached result derived from the waveform.
+
+        Arguments:
+            key (hashable) -- names the result, including any parameters it
+                depends on, e.g. ("specgram", window_len, noverlap,
+                window_type).
+            compute (function) -- called as compute(self) if the result is
+                not cached yet. If None, None is returned instead.
+        """
+        try:
+            return(self._cache[key])
+        except KeyError:
+            if compute is None:
+                return(None)
+        value = compute(self)
+        self._cache[key] = value
+        return(value)
+
+    def store(self, key, value):
+        """ Caches a result computed elsewhere, e.g. in a background job. """
+        self._cache[key] = value
+
+    @property
+    def mono(self):
+        return(self.analysis("mono", lambda sound: sound.waveform
+                             if sound.waveform.ndim == 1
+                             else np.mean(sound.waveform, axis=1,
+                                          dtype=sound.dtype)))
+
+    @property
+    def peak(self):
+        return(self.analysis("peak", lambda sound:
+                   float(np.max(np.abs(sound.waveform)))
+                   if sound.nsamples else 0.0))
+
+    @property
+    def rms(self):
+        return(self.analysis("rms", lambda sound:
+                   float(np.sqrt(np.mean(np.square(sound.mono,
+                                                   dtype=np.float64))))
+                   if sound.nsamples else 0.0))
+
+    @property
+    def normalized(self):
+        def normalize(sound):
+            peak = sound.peak
+            if peak == 0:
+                return(sound.mono)
+            out = (sound.mono*(1/peak)).astype(sound.dtype, copy=False)
+            out.flags.writeable = False
+            return(out)
+        return(self.analysis("normalized", normalize))
+
+    def envelope(self, n_bins):
+        """
+        Returns (lows, highs), the minimum and maximum of the mono signal in
+        each of n_bins equal slices, e.g. one per pixel column of a plot.
+        """
+        def compute(sound):
+            if sound.nsamples == 0:
+                return(sound.mono, sound.mono)
+            n_bins_used = max(1, min(n_bins, sound.nsamples))
+            bounds = np.linspace(0, sound.nsamples,
+                                 n_bins_used + 1).astype(int)[0:-1]
+            return(np.minimum.reduceat(sound.mono, bounds),
+                   np.maximum.reduceat(sound.mono, bounds))
+        return(self.analysis(("envelope", n_bins), compute))
+
 
 class Track:
     """
-    Class for organizing sequences of y coordinates.
+    A contour stored as sorted (time, value) breakpoints.
 
-    TODO -- flesh out this doc string.
+    Arguments:
+        values (list or np.array) -- values of the breakpoints.
+        times (list or np.array) -- times of the breakpoints as fractions of
+            the duration of the sound, from 0 to 1, sorted. If None, the
+            values are spread evenly from 0 to 1, as the points of a dense
+            track, and breakpoints which lie on the straight line between
+            their neighbours are left out.
+
+    Attributes:
+        times (list) -- see above.
+        values (list) -- see above.
+        version (int) -- incremented on every change, so that views of the
+            track can tell whether they are stale.
+
+    Between breakpoints the track is interpolated linearly, before the first
+    and after the last one it keeps their values. The track can be sampled
+    on a grid of any number of points with sample(), so its time resolution
+    isn't tied to the number of points shown, and it takes memory in
+    proportion to the detail edited into it rather than to its duration.
+    Breakpoints are found with bisect, so lookups and edits only take
+    O(log n) comparisons.
     """
-    def __init__(self, points):
-        self.points = points
+    __slots__ = ("times", "values", "version", "_sampled")
+
+    def __init__(self, values, times=None):
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        if times is None:
+            times = np.linspace(0, 1, len(values)) if len(values) > 1 \
+                    else np.zeros(1)
+            # Keep the ends and every point where the slope changes
+            keep = np.ones(len(values), dtype=bool)
+            keep[1:-1] = np.abs(np.diff(values, 2)) > 1e-9*max(
+                    1.0, np.max(np.abs(values)))
+            times, values = times[keep], values[keep]
+        self.times = [float(t) for t in times]
+        self.values = [float(v) for v in values]
+        self.version = 0
+        self._sampled = None
+
+    def __len__(self):
+        return(len(self.times))
+
+    def __copy__(self):
+        new = Track.__new__(Track)
+        new.times = list(self.times)
+        new.values = list(self.values)
+        new.version = 0
+        new._sampled = self._sampled
+        return(new)
+
+    def value(self, t):
+        """ Value of the track at time t. """
+        i = bisect.bisect_right(self.times, t)
+        if i == 0:
+            return(self.values[0])
+        if i == len(self.times):
+            return(self.values[-1])
+        t0, t1 = self.times[i - 1], self.times[i]
+        v0, v1 = self.values[i - 1], self.values[i]
+        return(v0 + (v1 - v0)*(t - t0)/(t1 - t0))
+
+    def insert(self, t, value):
+        """ Adds a breakpoint at time t, or moves the one already there. """
+        i = bisect.bisect_left(self.times, t)
+        if i < len(self.times) and self.times[i] == t:
+            self.values[i] = float(value)
+        else:
+            self.times.insert(i, float(t))
+            self.values.insert(i, float(value))
+        self.changed()
+
+    def breakpoints(self, t0, t1):
+        """ Returns the breakpoints from t0 to t1 as (times, values) lists. """
+        lo = bisect.bisect_left(self.times, t0)
+        hi = bisect.bisect_right(self.times, t1)
+        return((self.times[lo:hi], self.values[lo:hi]))
+
+    def replace(self, times, values, span=None):
+        """
+        Replaces all breakpoints in a span of time by new ones.
+
+        Arguments:
+            times (list or np.array) -- sorted times of the new breakpoints,
+                all within span. May be empty if span is given.
+            values (list or np.array) -- their values.
+            span (tuple) -- (t0, t1), the breakpoints from t0 to t1 are
+                replaced. Defaults to (times[0], times[-1]).
+
+        Returns the replaced breakpoints as (times, values) lists, so that
+        the change can be undone by passing them back with the same span.
+        """
+        if span is None:
+            span = (times[0], times[-1])
+        lo = bisect.bisect_left(self.times, span[0])
+        hi = bisect.bisect_right(self.times, span[1])
+        old = (self.times[lo:hi], self.values[lo:hi])
+        self.times[lo:hi] = [float(t) for t in times]
+        self.values[lo:hi] = [float(v) for v in values]
+        self.changed()
+        return(old)
+
+    def changed(self):
+        self.version = self.version + 1
+        self._sampled = None
+
+    def sample(self, npoints):
+        """
+        Returns the track sampled at npoints evenly spaced times from 0 to 1,
+        as a read-only np.array. The last result is cached.
+        """
+        if self._sampled is not None and len(self._sampled) == npoints:
+            return(self._sampled)
+        grid = np.linspace(0, 1, npoints) if npoints > 1 else np.zeros(1)
+        sampled = np.interp(grid, self.times, self.values)
+        sampled.flags.writeable = False
+        self._sampled = sampled
+        return(sampled)
+
+
+class TrackSet:
+    """
+    A set of tracks shown on a common grid of points.
+
+    Arguments:
+        points (np.array) -- (n_tracks, track_npoints) array, one row per
+            track, from which tracks with evenly spaced breakpoints are made.
+            Tracks are expected to be ordered from lowest to highest, as
+            formant tracks are.
+        tracks (list) -- Track objects to be used instead of points, as is.
+        track_npoints (int) -- number of grid points, needed with tracks.
+
+    Attributes:
+        tracks (list) -- the Track objects.
+        track_npoints -- see above.
+        points (np.array) -- (n_tracks, track_npoints) read-only array of the
+            tracks sampled on the grid, where column i lies at time
+            i/(track_npoints - 1). Only rows of tracks changed since the
+            last use are sampled again.
+
+    The tracks themselves are stored as breakpoints (see Track), the grid is
+    only the resolution at which they are shown and edited. Changing the
+    number of grid points therefore loses nothing. Edits go through
+    setPoints(), which only changes breakpoints around the edited columns,
+    and never writes to points.
+
+    Indexing a TrackSet with an integer returns the Track itself. Indexing
+    with a slice returns a TrackSet sharing the selected Track objects, and
+    Tracks can be replaced by assigning to an index or a slice.
+    """
+    def __init__(self, points=None, tracks=None, track_npoints=None):
+        if tracks is None:
+            points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+            tracks = [Track(row) for row in points]
+            track_npoints = points.shape[1]
+        self.tracks = list(tracks)
+        self.track_npoints = track_npoints
+        self._points = None
+        self._versions = None
+
+    @classmethod
+    def flat(cls, values, track_npoints):
+        """ Returns flat tracks, each a single breakpoint, at values. """
+        return(cls(tracks=[Track([value]) for value in values],
+                   track_npoints=track_npoints))
+
+    def __len__(self):
+        return(len(self.tracks))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return(TrackSet(tracks=self.tracks[index],
+                            track_npoints=self.track_npoints))
+        return(self.tracks[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self.tracks[index] = list(value.tracks)
+        else:
+            self.tracks[index] = value
+
+    def __iter__(self):
+        return(iter(self.tracks))
+
+    def copy(self):
+        """ Returns a TrackSet with copies of the tracks. """
+        return(TrackSet(tracks=[copy.copy(track) for track in self.tracks],
+                        track_npoints=self.track_npoints))
+
+    @property
+    def points(self):
+        versions = [(track, track.version) for track in self.tracks]
+        cached = self._points
+        if cached is not None and cached.shape == (len(self.tracks),
+                                                   self.track_npoints):
+            if versions == self._versions:
+                return(cached)
+            points = cached.copy()
+            for i, track in enumerate(self.tracks):
+                if versions[i] != self._versions[i]:
+                    points[i] = track.sample(self.track_npoints)
+        else:
+            points = np.empty([len(self.tracks), self.track_npoints])
+            for i, track in enumerate(self.tracks):
+                points[i] = track.sample(self.track_npoints)
+        points.flags.writeable = False
+        self._points = points
+        self._versions = versions
+        return(points)
+
+    def columnTimes(self, cols=slice(None)):
+        """ Times of grid columns as fractions of the duration. """
+        grid = np.linspace(0, 1, self.track_npoints) \
+               if self.track_npoints > 1 else np.zeros(1)
+        return(grid[cols])
+
+    def nearestColumn(self, x_loc):
+        """ Index of the column nearest to x_loc, in track coordinates. """
+        return(int(min(max(round(x_loc), 0), self.track_npoints - 1)))
+
+    def nearestTrack(self, col, y_loc):
+        """ Index of the track whose value at column col is nearest y_loc. """
+        return(int(np.abs(self.points[:, col] - y_loc).argmin()))
+
+    def setPoints(self, trackNo, cols, values, bubble_len=None):
+        """
+        Sets points of one track, optionally respecting track bubbles.
+
+        Arguments:
+            trackNo (int) -- index of the track to be changed.
+            cols (int, slice or np.array) -- columns to be changed.
+            values (float or np.array) -- new values for those columns.
+            bubble_len (float) -- if not None, new values are clipped so that
+                they stay at least bubble_len away from the neighbouring
+                tracks below and above.
+
+        Each run of neighbouring columns becomes breakpoints at the grid
+        times of those columns, replacing any breakpoints between the
+        columns just outside the run, which are pinned to their current
+        values. The grid values of columns not in cols are unchanged.
+
+        Returns a list with a (span, breakpoints) pair for every run, where
+        span is the (t0, t1) time span whose breakpoints were replaced, and
+        breakpoints the (times, values) lists of the replaced ones, in the
+        order the runs were replaced. See TrackDrawHistory.EditHistory.
+        """
+        cols = np.arange(self.track_npoints)[cols]
+        values = np.broadcast_to(np.asarray(values, dtype=np.float64),
+                                 np.shape(cols))
+        points = self.points
+        if bubble_len is not None:
+            if trackNo > 0:
+                values = np.maximum(values, points[trackNo - 1, cols]
+                                    + bubble_len)
+            if trackNo < len(self) - 1:
+                values = np.minimum(values, points[trackNo + 1, cols]
+                                    - bubble_len)
+        row = points[trackNo].copy()
+        row[cols] = values
+        edited = np.unique(np.atleast_1d(cols))
+        replaced = []
+        if len(edited):
+            track = self.tracks[trackNo]
+            times = self.columnTimes()
+            runs = np.split(edited, np.flatnonzero(np.diff(edited) > 1) + 1)
+            for run in runs:
+                lo = max(run[0] - 1, 0)
+                hi = min(run[-1] + 2, self.track_npoints)
+                span = (float(times[lo]), float(times[hi - 1]))
+                replaced.append((span, track.replace(times[lo:hi],
+                                                     row[lo:hi], span)))
+        return(replaced)
+
+    def enforceBubbles(self, bubble_len):
+        """
+        Pushes tracks apart so that neighbouring tracks are at least bubble_len
+        apart at every column, moving higher tracks up where necessary.
+        """
+        for i in range(1, len(self)):
+            below = self.points[i - 1] + bubble_len
+            cols = np.flatnonzero(self.points[i] < below)
+            if len(cols):
+                self.setPoints(i, cols, below[cols])
 
     def changeNoPoints(self, track_npoints):
-        if len(self.points) == track_npoints:
-            return
-        elif len(self.points) > track_npoints:
-            self.points = self.points[0:track_npoints]
-        elif len(self.points) < track_npoints:
-            final_value = self.points[-1]
-            vector_to_be_appended = np.ones([track_npoints-len(self.points)])*final_value
-            self.points = np.concatenate((self.points, vector_to_be_appended))
+        """
+        Changes the number of grid points of all tracks at once. The tracks
+        are only sampled differently, none of their breakpoints change.
+        """
+        self.track_npoints = track_npoints
+
+    def changeNoTracks(self, n_tracks, values):
+        """
+        Removes tracks from the top, or appends flat tracks.
+
+        Arguments:
+            n_tracks (int) -- new number of tracks.
+            values (list) -- values of appended tracks, indexed by track
+                number (e.g. the default formant frequencies).
+        """
+        n = len(self)
+        if n_tracks < n:
+            self.tracks = self.tracks[0:n_tracks]
+        elif n_tracks > n:
+            self.tracks = self.tracks + [Track([value])
+                                         for value in values[n:n_tracks]]
+
+    def matrix(self, n_tracks=None):
+        """
+        Returns a (track_npoints, n_tracks) view of the first n_tracks tracks
+        sampled on the grid, the layout the synthesizers expect for formant
+        tracks.
+        """
+        if n_tracks is None:
+            n_tracks = len(self)
+        return(self.points[0:n_tracks].T)
 
 
 class Parameters:
     """
     Contains parameters for TrackDraw 2016.
 
-    TODO -- flesh out this doc string.
+    Arguments:
+        Any of the fields listed in FIELDS, as keywords.
+
+    Every field is converted to its type when it is set, so e.g. a slider's
+    int can be assigned to a float field and a list to an array field:
+        int, float, bool, str -- converted with the built-in type.
+        "array" -- stored as a read-only float64 np.array.
+        "values" -- a single float, or a read-only float64 np.array for
+            values which vary over time (F0 during synthesis).
+        "window" -- the name of a numpy window function, e.g. "hamming". The
+            function itself may be assigned too, its name is stored.
+
+    Arrays are never changed in place, a new array has to be assigned
+    instead. Copies made with copy.copy(), copy.deepcopy() or replace() can
+    therefore share all their arrays, which makes them cheap enough to take
+    for every cache lookup or background job.
+
+    Attributes:
+        digest (str) -- hash of the contents, the same for Parameters with
+            equal fields, in any process. Used as a cache key.
     """
+    FIELDS = (("F0", "values"),
+              ("FF", "array"),
+              ("BW", "array"),
+              ("AV", int),
+              ("AVS", int),
+              ("AH", int),
+              ("AF", int),
+              ("resample_fs", int),
+              ("synth_fs", int),
+              ("track_npoints", int),
+              ("window_len", int),
+              ("window_type", "window"),
+              ("noverlap", float),
+              ("dur", float),
+              ("inc_ms", float),
+              ("ENV", "array"),
+              ("radiation", float),
+              ("synth_type", str),
+              ("glottal_model", str),
+              ("sine_mode", str),
+              ("nformant", int),
+              ("stft_size", int),
+              ("track_bubble", bool),
+              ("bubble_len", int),
+              ("threshold", float),
+              ("f0_min", float),
+              ("f0_max", float),
+              ("f0_threshold", float))
+    TYPES = dict(FIELDS)
+    WINDOW_TYPES = ("hamming", "hanning", "bartlett", "blackman")
+
+    __slots__ = tuple(name for name, _ in FIELDS) + ("_digest",)
+
     def __init__(self, F0=100,
-                       FF=[500, 1500, 2500, 3500, 4500],
-                       BW=np.array([50, 100, 100, 200, 250]),
+                       FF=(500, 1500, 2500, 3500, 4500),
+                       BW=(50, 100, 100, 200, 250),
                        AV=0,
                        AVS=0,
                        AH=0,
@@ -83,51 +535,182 @@ class Parameters:
                        synth_fs=10000,
                        track_npoints=80,
                        window_len=256,
-                       window_type=np.hamming,
+                       window_type="hamming",
                        noverlap=0.5,
                        dur=1,
                        inc_ms=5,
-                       ENV=np.array([0, 1, 1, 1, 0]),
+                       ENV=(0, 1, 1, 1, 0),
                        radiation=0,
                        synth_type="Klatt 1980",
+                       glottal_model="klatt",
+                       sine_mode="formant",
                        nformant=5,
                        stft_size=64,
                        track_bubble=False,
                        bubble_len=250,
-                       threshold=0):
-        self.F0 = F0
-        self.FF = FF
-        self.BW = BW
-        self.AV = AV
-        self.AVS = AVS
-        self.AH = AH
-        self.AF = AF
-        self.resample_fs = resample_fs
-        self.synth_fs = synth_fs
-        self.track_npoints = track_npoints
-        self.window_len = window_len
-        self.window_type = window_type
-        self.noverlap = noverlap
-        self.dur = dur
-        self.inc_ms = inc_ms
-        self.ENV = ENV
-        self.radiation = radiation
-        self.synth_type = synth_type
-        self.nformant = nformant
-        self.stft_size = stft_size
-        self.track_bubble = track_bubble
-        self.bubble_len = bubble_len
-        self.threshold = threshold
+                       threshold=0,
+                       f0_min=60,
+                       f0_max=400,
+                       f0_threshold=0.15):
+        values = locals()
+        for name, _ in self.FIELDS:
+            setattr(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        kind = self.TYPES.get(name)
+        if kind is None:
+            object.__setattr__(self, name, value)
+            return
+        if kind == "values" and np.ndim(value) == 0:
+            value = float(value)
+        elif kind in ("array", "values"):
+            value = readOnlyArray(value)
+        elif kind == "window":
+            value = getattr(value, "__name__", value)
+            if value not in self.WINDOW_TYPES:
+                raise ValueError("Unknown window type: " + str(value))
+        else:
+            value = kind(value)
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, "_digest", None)
 
+    def __copy__(self):
+        new = object.__new__(Parameters)
+        for name in self.__slots__:
+            object.__setattr__(new, name, getattr(self, name))
+        return(new)
 
-DEFAULT_PARAMS = Parameters()
-CURRENT_PARAMS = Parameters()
-LOADED_SOUND = Sound(np.zeros([1]), DEFAULT_PARAMS.resample_fs, 1)
-SYNTH_SOUND  = Sound(np.zeros([1]), DEFAULT_PARAMS.resample_fs, 1)
+    def __deepcopy__(self, memo):
+        # Arrays are read-only, so sharing them is as good as copying them
+        return(self.__copy__())
+
+    def __getstate__(self):
+        return({name: getattr(self, name) for name, _ in self.FIELDS})
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return("Parameters(" + ", ".join(name + "=" + repr(getattr(self, name))
+                                         for name, _ in self.FIELDS) + ")")
 
-npoints = DEFAULT_PARAMS.track_npoints
-F0 = DEFAULT_PARAMS.F0
-allFF = DEFAULT_PARAMS.FF
-F0_TRACK =  [Track(F0*np.ones([npoints]))]
-TRACKS   = [Track(FF*np.ones([npoints])) for FF in allFF]
+    def replace(self, **changes):
+        """ Returns a copy with the fields given as keywords changed. """
+        new = self.__copy__()
+        for name, value in changes.items():
+            if name not in self.TYPES:
+                raise AttributeError("Parameters has no field " + name)
+            setattr(new, name, value)
+        return(new)
+
+    def window(self, window_len=None):
+        """ Returns the window_type window of window_len samples. """
+        if window_len is None:
+            window_len = self.window_len
+        return(getattr(np, self.window_type)(window_len))
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            h = hashlib.blake2b(digest_size=16)
+            for name, _ in self.FIELDS:
+                value = getattr(self, name)
+                h.update(name.encode())
+                if isinstance(value, np.ndarray):
+                    h.update(str(value.shape).encode())
+                    h.update(np.ascontiguousarray(value).tobytes())
+                else:
+                    h.update(repr(value).encode())
+            object.__setattr__(self, "_digest", h.hexdigest())
+        return(self._digest)
+
+
+def readOnlyArray(value):
+    """
+    Returns value as a read-only float64 array.
 
+    Arrays which already are read-only float64 arrays are returned as they
+    are, anything else is copied.
+    """
+    if (isinstance(value, np.ndarray) and value.dtype == np.float64
+            and not value.flags.writeable):
+        return(value)
+    value = np.array(value, dtype=np.float64)
+    value.flags.writeable = False
+    return(value)
+
+
+class Snapshot:
+    """
+    Read-only copy of the state of a Session at one moment.
+
+    Arguments:
+        session (Session) -- session to be copied.
+
+    Attributes:
+        parms (Parameters) -- copy of the session's parameters.
+        tracks (TrackSet) -- copy of the formant tracks.
+        f0_track (TrackSet) -- copy of the F0 track.
+        loaded_sound (Sound) -- the loaded sound.
+        synth_sound (Sound) -- the most recently synthesized sound.
+
+    Snapshots are what background jobs read, so that the UI can keep editing
+    the session while they run. Tracks are copied, since they are small and
+    edited in place. Sounds are shared rather than copied, since a
+    Session never changes a Sound in place but replaces it. None of the
+    attributes can be reassigned.
+    """
+    __slots__ = ("parms", "tracks", "f0_track", "loaded_sound", "synth_sound")
+
+    def __init__(self, session):
+        object.__setattr__(self, "parms", copy.copy(session.parms))
+        object.__setattr__(self, "tracks", session.tracks.copy())
+        object.__setattr__(self, "f0_track", session.f0_track.copy())
+        object.__setattr__(self, "loaded_sound", session.loaded_sound)
+        object.__setattr__(self, "synth_sound", session.synth_sound)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot attributes can't be changed")
+
+
+class Session:
+    """
+    State of one TrackDraw document.
+
+    Arguments:
+        parms (Parameters) -- initial parameters, defaults to a copy of
+            DEFAULT_PARAMS.
+
+    Attributes:
+        parms (Parameters) -- current parameters.
+        tracks (TrackSet) -- formant tracks.
+        f0_track (TrackSet) -- F0 track, a TrackSet with a single track.
+        loaded_sound (Sound) -- sound loaded from a file.
+        synth_sound (Sound) -- most recently synthesized sound.
+
+    The UI edits a Session in place. Code running outside the GUI thread, or
+    anything else that needs a consistent view while editing goes on, works
+    on a Snapshot taken with snapshot() instead. Sounds are replaced, never
+    changed in place, so that snapshots can share them.
+    """
+    def __init__(self, parms=None):
+        if parms is None:
+            parms = copy.copy(DEFAULT_PARAMS)
+        self.parms = parms
+        self.loaded_sound = Sound(np.zeros([1]), parms.resample_fs, 1)
+        self.synth_sound = Sound(np.zeros([1]), parms.resample_fs, 1)
+        self.resetTracks()
+
+    def resetTracks(self):
+        """ Sets all tracks to flat tracks at the default frequencies. """
+        npoints = DEFAULT_PARAMS.track_npoints
+        self.f0_track = TrackSet.flat([DEFAULT_PARAMS.F0], npoints)
+        self.tracks = TrackSet.flat(DEFAULT_PARAMS.FF, npoints)
+
+    def snapshot(self):
+        """ Returns a Snapshot of the current state. """
+        return(Snapshot(self))
+
+
+DEFAULT_PARAMS = Parameters()
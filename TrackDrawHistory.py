@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Undo/redo history for track edits in TrackDraw 2016.
+
+Instead of snapshots of whole tracks, the history stores deltas: the track
+that changed, the span of time the change covers, and the breakpoints of the
+track within that span before and after the change. Undo and redo put back
+exactly those breakpoints, so they don't depend on the number of grid points
+the tracks were shown with, and detail edited at another resolution is kept.
+All the motion events of one mouse drag are merged into a single delta, so a
+drag costs one entry no matter how many events it produced, and the number
+of entries is capped, so memory use stays flat over long editing sessions.
+"""
+
+from collections import deque
+
+
+class Edit:
+    """
+    A change to the breakpoints of one track within a span of time.
+
+    Arguments:
+        target (str) -- which set of tracks was edited, "FF" or "F0".
+        trackNo (int) -- index of the edited track within that set.
+        span (tuple) -- (t0, t1), times bounding the change, inclusive.
+        breakpoints (list) -- [old, new], the breakpoints of the track from
+            t0 to t1 before and after the change, each as (times, values)
+            lists, see TrackDrawData.Track.breakpoints().
+    """
+    __slots__ = ("target", "trackNo", "span", "breakpoints")
+
+    def __init__(self, target, trackNo, span, breakpoints):
+        self.target = target
+        self.trackNo = trackNo
+        self.span = span
+        self.breakpoints = breakpoints
+
+    def apply(self, tracks, which):
+        """
+        Puts back the old (which=0) or new (which=1) breakpoints into a
+        TrackSet.
+
+        Returns False, leaving tracks untouched, if the edited track no
+        longer exists.
+        """
+        if self.trackNo >= len(tracks):
+            return(False)
+        times, values = self.breakpoints[which]
+        tracks[self.trackNo].replace(times, values, self.span)
+        return(True)
+
+
+class EditHistory:
+    """
+    Undo and redo stacks of track edits.
+
+    Arguments:
+        max_entries (int) -- maximum number of undoable entries. Older
+            entries are forgotten once this is reached.
+
+    Each entry on the stacks is a list of Edit objects which are undone and
+    redone together, e.g. one for a mouse drag, or one per track for an
+    operation that replaced several tracks at once.
+
+    While a drag is in progress, record() extends a pending entry, which is
+    pushed onto the undo stack by end().
+    """
+    def __init__(self, max_entries=500):
+        self.undoStack = deque(maxlen=max_entries)
+        self.redoStack = deque(maxlen=max_entries)
+        self.pending = None
+
+    def record(self, target, trackNo, track, replaced):
+        """
+        Records a change made by TrackSet.setPoints() during a drag.
+
+        Arguments:
+            target (str) -- "FF" or "F0".
+            trackNo (int) -- index of the edited track.
+            track (TrackDrawData.Track) -- the edited track, after the
+                change.
+            replaced (list) -- the (span, breakpoints) pairs returned by
+                setPoints().
+
+        Changes to the same track are merged into the pending entry, whose
+        span grows to cover every change of the drag. Its old breakpoints
+        are those from before the drag started: within the pending span the
+        entry already has them, within the spans of replaced the first
+        change to replace them has them, and anywhere else in between they
+        haven't changed.
+        """
+        if not replaced:
+            return
+        edit = self.pending
+        if edit is not None and (edit.target != target
+                                 or edit.trackNo != trackNo):
+            self.end()
+            edit = None
+        sources = list(replaced)
+        if edit is not None:
+            sources.insert(0, (edit.span, edit.breakpoints[0]))
+        t0 = min(span[0] for span, _ in sources)
+        t1 = max(span[1] for span, _ in sources)
+
+        def covered(t, n):
+            return(any(lo <= t <= hi for (lo, hi), _ in sources[0:n]))
+
+        old = [(t, v) for t, v in zip(*track.breakpoints(t0, t1))
+               if not covered(t, len(sources))]
+        for i, (_, (times, values)) in enumerate(sources):
+            old.extend((t, v) for t, v in zip(times, values)
+                       if not covered(t, i))
+        old.sort()
+        old = ([t for t, _ in old], [v for _, v in old])
+        new = track.breakpoints(t0, t1)
+        if edit is None:
+            self.pending = Edit(target, trackNo, (t0, t1), [old, new])
+        else:
+            edit.span = (t0, t1)
+            edit.breakpoints = [old, new]
+
+    def end(self):
+        """
+        Closes the pending entry and makes it undoable.
+
+        Returns the entry pushed onto the undo stack, or None if there was no
+        pending entry or it didn't change anything.
+        """
+        edit = self.pending
+        self.pending = None
+        if edit is not None and edit.breakpoints[0] != edit.breakpoints[1]:
+            self.push([edit])
+            return([edit])
+        return(None)
+
+    def push(self, edits):
+        """ Adds a complete entry (a list of Edits) to the undo stack. """
+        self.undoStack.append(edits)
+        self.redoStack.clear()
+
+    def recordTracks(self, target, old_tracks, new_tracks):
+        """
+        Records replacement of whole tracks as a single entry.
+
+        Arguments:
+            target (str) -- "FF" or "F0".
+            old_tracks, new_tracks (TrackDrawData.TrackSet) -- the tracks
+                before and after the change. The old tracks must not have
+                been changed in place, e.g. pass a copy(). If the number of
+                tracks differs the change can't be undone and the history
+                is cleared.
+        """
+        self.end()
+        if len(old_tracks) != len(new_tracks):
+            self.clear()
+            return
+        edits = []
+        for i, (old, new) in enumerate(zip(old_tracks, new_tracks)):
+            old = old.breakpoints(0, 1)
+            new = new.breakpoints(0, 1)
+            if old != new:
+                edits.append(Edit(target, i, (0.0, 1.0), [old, new]))
+        if edits:
+            self.push(edits)
+
+    def undo(self, resolve):
+        """
+        Undoes the most recent entry.
+
+        Arguments:
+            resolve (function) -- maps a target ("FF" or "F0") to the current
+                TrackSet for that target.
+
+        Returns the list of Edits undone, which is empty if there was
+        nothing to undo.
+        """
+        return(self._step(self.undoStack, self.redoStack, 0, resolve))
+
+    def redo(self, resolve):
+        """ Redoes the most recently undone entry, see undo(). """
+        return(self._step(self.redoStack, self.undoStack, 1, resolve))
+
+    def _step(self, source, dest, which, resolve):
+        self.end()
+        if not source:
+            return([])
+        edits = source.pop()
+        for edit in reversed(edits) if which == 0 else edits:
+            if not edit.apply(resolve(edit.target), which):
+                # Tracks were reshaped since this edit, history is stale
+                self.clear()
+                return([])
+        dest.append(edits)
+        return(edits)
+
+    def clear(self):
+        self.undoStack.clear()
+        self.redoStack.clear()
+        self.pending = None
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Interaction scheduling for TrackDraw 2016.
+
+Mouse motion events often arrive faster than the canvases can be redrawn.
+If every event updated tracks, blitted canvases and recomputed the STFT
+right away, a fast mouse would queue up more work than the display can
+show, and the canvases would lag behind the pointer.
+
+InteractionScheduler sits between the canvases' motion events and the
+slot handling them. Motion events are only queued, and once per display
+frame the handler is called with the latest event plus every event queued
+since the last frame, so drags can still follow the whole path of the
+mouse. Clicks, releases and other events which must not be reordered go
+through call(), which first flushes any queued motion.
+
+scrollView() turns scroll wheel steps into zooming or panning of the part
+of the sound shown on the track canvases.
+"""
+
+from PyQt5.QtCore import *
+from PyQt5.QtWidgets import *
+
+
+class InteractionScheduler(QObject):
+    """
+    Coalesces mouse motion events and hands them on once per frame.
+
+    Arguments:
+        handler (function) -- called as handler(event, events=events,
+            **kwarg) for the latest queued event, where events is the list of
+            all events queued since the last frame, oldest first, and kwarg
+            are the keyword arguments passed to post().
+        parent (QObject) -- usually the main window.
+        interval (int) -- length of a frame in ms.
+
+    Attributes:
+        received (int) -- number of motion events posted.
+        processed (int) -- number of calls to handler.
+        merged (int) -- number of drag events (mouse button down) which were
+            folded into the path of a later event instead of being handled on
+            their own.
+        dropped (int) -- number of hover events (no mouse button down) which
+            were superseded by a later event and never handled.
+        overlay (QLabel) -- if not None, shows the counts above, updated
+            every frame.
+    """
+    def __init__(self, handler, parent=None, interval=16):
+        super(InteractionScheduler, self).__init__(parent)
+        self.handler = handler
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+        self.events = []
+        self.kwarg = None
+        self.received = 0
+        self.processed = 0
+        self.merged = 0
+        self.dropped = 0
+        self.overlay = None
+
+    def post(self, event, **kwarg):
+        """
+        Queues a motion event to be handled at the next frame.
+
+        If the queued events were posted with different keyword arguments,
+        e.g. because the mouse moved onto another canvas, they are handled
+        right away first.
+        """
+        if self.events and kwarg != self.kwarg:
+            self.flush()
+        self.events.append(event)
+        self.kwarg = kwarg
+        self.received = self.received + 1
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def call(self, fn, *args, **kwarg):
+        """
+        Handles queued motion, then calls fn(*args, **kwarg) immediately.
+
+        Used for events such as clicks and releases, which have to be
+        handled in order with the motion around them.
+        """
+        self.flush()
+        return(fn(*args, **kwarg))
+
+    @pyqtSlot()
+    def flush(self):
+        """ Calls the handler for all queued events. """
+        self.timer.stop()
+        if not self.events:
+            return
+        events = self.events
+        kwarg = self.kwarg
+        self.events = []
+        self.kwarg = None
+        for event in events[0:-1]:
+            if event.button:
+                self.merged = self.merged + 1
+            else:
+                self.dropped = self.dropped + 1
+        self.processed = self.processed + 1
+        self.handler(events[-1], events=events, **kwarg)
+        self.updateOverlay()
+
+    def showOverlay(self, parent, show=True):
+        """
+        Shows or hides the statistics overlay.
+
+        Arguments:
+            parent (QWidget) -- widget the overlay is drawn over, in its top
+                left corner.
+            show (boolean) -- if False, the overlay is hidden.
+        """
+        if not show:
+            if self.overlay is not None:
+                self.overlay.hide()
+            return
+        if self.overlay is None:
+            self.overlay = QLabel(parent)
+            self.overlay.setAttribute(Qt.WA_TransparentForMouseEvents)
+            self.overlay.setStyleSheet("background-color: rgba(0, 0, 0, 160);"
+                                       "color: white; padding: 2px;")
+            self.overlay.move(4, 4)
+        self.overlay.show()
+        self.overlay.raise_()
+        self.updateOverlay()
+
+    def updateOverlay(self):
+        if self.overlay is None or not self.overlay.isVisible():
+            return
+        self.overlay.setText("motion events: %d  handled: %d  merged: %d  "
+                             "dropped: %d" % (self.received, self.processed,
+                                              self.merged, self.dropped))
+        self.overlay.adjustSize()
+
+
+def scrollView(view, fraction, steps, pan=False, factor=1.25, min_span=1e-3):
+    """
+    Zooms or pans a view by scroll wheel steps.
+
+    Arguments:
+        view (tuple) -- (start, end) of the shown part of the sound, as
+            fractions of its duration.
+        fraction (float) -- position of the mouse as a fraction of the
+            sound's duration. Zooming keeps this point in place.
+        steps (float) -- number of wheel steps, positive to zoom in or to pan
+            towards the end of the sound.
+        pan (boolean) -- if True, the view is moved by a tenth of its span
+            per step instead of zoomed.
+        factor (float) -- change of the span per step when zooming.
+        min_span (float) -- narrowest span that can be zoomed in to.
+
+    Returns the new (start, end), which always lies within 0 to 1.
+    """
+    start, end = view
+    span = end - start
+    if pan:
+        shift = min(max(steps*span/10, -start), 1 - end)
+        return((start + shift, end + shift))
+    new_span = min(max(span*factor**-steps, min_span), 1.0)
+    anchor = (fraction - start)/span
+    start = min(max(fraction - anchor*new_span, 0.0), 1.0 - new_span)
+    return((start, start + new_span))
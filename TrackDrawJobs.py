@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Background job system for TrackDraw 2016.
+
+Slots hand heavy work (synthesis, spectrogram computation, file loading,
+track fitting) to a JobManager instead of running it on the GUI thread. Each
+job runs in a worker thread and reports back through Qt signals, so results
+are always applied to the canvases from the GUI thread.
+
+Jobs are submitted under a key such as "synth" or "display". Submitting a new
+job under a key cancels the previous job with that key: if it is still
+queued it never runs, and if it is already running its result is discarded.
+Long-running job functions can also call job.check() or job.report() to stop
+early once cancelled.
+
+Interactive jobs (display redraws, synthesis the user is waiting for) run on
+their own thread pool, so they never queue behind background jobs such as
+whole-file analysis or track fitting.
+"""
+
+import threading
+from PyQt5.QtCore import *
+
+
+class JobCancelled(Exception):
+    """ Raised inside a job function when its job has been cancelled. """
+    pass
+
+
+class JobSignals(QObject):
+    """
+    Signals emitted by a Job. QRunnable is not a QObject, so it can't have
+    signals of its own.
+    """
+    progress = pyqtSignal(object, object)
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+    ended = pyqtSignal(object)
+
+
+class Job(QRunnable):
+    """
+    A unit of work run in a worker thread.
+
+    Arguments:
+        key (str) -- key the job was submitted under.
+        fn (function) -- called as fn(job, *args) in the worker thread. Its
+            return value is the job's result.
+        args (tuple) -- extra arguments for fn.
+
+    Attributes:
+        signals (JobSignals) -- emits progress, finished and failed, and
+            always emits ended once run() returns.
+        cancelled (bool) -- True once the job has been cancelled.
+    """
+    def __init__(self, key, fn, args=()):
+        QRunnable.__init__(self)
+        self.setAutoDelete(False)
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.signals = JobSignals()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return(self._cancelled.is_set())
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        """ Raises JobCancelled if the job has been cancelled. """
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report(self, value):
+        """
+        Emits a progress value, returns False if the job has been cancelled.
+
+        The return value makes report() usable directly as a progress
+        callback for functions which stop when their callback returns False.
+        """
+        if self.cancelled:
+            return(False)
+        self.signals.progress.emit(self, value)
+        return(True)
+
+    def run(self):
+        try:
+            if not self.cancelled:
+                result = self.fn(self, *self.args)
+                self.signals.finished.emit(self, result)
+        except JobCancelled:
+            pass
+        except Exception as err:
+            self.signals.failed.emit(self, err)
+        finally:
+            self.signals.ended.emit(self)
+
+
+class JobManager(QObject):
+    """
+    Runs jobs in worker threads and delivers their results to the GUI thread.
+
+    Arguments:
+        parent (QObject) -- usually the main window.
+
+    Attributes:
+        INTERACTIVE (int) -- priority for jobs the user is actively waiting
+            on, such as redraws or synthesis.
+        BACKGROUND (int) -- priority for long jobs such as whole-file
+            analysis and track fitting.
+    """
+    INTERACTIVE = 1
+    BACKGROUND = 0
+
+    def __init__(self, parent=None):
+        super(JobManager, self).__init__(parent)
+        self.interactivePool = QThreadPool(self)
+        self.interactivePool.setMaxThreadCount(2)
+        self.backgroundPool = QThreadPool(self)
+        self.backgroundPool.setMaxThreadCount(max(1,
+                QThread.idealThreadCount() - 2))
+        self.latest = {}
+        self.callbacks = {}
+        # Jobs are kept alive here until they have left the thread pools
+        self.jobs = set()
+
+    def submit(self, key, fn, args=(), on_done=None, on_progress=None,
+               on_error=None, priority=BACKGROUND):
+        """
+        Starts a job, cancelling any previous job submitted under key.
+
+        Arguments:
+            key (str) -- identifies what the job computes.
+            fn (function) -- called as fn(job, *args) in a worker thread.
+            args (tuple) -- extra arguments for fn. Anything mutable that the
+                GUI might change while the job runs should be copied first.
+            on_done (function) -- called with the result in the GUI thread.
+            on_progress (function) -- called with each progress value in the
+                GUI thread.
+            on_error (function) -- called with the exception in the GUI
+                thread if fn raises. By default, errors are printed.
+            priority (int) -- JobManager.INTERACTIVE or JobManager.BACKGROUND.
+
+        Returns the Job object.
+        """
+        self.cancel(key)
+        job = Job(key, fn, args)
+        job.signals.progress.connect(self.onProgress, Qt.QueuedConnection)
+        job.signals.finished.connect(self.onFinished, Qt.QueuedConnection)
+        job.signals.failed.connect(self.onFailed, Qt.QueuedConnection)
+        job.signals.ended.connect(self.onEnded, Qt.QueuedConnection)
+        self.jobs.add(job)
+        self.latest[key] = job
+        self.callbacks[job] = (on_done, on_progress, on_error)
+        if priority == self.INTERACTIVE:
+            self.interactivePool.start(job, priority)
+        else:
+            self.backgroundPool.start(job, priority)
+        return(job)
+
+    def cancel(self, key):
+        """ Cancels the most recent job submitted under key, if any. """
+        job = self.latest.pop(key, None)
+        if job is None:
+            return
+        job.cancel()
+        self.callbacks.pop(job, None)
+        if self.interactivePool.tryTake(job) or self.backgroundPool.tryTake(job):
+            self.jobs.discard(job)
+
+    def cancelAll(self):
+        for key in list(self.latest.keys()):
+            self.cancel(key)
+
+    def isCurrent(self, job):
+        return(self.latest.get(job.key) is job and not job.cancelled)
+
+    @pyqtSlot(object, object)
+    def onProgress(self, job, value):
+        if self.isCurrent(job):
+            on_progress = self.callbacks[job][1]
+            if on_progress is not None:
+                on_progress(value)
+
+    @pyqtSlot(object, object)
+    def onFinished(self, job, result):
+        if self.isCurrent(job):
+            on_done = self.callbacks.pop(job)[0]
+            del self.latest[job.key]
+            if on_done is not None:
+                on_done(result)
+
+    @pyqtSlot(object)
+    def onEnded(self, job):
+        self.jobs.discard(job)
+
+    @pyqtSlot(object, object)
+    def onFailed(self, job, err):
+        if self.isCurrent(job):
+            on_error = self.callbacks.pop(job)[2]
+            del self.latest[job.key]
+            if on_error is not None:
+                on_error(err)
+            else:
+                print("Job '" + job.key + "' failed:", repr(err))
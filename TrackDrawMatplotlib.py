@@ -0,0 +1,659 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+matplotlib rendering backend for TrackDraw 2016.
+
+The canvases in this module draw the waveform, spectrogram, STFT and F0
+displays with matplotlib's Qt5Agg backend. It is the default renderer,
+see TrackDrawPainter for the QPainter one selected with --renderer
+qpainter. This module is only imported by TrackDrawWidgets.CanvasGrid when
+the matplotlib renderer is used, so starting with the other one doesn't
+import matplotlib at all.
+"""
+
+from TrackDrawData import DEFAULT_PARAMS
+from TrackDrawInteraction import scrollView
+import numpy as np
+import matplotlib
+matplotlib.use("QT5Agg")
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.patches import Rectangle
+from matplotlib.transforms import Bbox
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+
+class trackCanvas(FigureCanvas):
+    """
+    Canvas object for animated canvases in TrackDraw 2016.
+
+    Arguments:
+        parent (CanvasGrid object) -- refers to parent CanvasGrid object, which
+            is a subclass of QWidget
+
+    Attributes:
+        enabled (boolean) -- if True, tracks will be drawn. If not, they will
+            still be properly stored, but will not be drawn.
+        background -- background stored from copy_from_bbox operation
+        tracks (list) -- contains canvas' current Line2D objects, which
+            represent tracks.
+        x_low (float) -- lower limit of plot in x-dimension
+        x_high (float) -- upper limit of plot in x-dimension
+        y_low (float) -- lower limit of plot in y-dimension
+        y_high (float) -- upper limit of plot in y-dimension
+        track_npoints (int) -- number of points in tracks
+        drawn (np.array) -- (n_tracks, track_npoints) copy of the track
+            points as currently drawn. The track Line2D objects plot rows of
+            this array.
+        locked_track (int) -- current locked track
+        playhead (Line2D) -- vertical line showing the playback position
+        playhead_x (float) -- x position of the playhead in track
+            coordinates, or None if the playhead is hidden
+        view (tuple) -- (start, end) of the part of the tracks shown, as
+            fractions of their length.
+        requested_view (tuple) -- view asked for by the latest scroll wheel
+            event, which may not be shown yet.
+
+    trackCanvas is a subclass of FigureCanvas to be used for all TrackDraw
+    animated plots which display tracks. This will allow for easy creation
+    of other similar canvas objects to allow for animated graphical input of
+    parameters. Currently, only F0Canvas and SpecCanvas use this as a parent
+    class.
+    """
+    def __init__(self, parent=None):
+        self.fig = Figure()
+        self.ax = self.fig.add_subplot(111)
+        self.ax.hold(False)
+        FigureCanvas.__init__(self, self.fig)
+        self.setParent(parent)
+
+        self.enabled = True
+        self.background = None
+        self.tracks = []
+        self.x_low = 0
+        self.x_high = 0
+        self.y_low = 0
+        self.y_high = 0
+        self.track_npoints = DEFAULT_PARAMS.track_npoints
+        self.drawn = None
+        self.locked_track = 0
+        self.playhead = Line2D([0, 0], [0, 1], color="white", linewidth=1.5)
+        self.playhead_x = None
+        # Stand-in for the parts of tracks redrawn by updateDirty()
+        self.scratch = Line2D([], [])
+        self.view = (0.0, 1.0)
+        self.requested_view = self.view
+        self.viewHandler = None
+
+    def clear(self):
+        self.ax.clear()
+        self.fig.canvas.draw()
+
+    def getBackground(self):
+        """ Grabs current background. """
+        self.background = self.fig.canvas.copy_from_bbox(self.ax.get_figure().bbox)
+
+    def start(self, tracks):
+        """
+        Starts tracks.
+
+        Arguments:
+            tracks (TrackDrawData.TrackSet) -- tracks to be drawn.
+
+        Used whenever canvas is initialized, or when one needs a fresh empty background.
+        """
+        self.ax.clear()
+        self.tracks = []
+        self.ax.set_xlim(*self.xLimits())
+        self.ax.set_ylim(self.y_low, self.y_high)
+        self.fig.canvas.draw()
+        self.getBackground()
+        self.plotTracks(tracks)
+        self.ax.set_xlim(*self.xLimits())
+        self.ax.set_ylim(self.y_low, self.y_high)
+        self.updateCanvas(redraw=True)
+
+    def xLimits(self):
+        """ Returns the x-limits of the current view in track coordinates. """
+        return(self.view[0]*(self.track_npoints - 1),
+               self.view[1]*(self.track_npoints - 1))
+
+    def setView(self, view):
+        """
+        Sets the part of the tracks to be shown by the next start() or
+        plot_specgram(), see view.
+        """
+        self.view = tuple(view)
+        self.requested_view = self.view
+
+    def plotWidth(self):
+        """ Returns the width of the plotted area in pixels. """
+        return(int(self.ax.bbox.width))
+
+    def plotTracks(self, tracks):
+        """
+        Creates the Line2D objects for tracks.
+
+        Arguments:
+            tracks (TrackDrawData.TrackSet) -- tracks to be drawn.
+        """
+        self.drawn = np.array(tracks.points, dtype=np.float64)
+        self.tracks = []
+        for i in range(len(tracks)):
+            self.tracks.append(self.ax.plot(self.drawn[i], color="blue",
+                                            marker="o"))
+
+    def connectMouse(self, press=None, motion=None, release=None):
+        """ Connects handlers for mouse button presses, motion and releases. """
+        for name, handler in (("button_press_event", press),
+                              ("motion_notify_event", motion),
+                              ("button_release_event", release)):
+            if handler is not None:
+                self.fig.canvas.mpl_connect(name, handler)
+
+    def connectView(self, handler):
+        """
+        Connects a handler for zooming and panning with the scroll wheel.
+
+        The wheel zooms in and out around the mouse, and pans with shift
+        held. handler is called with the requested view, see scrollView(),
+        and is expected to show it, e.g. through setView() and start().
+        """
+        self.viewHandler = handler
+        self.fig.canvas.mpl_connect("scroll_event", self.onScroll)
+
+    def onScroll(self, event):
+        if self.viewHandler is None:
+            return
+        x_axes, _ = self.ax.transAxes.inverted().transform((event.x, event.y))
+        fraction = self.view[0] + x_axes*(self.view[1] - self.view[0])
+        self.requested_view = scrollView(self.requested_view, fraction,
+                                         event.step, pan=event.key == "shift")
+        self.viewHandler(self.requested_view)
+
+    def mouse(self, event):
+        """ Converts mouse coordinates in pixels to data coordinates. """
+        x_loc, y_loc = self.ax.transData.inverted().transform((event.x, event.y))
+        x_min, x_max = self.ax.get_xlim()
+        y_min, y_max = self.ax.get_ylim()
+        # Only return if within plot limits
+        if x_min < x_loc < x_max and y_min < y_loc < y_max:
+            return(x_loc, y_loc)
+
+    def updateCanvas(self, new_tracks=0, trackNo=0, redraw=False):
+        """
+        Animates canvas.
+
+        Arguments:
+            new_tracks (list) -- list of Track objects.
+            trackNo (int) -- index of track which has been updated.
+            redraw (boolean) -- if True, does not use new_track and trackNo
+                arguments to change a track.
+
+        If redraw is False and only the trackNo-th track has changed since it
+        was last drawn, only the area around the changed points is redrawn,
+        see updateDirty(). Otherwise, the current background is restored. Then,
+        if redraw is False, the trackNo-th track's y_data is changed to match
+        the data found in new_track. If self.enabled is True, the tracks are
+        drawn. Finally, the axes' clipbox is blitted to animate changes.
+        """
+        if redraw == False and self.updateDirty(new_tracks, trackNo):
+            return
+        self.ax.set_xlim(*self.xLimits())
+        self.ax.set_ylim(self.y_low, self.y_high)
+        self.fig.canvas.restore_region(self.background)
+        if redraw == False:
+            if self.drawn is None or self.drawn.shape != new_tracks.points.shape:
+                self.drawn = np.array(new_tracks.points, dtype=np.float64)
+            else:
+                self.drawn[trackNo] = new_tracks.points[trackNo]
+            self.tracks[trackNo][0].set_ydata(self.drawn[trackNo])
+        if self.enabled:
+            for i in range(len(self.tracks)):
+                self.ax.draw_artist(self.tracks[i][0])
+        if self.playhead_x is not None:
+            self.playhead.set_transform(self.ax.get_xaxis_transform())
+            self.playhead.set_xdata([self.playhead_x, self.playhead_x])
+            self.ax.draw_artist(self.playhead)
+        self.fig.canvas.blit(self.ax.clipbox)
+
+    def updateDirty(self, new_tracks, trackNo):
+        """
+        Redraws only the area of the canvas changed by an edit to one track.
+
+        Arguments:
+            new_tracks (TrackDrawData.TrackSet) -- tracks to be drawn.
+            trackNo (int) -- index of track which has been updated.
+
+        The points of the trackNo-th track which differ from self.drawn are
+        found, and the bounding box of the segments touching them, before and
+        after the change, is computed in pixels. Only this box is restored
+        from the background and blitted. Instead of redrawing whole tracks,
+        the short stretch of every track which crosses the box is drawn with
+        a scratch Line2D clipped to the box, so the cost of a drag does not
+        grow with the number of tracks or points.
+
+        Returns False if the whole canvas has to be redrawn instead, e.g.
+        because nothing has been drawn yet or the number of tracks or points
+        has changed.
+        """
+        if (self.background is None or self.drawn is None
+                or self.drawn.shape != new_tracks.points.shape
+                or self.drawn.shape[1] != self.track_npoints):
+            return(False)
+        new_row = new_tracks.points[trackNo]
+        changed = np.flatnonzero(self.drawn[trackNo] != new_row)
+        if len(changed) == 0:
+            return(True)
+        # Segments touching the changed points, before and after the change
+        lo = max(0, changed[0] - 1)
+        hi = min(self.track_npoints, changed[-1] + 2)
+        old_row = self.drawn[trackNo, lo:hi]
+        y_min = min(old_row.min(), new_row[lo:hi].min())
+        y_max = max(old_row.max(), new_row[lo:hi].max())
+        self.drawn[trackNo] = new_row
+        line = self.tracks[trackNo][0]
+        line.set_ydata(self.drawn[trackNo])
+
+        # Dirty box in display pixels, padded by the marker size
+        pad = (line.get_markersize()/2 + line.get_linewidth())*self.fig.dpi/72 + 2
+        corners = self.ax.transData.transform([[lo, y_min], [hi - 1, y_max]])
+        dirty = Bbox.intersection(Bbox(corners).padded(pad), self.ax.bbox)
+        if dirty is None:
+            return(True)
+        x0, y0 = np.floor(dirty.p0)
+        x1, y1 = np.ceil(dirty.p1)
+        dirty = Bbox([[x0, y0], [x1, y1]])
+        # restore_region() takes pixel rows counted from the top, and
+        # includes the last row and column
+        height = self.fig.bbox.height
+        self.fig.canvas.restore_region(self.background,
+                bbox=(x0, height - y1, x1 - 1, height - y0 - 1), xy=(0, 0))
+
+        if self.enabled:
+            # Tracks whose segments or markers can reach into the box
+            inverse = self.ax.transData.inverted()
+            (c0, d0), (c1, d1) = inverse.transform(dirty.padded(pad).get_points())
+            c0 = max(0, int(np.floor(c0)) - 1)
+            c1 = min(self.track_npoints, int(np.ceil(c1)) + 2)
+            stretch = self.drawn[:, c0:c1]
+            crossing = np.flatnonzero((stretch.max(axis=1) >= min(d0, d1))
+                                      & (stretch.min(axis=1) <= max(d0, d1)))
+            cols = np.arange(c0, c1)
+            for i in crossing:
+                self.scratch.update_from(self.tracks[i][0])
+                self.scratch.set_data(cols, stretch[i])
+                self.scratch.set_clip_box(dirty)
+                self.ax.draw_artist(self.scratch)
+        if self.playhead_x is not None:
+            self.playhead.set_transform(self.ax.get_xaxis_transform())
+            self.playhead.set_xdata([self.playhead_x, self.playhead_x])
+            self.playhead.set_clip_box(dirty)
+            self.ax.draw_artist(self.playhead)
+            self.playhead.set_clip_box(None)
+        self.fig.canvas.blit(dirty)
+        return(True)
+
+    def updatePlayhead(self, fraction=None):
+        """
+        Moves the playhead.
+
+        Arguments:
+            fraction (float) -- playback position as a fraction of the
+                duration of the displayed sound. If None, the playhead is
+                hidden.
+        """
+        if fraction is None:
+            self.playhead_x = None
+        else:
+            self.playhead_x = fraction*(self.track_npoints - 1)
+        if self.background is not None:
+            self.updateCanvas(redraw=True)
+
+
+class WaveCanvas(FigureCanvas):
+    """
+    Contains waveform reflecting current analyzed/plotted waveform.
+
+    Arguments:
+        parent (CanvasGrid object) -- refers to parent CanvasGrid object, which
+            is a subclass of QWidget.
+
+    Attributes:
+        enabled (boolean) -- if True, wave is plotted.
+        current_waveform (np.array) -- stores most recently plotted waveform.
+        background -- background stored from copy_from_bbox operation
+        selection (tuple) -- (start, end) of the selected time range as
+            fractions of the waveform's duration, or None.
+        playhead (Line2D) -- vertical line showing the playback position.
+        playhead_x (float) -- x position of the playhead in samples, or None
+            if the playhead is hidden.
+
+    WaveCanvas stores the most recently plotted waveform and displays it if
+    displayDock.waveCheckBox is checked. Whenever the current display option is
+    changed (i.e. whenever displayDock's radio buttons to switch between synth
+    and loaded are pressed) the new waveform is plotted on wavecanvas using the
+    plot_waveform method even if the waveform is empty or not to be displayed.
+    This way, if the user checks waveCheckBox it will display the correct
+    waveform even if the waveCheckBox was unchecked when the display option was
+    switched.
+
+    A time range can be selected by dragging across the waveform (e.g. to play
+    only part of it), and a single click clears the selection. The selection
+    and the playhead are animated with blitting over the stored background.
+
+    TODO -- replace with more generic subclass of figure canvas, like a generic
+        subclass for non-animated plots? If it's worth it...
+    """
+    def __init__(self, parent=None):
+        self.fig = Figure()
+        self.ax  = self.fig.add_subplot(111)
+        self.ax.hold(False)
+        self.ax.xaxis.set_visible(False)
+        self.ax.yaxis.set_visible(False)
+        self.fig.subplots_adjust(left=0.08, right=0.95)
+        FigureCanvas.__init__(self, self.fig)
+        self.setParent(parent)
+
+        self.enabled = True
+        self.current_waveform = None
+        self.background = None
+        self.selection = None
+        self.selection_anchor = None
+        self.selection_patch = Rectangle((0, 0), 0, 1, color="orange",
+                                         alpha=0.3)
+        self.playhead = Line2D([0, 0], [0, 1], color="red", linewidth=1.5)
+        self.playhead_x = None
+
+        self.fig.canvas.mpl_connect("button_press_event", self.onPress)
+        self.fig.canvas.mpl_connect("motion_notify_event", self.onMotion)
+        self.fig.canvas.mpl_connect("button_release_event", self.onRelease)
+
+    def clear(self):
+        self.ax.clear()
+        self.fig.canvas.draw()
+        self.background = None
+        self.selection = None
+
+    def plot_waveform(self, waveform):
+        self.current_waveform = waveform
+        self.selection = None
+        try:
+            if self.enabled == False:
+                self.clear()
+            else:
+                self.ax.plot(waveform)
+                self.fig.canvas.draw()
+                self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        except ValueError:
+            return
+
+    def updateCanvas(self):
+        """ Redraws the selection and playhead over the background. """
+        if self.background is None:
+            return
+        self.fig.canvas.restore_region(self.background)
+        transform = self.ax.get_xaxis_transform()
+        if self.selection is not None:
+            n = len(self.current_waveform)
+            start, end = self.selection
+            self.selection_patch.set_transform(transform)
+            self.selection_patch.set_bounds(start*n, 0, (end - start)*n, 1)
+            self.ax.draw_artist(self.selection_patch)
+        if self.playhead_x is not None:
+            self.playhead.set_transform(transform)
+            self.playhead.set_xdata([self.playhead_x, self.playhead_x])
+            self.ax.draw_artist(self.playhead)
+        self.fig.canvas.blit(self.ax.bbox)
+
+    def updatePlayhead(self, fraction=None):
+        """
+        Moves the playhead.
+
+        Arguments:
+            fraction (float) -- playback position as a fraction of the
+                waveform's duration. If None, the playhead is hidden.
+        """
+        if fraction is None or self.current_waveform is None:
+            self.playhead_x = None
+        else:
+            self.playhead_x = fraction*len(self.current_waveform)
+        self.updateCanvas()
+
+    def getSelection(self):
+        """ Returns the selection as (start, end) fractions, or None. """
+        return(self.selection)
+
+    def mouseFraction(self, event):
+        """ Converts mouse x position in pixels to a fraction of duration. """
+        if self.current_waveform is None or len(self.current_waveform) < 2:
+            return(None)
+        x_loc, _ = self.ax.transData.inverted().transform((event.x, event.y))
+        return(min(max(x_loc/len(self.current_waveform), 0), 1))
+
+    def onPress(self, event):
+        self.selection_anchor = self.mouseFraction(event)
+        self.selection = None
+        self.updateCanvas()
+
+    def onMotion(self, event):
+        if self.selection_anchor is None or not event.button:
+            return
+        fraction = self.mouseFraction(event)
+        if fraction is None:
+            return
+        self.selection = (min(self.selection_anchor, fraction),
+                          max(self.selection_anchor, fraction))
+        self.updateCanvas()
+
+    def onRelease(self, event):
+        self.selection_anchor = None
+        if self.selection is not None and\
+                self.selection[1] - self.selection[0] < 1e-3:
+            self.selection = None
+            self.updateCanvas()
+
+
+class STFTCanvas(FigureCanvas):
+    """
+    Contains mag. spec. of small snippet of waveform around mouse cursor.
+
+    Arguments:
+        parent (CanvasGrid object) -- refers to parent CanvasGrid object, which
+            is a subclass of QWidget.
+
+    Attributes:
+        background -- background stored from copy_from_bbox operation
+        enabled (boolean) -- if True, STFT is plotted.
+        stft (np.array) -- contains most recently plotted STFT
+        stft_size (int) -- size of STFT frame in samples
+
+    STFTCanvas is updated by the mouse() slot in Slots. A small chunk of the
+    current displayed/analyzed waveform is grabbed, centered on the current
+    x_loc of the mouse cursor and the magnitude spectrum of the chunk is
+    calculated and displayed (if the STFT checkbox is checked). Uses blitting
+    to animate the plot efficiently.
+
+    TODO -- consider ways to use trackCanvas as parent class, might make things
+        easier and reduce code repetition?
+    """
+    def __init__(self, parent=None):
+        self.fig = Figure()
+        self.ax  = self.fig.add_subplot(111)
+        self.ax.hold(False)
+        self.ax.xaxis.set_visible(False)
+        self.ax.yaxis.set_visible(False)
+        self.fig.subplots_adjust(top=0.95, bottom=0.1)
+        FigureCanvas.__init__(self, self.fig)
+        self.setParent(parent)
+
+        self.background = None
+        self.enabled = True
+        self.stft = None
+        self.stft_size = DEFAULT_PARAMS.stft_size
+
+    def start(self, restart=False):
+        self.ax.clear()
+        self.ax.set_xlim(-20, 40)
+        self.ax.set_ylim(0, self.stft_size)
+        self.fig.canvas.draw()
+        self.background = self.fig.canvas.copy_from_bbox(self.ax.get_figure().bbox)
+        self.stft, = self.ax.plot(np.ones([self.stft_size])*-20, np.arange(self.stft_size))
+        self.fig.canvas.draw()
+        self.ax.set_xlim(-20, 40)
+        self.ax.set_ylim(0, self.stft_size)
+        if restart:
+            self.update_stft(self.current_stft)
+
+    def update_stft(self, new_stft=0):
+        try:
+            self.stft.set_xdata(new_stft[0:-1])
+            self.current_stft = new_stft[0:-1]
+            self.fig.canvas.restore_region(self.background)
+            if self.enabled:
+                self.ax.draw_artist(self.stft)
+                self.fig.canvas.blit(self.ax.clipbox)
+        except RuntimeError:
+            pass
+
+
+class SpecCanvas(trackCanvas):
+    """
+    Contains tracks reflecting formant frequencies and plots spectrograms.
+
+    Arguments:
+        See trackCanvas's doc string.
+
+    Attributes:
+        See trackCanvas's doc string.
+        current_waveform (np.array) -- waveform corresponding to the most
+            recently plotted waveform.
+        current_fs (int) -- sampling rate in Hz corresponding to the most
+            recently plotted waveform.
+        y_high (int) -- modified from trackCanvas defaults, set as f/2 since
+            spectrogram is to be plotted.
+        nformant (int) -- just keeps track of current number of formants to be
+            reflected in tracks. May be best to replace its functionality, need
+            to change references to it in Slots.
+
+    SpecCanvas adds a number of attributes (and changes one default attribute)
+    from its parent class, trackCanvas. It also adds a new method,
+    plot_specgram(), which accepts data from TrackDraw about how to plot the
+    spectrogram and then plots it and calls the right methods to make sure
+    tracks are also still plotted.
+
+    TODO -- figure out why it's only plotting the first track on startup
+    """
+    def __init__(self, parent=None):
+        trackCanvas.__init__(self, parent=parent)
+
+        # Set SpecCanvas unique plot settings
+        self.ax.set_xlabel("Time [s]")
+        self.ax.set_ylabel("Frequency [Hz]")
+        self.fig.subplots_adjust(left=0.08, top=0.95, right=0.95, bottom=0.1)
+
+        # Initialize SpecCanvas unique attributes, or adjust defaults
+        self.current_waveform = None
+        self.current_fs = None
+        self.y_high = DEFAULT_PARAMS.synth_fs/2
+        self.nformant = DEFAULT_PARAMS.nformant
+
+    def plot_specgram(self, x_right=1.0, waveform=0, fs=0, window_len=256,
+                      noverlap=0.5, window_type="hanning", tracks=0,
+                      restart=False, specgram=None, view=None):
+        """
+        Plots spectrogram on spec_cv
+
+        Arguments:
+            x_right (float) -- right limit in x-dimension, usually set to
+                analyzed waveform's duration
+            waveform (np.array) -- waveform to be analyzed in spectrogram
+            fs (int) -- sampling rate in Hz
+            window_len (int) -- length of window to be used in samples
+            noverlap (int) -- proportion overlap to be used for windows
+            window_type (str) -- name of a window function from numpy.
+            tracks (TrackDrawData.TrackSet) -- tracks to be drawn, used to
+                redraw tracks after spectrogram is plotted.
+            restart (boolean) -- if False, creates spectrogram based on input
+                waveform/fs/duration/etc., if True, creates spectrogram based
+                on previously used waveform/fs/duration/etc. cached from last
+                call in current_waveform, current_fs
+            specgram (tuple) -- if provided, (Z, extent) as returned by
+                analysis.spectrogram.specgram(), already computed from the
+                waveform (e.g. in a background job). Otherwise the spectrogram
+                is computed here.
+            view (tuple) -- if provided, sets view, see setView(). specgram
+                then only needs to cover the part of the sound shown.
+
+        plot_specgram() handles the task of plotting a spectrogram to the
+        specCanvas based on input waveform/fs data or based on cached
+        waveform/fs data from the most recent call to plot_specgram(). The axes
+        are temporarily set to values appropriate for the spectrogram, then the
+        new background (containing the plotted spectrogram) is grabbed and axes
+        are restored to a scale appropriate for all Track related features.
+
+        TODO -- look into automatic zero-padding to fix scaling issues?
+        TODO -- implement more clear system for setting limits and duration...
+        """
+        if restart == False:
+            self.current_waveform = waveform
+            self.current_fs = fs
+            self.y_high = fs/2
+        if view is not None:
+            self.setView(view)
+        if specgram is None:
+            import analysis
+            specgram = analysis.spectrogram.specgram(self.current_waveform,
+                    self.current_fs, window_len, noverlap, window_type)
+        Z, extent = specgram
+        self.ax.clear()
+        self.ax.imshow(Z, cmap="gist_heat", extent=extent, origin="upper")
+        self.ax.axis("auto")
+        if view is not None:
+            self.ax.set_xlim(view[0]*x_right, view[1]*x_right)
+        self.fig.canvas.draw()
+        self.getBackground()
+        if restart == False:
+            self.plotTracks(tracks)
+        self.updateCanvas(redraw=True)
+
+
+class F0Canvas(trackCanvas):
+    """
+    Contains track representing an F0 contour.
+
+    Attributes:
+        See trackCanvas' doc string.
+        y_low (int) -- modified from trackCanvas, set to 90 as the lower margin
+            for possible F0.
+        y_high (int) -- modified from trackCavnas, set to 150 as the upper
+            margin for possible F0.
+
+    F0Canvas simply changes a handful fo default values from trackCanvas, and
+    otherwise functions as a typical trackCanvas.
+    """
+    def __init__(self, parent=None):
+        trackCanvas.__init__(self, parent=parent)
+
+        # Set F0Canvas unique plot settings
+        self.ax.xaxis.set_visible(False)
+        self.fig.subplots_adjust(left=0.08, right=0.95)
+
+        # Initialize F0Canvas unique attributes, or adjust defaults
+        self.y_low = 90
+        self.y_high = 150
+
+    def fitLimits(self, tracks, margin=10):
+        """
+        Widens the y-limits so that all points of tracks are visible.
+
+        Arguments:
+            tracks (TrackDrawData.TrackSet) -- tracks to be drawn.
+            margin (float) -- space in Hz left above and below the tracks.
+
+        The limits are never narrowed below the default 90-150 Hz range.
+        """
+        lowest = np.min(tracks.points)
+        highest = np.max(tracks.points)
+        self.y_low = min(90, lowest - margin)
+        self.y_high = max(150, highest + margin)
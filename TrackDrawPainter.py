@@ -0,0 +1,717 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QPainter rendering backend for TrackDraw 2016.
+
+The canvases in this module are drop-in replacements for the matplotlib
+canvases in TrackDrawMatplotlib, selected at startup with --renderer qpainter.
+They keep the same start()/updateCanvas()/plot_specgram() interface, so
+Slots works with either backend.
+
+Instead of rasterizing whole figures with Agg and blitting, each canvas keeps
+its static content (frame, tick labels, spectrogram or waveform) in a QPixmap
+which is only rebuilt when that content or the widget's size changes.
+paintEvent() copies the part of the pixmap Qt asks for and draws the
+animated parts (tracks, playhead, selection) on top with QPainter. Track
+edits only ask Qt to repaint the few pixels around the changed points.
+
+Spectrograms are turned into a QImage through a 256 entry colormap lookup
+table, and long waveforms are reduced to one min/max pair per pixel column
+before being drawn, so neither gets slower to draw with larger windows or
+longer sounds.
+"""
+
+from PyQt5.QtCore import *
+from PyQt5.QtWidgets import *
+from PyQt5.QtGui import *
+import numpy as np
+from TrackDrawData import DEFAULT_PARAMS
+from TrackDrawInteraction import scrollView
+
+
+def gistHeatTable():
+    """
+    Builds a lookup table for matplotlib's gist_heat colormap.
+
+    Returns a (256,) np.array of 0xffRRGGBB colors, as used by
+    QImage.Format_RGB32 images.
+    """
+    x = np.linspace(0, 1, 256)
+    rgb = np.vstack((np.clip(1.5*x, 0, 1), np.clip(2*x - 1, 0, 1),
+                     np.clip(4*x - 3, 0, 1)))
+    rgb = np.round(255*rgb).astype(np.uint32)
+    return(0xff000000 | (rgb[0] << 16) | (rgb[1] << 8) | rgb[2])
+
+GIST_HEAT = gistHeatTable()
+
+
+def arrayToImage(Z, table=GIST_HEAT):
+    """
+    Converts a 2D array to a QImage through a colormap lookup table.
+
+    Arguments:
+        Z (np.array) -- (n_rows, n_cols) image data, the first row at the
+            top. Values are scaled linearly from the smallest to the largest
+            finite value, non-finite values get the lowest color.
+        table (np.array) -- lookup table of 0xffRRGGBB colors.
+    """
+    finite = np.isfinite(Z)
+    if not finite.any():
+        Z = np.zeros(Z.shape)
+        finite = np.ones(Z.shape, dtype=bool)
+    low = Z[finite].min()
+    high = Z[finite].max()
+    scale = (len(table) - 1)/max(high - low, 1e-12)
+    index = np.clip(np.where(finite, (Z - low)*scale, 0), 0, len(table) - 1)
+    pixels = np.ascontiguousarray(table[index.astype(np.uint8)])
+    height, width = pixels.shape
+    image = QImage(pixels.data, width, height, 4*width, QImage.Format_RGB32)
+    # Copy, so that the image doesn't refer to pixels once they're freed
+    return(image.copy())
+
+
+def niceTicks(low, high, max_ticks=8):
+    """ Returns round tick positions between low and high. """
+    span = high - low
+    if span <= 0:
+        return(np.array([low]))
+    magnitude = 10**np.floor(np.log10(span/max_ticks))
+    for factor in (1, 2, 5, 10):
+        step = factor*magnitude
+        if span/step <= max_ticks:
+            break
+    return(np.arange(np.ceil(low/step)*step, high + step*1e-9, step))
+
+
+def toPolygon(xs, ys):
+    return(QPolygonF([QPointF(x, y) for x, y in zip(xs, ys)]))
+
+
+class CanvasEvent:
+    """
+    Mouse event passed to the handlers given to connectMouse().
+
+    Attributes:
+        x (float) -- mouse position in widget pixels from the left.
+        y (float) -- mouse position in widget pixels from the top.
+        button (int) -- 1, 2 or 3 for the left, middle or right button, as in
+            matplotlib's mouse events, or None if no button is down.
+    """
+    __slots__ = ("x", "y", "button")
+
+    def __init__(self, event):
+        self.x = event.x()
+        self.y = event.y()
+        buttons = event.button()
+        if buttons == Qt.NoButton:
+            buttons = event.buttons()
+        self.button = None
+        for button, number in ((Qt.LeftButton, 1), (Qt.MiddleButton, 2),
+                               (Qt.RightButton, 3)):
+            if buttons & button:
+                self.button = number
+                break
+
+
+class PainterCanvas(QWidget):
+    """
+    Base class for canvases drawn with QPainter.
+
+    Arguments:
+        parent (CanvasGrid object) -- refers to parent CanvasGrid object.
+        margins (tuple) -- (left, top, right, bottom) space in pixels between
+            the widget's edges and the plotted area.
+
+    Attributes:
+        enabled (boolean) -- if False, the animated content is not drawn.
+        background (QPixmap) -- cached static content, or None if it has to
+            be rebuilt at the next paint.
+        x_low (float) -- lower limit of plot in x-dimension
+        x_high (float) -- upper limit of plot in x-dimension
+        y_low (float) -- lower limit of plot in y-dimension
+        y_high (float) -- upper limit of plot in y-dimension
+
+    Subclasses draw their static content in drawBackground() and their
+    animated content in drawForeground().
+    """
+    def __init__(self, parent=None, margins=(60, 10, 20, 30)):
+        QWidget.__init__(self, parent)
+        self.setMouseTracking(True)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.margins = margins
+        self.enabled = True
+        self.background = None
+        self.x_low = 0
+        self.x_high = 1
+        self.y_low = 0
+        self.y_high = 1
+        self.handlers = (None, None, None)
+
+    ##### Coordinates #####
+    def plotRect(self):
+        """ Returns the plotted area as a QRectF in widget pixels. """
+        left, top, right, bottom = self.margins
+        return(QRectF(left, top, max(1, self.width() - left - right),
+                      max(1, self.height() - top - bottom)))
+
+    def toPixels(self, x, y):
+        """ Converts data coordinates (scalars or arrays) to widget pixels. """
+        rect = self.plotRect()
+        px = rect.left() + (np.asarray(x) - self.x_low)*rect.width()\
+                /(self.x_high - self.x_low)
+        py = rect.bottom() - (np.asarray(y) - self.y_low)*rect.height()\
+                /(self.y_high - self.y_low)
+        return(px, py)
+
+    def toData(self, px, py):
+        """ Converts widget pixels to data coordinates. """
+        rect = self.plotRect()
+        x = self.x_low + (px - rect.left())*(self.x_high - self.x_low)\
+                /rect.width()
+        y = self.y_low + (rect.bottom() - py)*(self.y_high - self.y_low)\
+                /rect.height()
+        return(x, y)
+    ##### End coordinates #####
+
+    ##### Mouse events #####
+    def connectMouse(self, press=None, motion=None, release=None):
+        """ Sets handlers for mouse events, each called with a CanvasEvent. """
+        self.handlers = (press, motion, release)
+
+    def mousePressEvent(self, event):
+        if self.handlers[0] is not None:
+            self.handlers[0](CanvasEvent(event))
+
+    def mouseMoveEvent(self, event):
+        if self.handlers[1] is not None:
+            self.handlers[1](CanvasEvent(event))
+
+    def mouseReleaseEvent(self, event):
+        if self.handlers[2] is not None:
+            self.handlers[2](CanvasEvent(event))
+    ##### End mouse events #####
+
+    ##### Painting #####
+    def invalidate(self):
+        """ Drops the cached background and schedules a full repaint. """
+        self.background = None
+        self.update()
+
+    def resizeEvent(self, event):
+        self.background = None
+
+    def paintEvent(self, event):
+        if self.background is None or self.background.size() != self.size():
+            self.background = QPixmap(self.size())
+            self.background.fill(Qt.white)
+            painter = QPainter(self.background)
+            self.drawBackground(painter)
+            painter.end()
+        rect = event.rect()
+        painter = QPainter(self)
+        painter.drawPixmap(rect, self.background, rect)
+        painter.setClipRect(self.plotRect().intersected(QRectF(rect)))
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.drawForeground(painter, rect)
+        painter.end()
+
+    def drawBackground(self, painter):
+        """ Draws the static content, by default just a frame. """
+        painter.setPen(QPen(Qt.black))
+        painter.drawRect(self.plotRect())
+
+    def drawForeground(self, painter, rect):
+        """ Draws the animated content within rect. """
+        pass
+
+    def drawXTicks(self, painter, low, high, label=None):
+        """ Draws ticks labelled from low to high along the bottom edge. """
+        rect = self.plotRect()
+        metrics = painter.fontMetrics()
+        for tick in niceTicks(low, high):
+            px = rect.left() + (tick - low)*rect.width()/(high - low)
+            painter.drawLine(QPointF(px, rect.bottom()),
+                             QPointF(px, rect.bottom() + 4))
+            text = "%g" % round(tick, 6)
+            painter.drawText(QPointF(px - metrics.width(text)/2,
+                                     rect.bottom() + 5 + metrics.ascent()), text)
+        if label is not None:
+            painter.drawText(QRectF(rect.left(), self.height() - metrics.height(),
+                                    rect.width(), metrics.height()),
+                             Qt.AlignCenter, label)
+
+    def drawYTicks(self, painter, label=None):
+        """ Draws ticks labelled with y data values along the left edge. """
+        rect = self.plotRect()
+        metrics = painter.fontMetrics()
+        for tick in niceTicks(self.y_low, self.y_high):
+            _, py = self.toPixels(self.x_low, tick)
+            painter.drawLine(QPointF(rect.left() - 4, py),
+                             QPointF(rect.left(), py))
+            text = "%g" % round(tick, 6)
+            painter.drawText(QPointF(rect.left() - 6 - metrics.width(text),
+                                     py + metrics.ascent()/2 - 1), text)
+        if label is not None:
+            painter.save()
+            painter.translate(metrics.height(), rect.center().y())
+            painter.rotate(-90)
+            painter.drawText(QRectF(-rect.height()/2, -metrics.height(),
+                                    rect.height(), metrics.height()),
+                             Qt.AlignCenter, label)
+            painter.restore()
+    ##### End painting #####
+
+
+class TrackCanvas(PainterCanvas):
+    """
+    QPainter version of TrackDrawMatplotlib.trackCanvas.
+
+    Arguments:
+        See PainterCanvas's doc string.
+
+    Attributes:
+        See PainterCanvas's doc string.
+        drawn (np.array) -- (n_tracks, track_npoints) copy of the track
+            points as currently drawn.
+        track_npoints (int) -- number of points in tracks
+        locked_track (int) -- current locked track
+        playhead_x (float) -- x position of the playhead in track
+            coordinates, or None if the playhead is hidden
+        marker_radius (float) -- radius of the track point markers in pixels.
+        view (tuple) -- (start, end) of the part of the tracks shown, as
+            fractions of their length.
+        requested_view (tuple) -- view asked for by the latest wheel event,
+            which may not be shown yet.
+    """
+    def __init__(self, parent=None, margins=(60, 10, 20, 30)):
+        PainterCanvas.__init__(self, parent, margins)
+        self.drawn = None
+        self.track_npoints = DEFAULT_PARAMS.track_npoints
+        self.locked_track = 0
+        self.playhead_x = None
+        self.marker_radius = 3.0
+        self.trackPen = QPen(QColor("blue"), 1.5)
+        self.playheadPen = QPen(QColor("white"), 1.5)
+        self.view = (0.0, 1.0)
+        self.requested_view = self.view
+        self.viewHandler = None
+
+    def clear(self):
+        self.drawn = None
+        self.invalidate()
+
+    def start(self, tracks):
+        """
+        Starts tracks.
+
+        Arguments:
+            tracks (TrackDrawData.TrackSet) -- tracks to be drawn.
+        """
+        self.drawn = np.array(tracks.points, dtype=np.float64)
+        self.x_low, self.x_high = self.xLimits()
+        self.invalidate()
+
+    def xLimits(self):
+        """ Returns the x-limits of the current view in track coordinates. """
+        return(self.view[0]*(self.track_npoints - 1),
+               self.view[1]*(self.track_npoints - 1))
+
+    def setView(self, view):
+        """ See TrackDrawMatplotlib.trackCanvas.setView(). """
+        self.view = tuple(view)
+        self.requested_view = self.view
+
+    def plotWidth(self):
+        """ Returns the width of the plotted area in pixels. """
+        return(int(self.plotRect().width()))
+
+    def connectView(self, handler):
+        """ See TrackDrawMatplotlib.trackCanvas.connectView(). """
+        self.viewHandler = handler
+
+    def wheelEvent(self, event):
+        if self.viewHandler is None:
+            return
+        delta = event.angleDelta()
+        pan = bool(event.modifiers() & Qt.ShiftModifier) or delta.y() == 0
+        steps = (delta.x() if delta.y() == 0 else delta.y())/120
+        rect = self.plotRect()
+        x_axes = (event.x() - rect.left())/rect.width()
+        fraction = self.view[0] + x_axes*(self.view[1] - self.view[0])
+        self.requested_view = scrollView(self.requested_view, fraction,
+                                         steps, pan=pan)
+        self.viewHandler(self.requested_view)
+
+    def mouse(self, event):
+        """ Converts mouse coordinates in pixels to data coordinates. """
+        x_loc, y_loc = self.toData(event.x, event.y)
+        if self.x_low < x_loc < self.x_high and self.y_low < y_loc < self.y_high:
+            return(x_loc, y_loc)
+
+    def updateCanvas(self, new_tracks=0, trackNo=0, redraw=False):
+        """
+        Animates canvas.
+
+        Arguments:
+            new_tracks (TrackDrawData.TrackSet) -- tracks to be drawn.
+            trackNo (int) -- index of track which has been updated.
+            redraw (boolean) -- if True, does not use new_tracks and trackNo
+                arguments to change a track.
+
+        If only points of the trackNo-th track changed, only the pixels
+        around the changed segments, before and after the change, are
+        repainted. Otherwise the whole canvas is repainted.
+        """
+        if (self.x_low, self.x_high) != self.xLimits():
+            self.x_low, self.x_high = self.xLimits()
+            self.invalidate()
+        if redraw:
+            self.update()
+            return
+        if self.drawn is None or self.drawn.shape != new_tracks.points.shape:
+            self.drawn = np.array(new_tracks.points, dtype=np.float64)
+            self.update()
+            return
+        new_row = new_tracks.points[trackNo]
+        changed = np.flatnonzero(self.drawn[trackNo] != new_row)
+        if len(changed) == 0:
+            return
+        lo = max(0, changed[0] - 1)
+        hi = min(self.track_npoints, changed[-1] + 2)
+        ys = np.concatenate((self.drawn[trackNo, lo:hi], new_row[lo:hi]))
+        self.drawn[trackNo] = new_row
+        (x0, x1), (y0, y1) = self.toPixels([lo, hi - 1], [ys.max(), ys.min()])
+        pad = self.marker_radius + self.trackPen.widthF() + 2
+        self.update(QRectF(x0 - pad, y0 - pad, x1 - x0 + 2*pad,
+                           y1 - y0 + 2*pad).toAlignedRect())
+
+    def updatePlayhead(self, fraction=None):
+        """
+        Moves the playhead.
+
+        Arguments:
+            fraction (float) -- playback position as a fraction of the
+                duration of the displayed sound. If None, the playhead is
+                hidden.
+        """
+        old_x = self.playhead_x
+        if fraction is None:
+            self.playhead_x = None
+        else:
+            self.playhead_x = fraction*(self.track_npoints - 1)
+        rect = self.plotRect()
+        for x in (old_x, self.playhead_x):
+            if x is not None:
+                px, _ = self.toPixels(x, 0)
+                self.update(QRectF(px - 3, rect.top(), 6,
+                                   rect.height()).toAlignedRect())
+
+    def drawForeground(self, painter, rect):
+        if self.enabled and self.drawn is not None:
+            # Only the columns within rect, plus one either side
+            c0, _ = self.toData(rect.left() - self.marker_radius, 0)
+            c1, _ = self.toData(rect.right() + self.marker_radius, 0)
+            c0 = max(0, int(np.floor(c0)) - 1)
+            c1 = min(self.drawn.shape[1], int(np.ceil(c1)) + 2)
+            cols = np.arange(c0, c1)
+            painter.setPen(self.trackPen)
+            painter.setBrush(QBrush(self.trackPen.color()))
+            r = self.marker_radius
+            for row in self.drawn[:, c0:c1]:
+                px, py = self.toPixels(cols, row)
+                painter.drawPolyline(toPolygon(px, py))
+                for x, y in zip(px, py):
+                    painter.drawEllipse(QPointF(x, y), r, r)
+        if self.playhead_x is not None:
+            px, _ = self.toPixels(self.playhead_x, 0)
+            plot = self.plotRect()
+            painter.setPen(self.playheadPen)
+            painter.drawLine(QPointF(px, plot.top()), QPointF(px, plot.bottom()))
+
+
+class SpecCanvas(TrackCanvas):
+    """
+    Contains tracks reflecting formant frequencies and plots spectrograms.
+
+    Attributes:
+        See TrackCanvas's and TrackDrawMatplotlib.SpecCanvas's doc strings.
+        image (QImage) -- current spectrogram, or None.
+        extent (tuple) -- (x_min, x_max, f_min, f_max) of the spectrogram in
+            seconds and Hz.
+        duration (float) -- duration of the sound shown in seconds, or None
+            if the spectrogram was plotted without a view.
+    """
+    def __init__(self, parent=None):
+        TrackCanvas.__init__(self, parent)
+        self.current_waveform = None
+        self.current_fs = None
+        self.y_high = DEFAULT_PARAMS.synth_fs/2
+        self.nformant = DEFAULT_PARAMS.nformant
+        self.image = None
+        self.extent = None
+        self.duration = None
+
+    def start(self, tracks):
+        self.image = None
+        TrackCanvas.start(self, tracks)
+
+    def plot_specgram(self, x_right=1.0, waveform=0, fs=0, window_len=256,
+                      noverlap=0.5, window_type="hanning", tracks=0,
+                      restart=False, specgram=None, view=None):
+        """
+        Plots spectrogram on spec_cv.
+
+        Arguments:
+            See TrackDrawMatplotlib.SpecCanvas.plot_specgram().
+
+        The spectrogram is converted to a QImage once, and scaled onto the
+        plotted area whenever the background is rebuilt.
+        """
+        if restart == False:
+            self.current_waveform = waveform
+            self.current_fs = fs
+            self.y_high = fs/2
+        self.duration = None
+        if view is not None:
+            self.setView(view)
+            self.duration = x_right
+        if specgram is None:
+            import analysis
+            specgram = analysis.spectrogram.specgram(self.current_waveform,
+                    self.current_fs, window_len, noverlap, window_type)
+        Z, self.extent = specgram
+        self.image = arrayToImage(Z)
+        if restart == False:
+            self.drawn = np.array(tracks.points, dtype=np.float64)
+        self.x_low, self.x_high = self.xLimits()
+        self.invalidate()
+
+    def viewSeconds(self):
+        """
+        Returns the part of the sound shown as (start, end) in seconds. The
+        whole extent of the spectrogram is shown unless a view was given.
+        """
+        if self.duration is None:
+            return(self.extent[0], self.extent[1])
+        return(self.view[0]*self.duration, self.view[1]*self.duration)
+
+    def drawBackground(self, painter):
+        rect = self.plotRect()
+        if self.image is not None:
+            t0, t1 = self.viewSeconds()
+            left = rect.left() + (self.extent[0] - t0)*rect.width()/(t1 - t0)
+            right = rect.left() + (self.extent[1] - t0)*rect.width()/(t1 - t0)
+            painter.save()
+            painter.setClipRect(rect)
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawImage(QRectF(left, rect.top(), right - left,
+                                     rect.height()), self.image)
+            painter.restore()
+        painter.setPen(QPen(Qt.black))
+        painter.drawRect(rect)
+        if self.extent is not None and self.image is not None:
+            t0, t1 = self.viewSeconds()
+            self.drawXTicks(painter, t0, t1, "Time [s]")
+        else:
+            self.drawXTicks(painter, self.x_low, self.x_high, "Time [s]")
+        self.drawYTicks(painter, "Frequency [Hz]")
+
+
+class F0Canvas(TrackCanvas):
+    """
+    Contains track representing an F0 contour.
+
+    Attributes:
+        See TrackCanvas's and TrackDrawMatplotlib.F0Canvas's doc strings.
+    """
+    def __init__(self, parent=None):
+        TrackCanvas.__init__(self, parent, margins=(60, 10, 20, 10))
+        self.y_low = 90
+        self.y_high = 150
+
+    def fitLimits(self, tracks, margin=10):
+        """
+        Widens the y-limits so that all points of tracks are visible.
+
+        Arguments:
+            tracks (TrackDrawData.TrackSet) -- tracks to be drawn.
+            margin (float) -- space in Hz left above and below the tracks.
+
+        The limits are never narrowed below the default 90-150 Hz range.
+        """
+        lowest = np.min(tracks.points)
+        highest = np.max(tracks.points)
+        self.y_low = min(90, lowest - margin)
+        self.y_high = max(150, highest + margin)
+        self.invalidate()
+
+    def drawBackground(self, painter):
+        PainterCanvas.drawBackground(self, painter)
+        self.drawYTicks(painter)
+
+
+class WaveCanvas(PainterCanvas):
+    """
+    Contains the waveform of the displayed sound.
+
+    Attributes:
+        See PainterCanvas's and TrackDrawMatplotlib.WaveCanvas's doc strings.
+
+    Waveforms with more samples than the plot has pixel columns are drawn as
+    one vertical min/max line per column.
+    """
+    def __init__(self, parent=None):
+        PainterCanvas.__init__(self, parent, margins=(60, 5, 20, 5))
+        self.current_waveform = None
+        self.selection = None
+        self.selection_anchor = None
+        self.playhead_x = None
+        self.connectMouse(self.onPress, self.onMotion, self.onRelease)
+
+    def clear(self):
+        self.current_waveform = None
+        self.selection = None
+        self.invalidate()
+
+    def plot_waveform(self, waveform):
+        self.selection = None
+        if self.enabled == False:
+            self.clear()
+            return
+        waveform = np.asarray(waveform, dtype=np.float64)
+        if waveform.ndim > 1:
+            waveform = np.mean(waveform, axis=1)
+        self.current_waveform = waveform
+        self.x_high = max(1, len(waveform) - 1)
+        peak = np.max(np.abs(waveform)) if len(waveform) else 0
+        self.y_low = -peak if peak > 0 else -1
+        self.y_high = peak if peak > 0 else 1
+        self.invalidate()
+
+    def drawBackground(self, painter):
+        PainterCanvas.drawBackground(self, painter)
+        waveform = self.current_waveform
+        if waveform is None or len(waveform) < 2:
+            return
+        rect = self.plotRect()
+        width = int(rect.width())
+        painter.setClipRect(rect)
+        painter.setPen(QPen(QColor("blue")))
+        if len(waveform) <= 2*width:
+            px, py = self.toPixels(np.arange(len(waveform)), waveform)
+            painter.drawPolyline(toPolygon(px, py))
+            return
+        # One min/max pair per pixel column
+        bounds = np.linspace(0, len(waveform), width + 1).astype(int)[0:-1]
+        lows = np.minimum.reduceat(waveform, bounds)
+        highs = np.maximum.reduceat(waveform, bounds)
+        px = rect.left() + np.arange(width) + 0.5
+        _, py_low = self.toPixels(0, lows)
+        _, py_high = self.toPixels(0, highs)
+        painter.drawLines([QLineF(x, y0, x, y1)
+                           for x, y0, y1 in zip(px, py_low, py_high)])
+
+    def drawForeground(self, painter, rect):
+        if self.current_waveform is None:
+            return
+        plot = self.plotRect()
+        n = len(self.current_waveform)
+        if self.selection is not None:
+            x0, _ = self.toPixels(self.selection[0]*n, 0)
+            x1, _ = self.toPixels(self.selection[1]*n, 0)
+            painter.fillRect(QRectF(x0, plot.top(), x1 - x0, plot.height()),
+                             QColor(255, 165, 0, 77))
+        if self.playhead_x is not None:
+            px, _ = self.toPixels(self.playhead_x, 0)
+            painter.setPen(QPen(QColor("red"), 1.5))
+            painter.drawLine(QPointF(px, plot.top()), QPointF(px, plot.bottom()))
+
+    def updateCanvas(self):
+        """ Redraws the selection and playhead over the background. """
+        self.update()
+
+    def updatePlayhead(self, fraction=None):
+        """
+        Moves the playhead.
+
+        Arguments:
+            fraction (float) -- playback position as a fraction of the
+                waveform's duration. If None, the playhead is hidden.
+        """
+        old_x = self.playhead_x
+        if fraction is None or self.current_waveform is None:
+            self.playhead_x = None
+        else:
+            self.playhead_x = fraction*len(self.current_waveform)
+        rect = self.plotRect()
+        for x in (old_x, self.playhead_x):
+            if x is not None:
+                px, _ = self.toPixels(x, 0)
+                self.update(QRectF(px - 3, rect.top(), 6,
+                                   rect.height()).toAlignedRect())
+
+    def getSelection(self):
+        """ Returns the selection as (start, end) fractions, or None. """
+        return(self.selection)
+
+    def mouseFraction(self, event):
+        """ Converts mouse x position in pixels to a fraction of duration. """
+        if self.current_waveform is None or len(self.current_waveform) < 2:
+            return(None)
+        x_loc, _ = self.toData(event.x, event.y)
+        return(min(max(x_loc/len(self.current_waveform), 0), 1))
+
+    def onPress(self, event):
+        self.selection_anchor = self.mouseFraction(event)
+        self.selection = None
+        self.updateCanvas()
+
+    def onMotion(self, event):
+        if self.selection_anchor is None or not event.button:
+            return
+        fraction = self.mouseFraction(event)
+        if fraction is None:
+            return
+        self.selection = (min(self.selection_anchor, fraction),
+                          max(self.selection_anchor, fraction))
+        self.updateCanvas()
+
+    def onRelease(self, event):
+        self.selection_anchor = None
+        if self.selection is not None and\
+                self.selection[1] - self.selection[0] < 1e-3:
+            self.selection = None
+            self.updateCanvas()
+
+
+class STFTCanvas(PainterCanvas):
+    """
+    Contains mag. spec. of small snippet of waveform around mouse cursor.
+
+    Attributes:
+        See PainterCanvas's and TrackDrawMatplotlib.STFTCanvas's doc strings.
+    """
+    def __init__(self, parent=None):
+        PainterCanvas.__init__(self, parent, margins=(5, 10, 5, 10))
+        self.stft_size = DEFAULT_PARAMS.stft_size
+        self.current_stft = None
+        self.x_low = -20
+        self.x_high = 40
+
+    def start(self, restart=False):
+        self.y_high = self.stft_size
+        if not restart:
+            self.current_stft = None
+        self.invalidate()
+
+    def update_stft(self, new_stft=0):
+        self.current_stft = np.asarray(new_stft)[0:-1]
+        self.update()
+
+    def drawForeground(self, painter, rect):
+        if not self.enabled or self.current_stft is None:
+            return
+        px, py = self.toPixels(self.current_stft,
+                               np.arange(len(self.current_stft)))
+        painter.setPen(QPen(QColor("blue")))
+        painter.drawPolyline(toPolygon(px, py))
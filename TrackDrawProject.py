@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Project files for TrackDraw 2016.
+
+A project is saved as three files next to each other:
+    name.tdp -- small JSON header with the Parameters, the breakpoints of all
+        tracks, and where the samples of each sound are.
+    name.tdp.audio.N -- raw float32 samples of the loaded and synthesized
+        sounds. Each sound starts at a multiple of BLOCK_ALIGN bytes, so it
+        can be memory-mapped on its own. N is the generation of the file,
+        see below.
+    name.tdp.journal -- append-only log of the changes made since the header
+        was written, one JSON record per line.
+
+Opening a project only reads the header and the journal, so the tracks can
+be shown right away. The sounds are memory-mapped, and their samples are
+read from disk once something needs them.
+
+Autosave never rewrites the project: every undoable track edit is appended
+to the journal as a small record. Once the journal grows past a limit it is
+compacted, i.e. a new header holding the current state is written next to
+the old one and moved over it, and the records it covers are dropped from
+the journal. Every record carries a sequence number and the header stores
+the last one it includes, so a crash between those two steps only leaves
+records that are skipped on the next open. The audio file is only written
+by save(), and only for sounds that changed since the last save.
+
+The audio file is never overwritten in place, since the open session may
+have sounds memory-mapped from it, and Windows doesn't allow replacing or
+deleting a mapped file. Instead every write goes to a new file with the
+next generation number, which the header then refers to. Files of older
+generations are deleted once the header no longer refers to them, or, if
+they are still mapped, the next time the project is saved or opened.
+
+This module doesn't use Qt, so projects can also be read from scripts.
+"""
+
+import glob
+import json
+import os
+import threading
+import numpy as np
+
+import TrackDrawData as TDD
+
+
+FORMAT_VERSION = 1
+BLOCK_ALIGN = 4096
+SOUNDS = ("loaded_sound", "synth_sound")
+
+
+class ProjectError(Exception):
+    """ Raised when a project file can't be read. """
+    pass
+
+
+def parmsToJSON(parms):
+    """ Returns the fields of a Parameters object as a JSON-able dict. """
+    out = {}
+    for name, _ in parms.FIELDS:
+        value = getattr(parms, name)
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        out[name] = value
+    return(out)
+
+
+def parmsFromJSON(fields):
+    """
+    Returns a Parameters object with the fields stored by parmsToJSON().
+    Fields this version doesn't know are ignored.
+    """
+    known = {name: value for name, value in fields.items()
+             if name in TDD.Parameters.TYPES}
+    return(TDD.Parameters(**known))
+
+
+def tracksToJSON(tracks):
+    """ Returns the breakpoints and grid of a TrackSet as a JSON-able dict. """
+    return({"track_npoints": tracks.track_npoints,
+            "tracks": [[track.times, track.values] for track in tracks]})
+
+
+def tracksFromJSON(data):
+    """ Returns a TrackSet stored by tracksToJSON(). """
+    return(TDD.TrackSet(tracks=[TDD.Track(values, times)
+                                for times, values in data["tracks"]],
+                        track_npoints=data["track_npoints"]))
+
+
+def writeFileAtomic(path, data):
+    """ Replaces the file at path with data (bytes), never partially. """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Project:
+    """
+    A project on disk, see the module doc string for the format.
+
+    Arguments:
+        path (str) -- path of the header file, conventionally ending in .tdp.
+            The audio and journal files are named after it.
+        compact_bytes (int) -- size of the journal in bytes above which
+            append() asks for compaction.
+
+    Attributes:
+        seq (int) -- sequence number of the last record appended.
+        header_seq (int) -- last sequence number included in the header.
+        generation (int) -- generation of the audio file, 0 before any
+            audio was written.
+        audio_path (str) -- path of the audio file of that generation.
+
+    append() is called from the GUI thread while save() and compact() may run
+    in a background job, so the journal is only touched with lock held.
+    Saves and compactions are serialized by write_lock.
+    """
+    def __init__(self, path, compact_bytes=256*1024):
+        self.path = path
+        self.generation = 0
+        self.audio_path = self.generationPath(0)
+        self.journal_path = path + ".journal"
+        self.compact_bytes = compact_bytes
+        self.seq = 0
+        self.header_seq = 0
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.journal = None
+        self.parms_digest = None
+        # Sounds already in the audio file, and their blocks
+        self.written = {}
+        self.blocks = {}
+
+    ##### Opening #####
+    @classmethod
+    def open(cls, path, **kwarg):
+        """
+        Reads a project.
+
+        Returns (project, session), where session is a TrackDrawData.Session
+        holding the saved state with all journal records applied. Its sounds
+        are memory-mapped from the audio file.
+        """
+        project = cls(path, **kwarg)
+        try:
+            with open(path, "r") as f:
+                header = json.load(f)
+        except (OSError, ValueError) as err:
+            raise ProjectError("Can't read project " + path + ": " + str(err))
+        if header.get("version", 0) > FORMAT_VERSION:
+            raise ProjectError(path + " was saved by a newer TrackDraw")
+        session = TDD.Session(parmsFromJSON(header["parms"]))
+        session.tracks = tracksFromJSON(header["tracks"])
+        session.f0_track = tracksFromJSON(header["f0_track"])
+        project.generation = header.get("generation", 0)
+        project.audio_path = project.generationPath(project.generation)
+        for name in SOUNDS:
+            block = header["sounds"].get(name)
+            if block is not None:
+                setattr(session, name, project.mapSound(block))
+                project.blocks[name] = block
+                project.written[name] = getattr(session, name)
+        project.header_seq = project.seq = header.get("seq", 0)
+        project.removeStale()
+        project.replay(session)
+        project.parms_digest = session.parms.digest
+        project.journal = open(project.journal_path, "a")
+        return(project, session)
+
+    def generationPath(self, generation):
+        """ Returns the path of the audio file of a generation. """
+        return(self.path + ".audio." + str(generation))
+
+    def removeStale(self):
+        """
+        Deletes the audio files of every generation but the current one,
+        including those left behind by a save that didn't finish. Files
+        which can't be deleted yet, e.g. because they are still
+        memory-mapped on Windows, are left for a later call.
+        """
+        for stale in glob.glob(glob.escape(self.path) + ".audio.*"):
+            if stale != self.audio_path:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def mapSound(self, block):
+        """ Returns a Sound whose waveform is memory-mapped from a block. """
+        shape = (block["nsamples"],)
+        if block["nchannels"] > 1:
+            shape = (block["nsamples"], block["nchannels"])
+        if block["nsamples"] == 0:
+            waveform = np.zeros(shape, dtype=np.float32)
+        else:
+            waveform = np.memmap(self.audio_path, dtype=np.float32, mode="r",
+                                 offset=block["offset"], shape=shape)
+        return(TDD.Sound(waveform, block["fs"], block["nchannels"]))
+
+    def replay(self, session):
+        """
+        Applies the journal records newer than the header to session.
+
+        A record cut short by a crash is dropped from the journal, so that
+        records appended later can be read again.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        end = 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete record")
+                    record = json.loads(line.decode())
+                except ValueError:
+                    break
+                end = end + len(line)
+                if record["seq"] <= self.header_seq:
+                    continue
+                applyRecord(session, record)
+                self.seq = record["seq"]
+        if end != os.path.getsize(self.journal_path):
+            os.truncate(self.journal_path, end)
+    ##### End opening #####
+
+    ##### Saving #####
+    def create(self):
+        """
+        Starts a new, empty journal. Called before the first save() of a new
+        project, so edits made while it runs are already journaled.
+        """
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+            self.journal = open(self.journal_path, "w")
+            self.seq = 0
+            self.header_seq = 0
+            self.written = {}
+            self.blocks = {}
+
+    def save(self, snapshot, seq):
+        """
+        Writes a full header and any sounds not yet in the audio file.
+
+        Arguments:
+            snapshot (TrackDrawData.Snapshot) -- state to be saved.
+            seq (int) -- value of self.seq when snapshot was taken. Journal
+                records up to seq are dropped, newer ones are kept.
+
+        Can run in a background job. Rewrites the audio file only if a sound
+        was replaced since the last save.
+        """
+        sounds = {name: getattr(snapshot, name) for name in SOUNDS}
+        with self.write_lock:
+            if any(self.written.get(name) is not sound
+                   for name, sound in sounds.items()):
+                self.blocks = self.writeAudio(sounds)
+                self.written = sounds
+        self.compact(snapshot, seq)
+
+    def writeAudio(self, sounds):
+        """
+        Writes sounds to the audio file of the next generation, returns
+        their blocks. The header still refers to the current generation
+        until writeHeader() is called.
+        """
+        blocks = {}
+        path = self.generationPath(self.generation + 1)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            for name, sound in sounds.items():
+                pad = -f.tell() % BLOCK_ALIGN
+                f.write(b"\0"*pad)
+                waveform = np.ascontiguousarray(sound.waveform,
+                                                dtype=np.float32)
+                blocks[name] = {"offset": f.tell(),
+                                "nsamples": sound.nsamples,
+                                "nchannels": sound.nchannels,
+                                "fs": sound.fs}
+                f.write(waveform.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self.generation = self.generation + 1
+        self.audio_path = path
+        return(blocks)
+
+    def compact(self, snapshot, seq):
+        """
+        Writes a new header with the state of snapshot, then drops the
+        journal records it includes, see save() for the arguments.
+        """
+        with self.write_lock:
+            if seq < self.header_seq:
+                # A newer state has been written already
+                return
+            self.writeHeader(snapshot, seq)
+
+    def writeHeader(self, snapshot, seq):
+        header = {"version": FORMAT_VERSION,
+                  "seq": seq,
+                  "generation": self.generation,
+                  "parms": parmsToJSON(snapshot.parms),
+                  "tracks": tracksToJSON(snapshot.tracks),
+                  "f0_track": tracksToJSON(snapshot.f0_track),
+                  "sounds": self.blocks}
+        writeFileAtomic(self.path, json.dumps(header).encode())
+        with self.lock:
+            self.header_seq = seq
+            self.journal.close()
+            kept = []
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        if json.loads(line)["seq"] > seq:
+                            kept.append(line)
+                    except ValueError:
+                        break
+            writeFileAtomic(self.journal_path, "".join(kept).encode())
+            self.journal = open(self.journal_path, "a")
+        self.removeStale()
+
+    def append(self, records, parms=None):
+        """
+        Appends records to the journal.
+
+        Arguments:
+            records (list) -- dicts made by editRecord() or tracksRecord().
+            parms (TrackDrawData.Parameters) -- if given and changed since it
+                was last journaled, a parms record is appended too.
+
+        Returns True if the journal is now large enough to be compacted.
+        """
+        if parms is not None and parms.digest != self.parms_digest:
+            records = records + [{"op": "parms",
+                                  "parms": parmsToJSON(parms)}]
+            self.parms_digest = parms.digest
+        with self.lock:
+            for record in records:
+                self.seq = self.seq + 1
+                record["seq"] = self.seq
+                self.journal.write(json.dumps(record) + "\n")
+            self.journal.flush()
+            return(self.journal.tell() > self.compact_bytes)
+
+    def close(self):
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+    ##### End saving #####
+
+
+##### Journal records #####
+def editRecord(edit, which=1):
+    """
+    Returns a record of one TrackDrawHistory.Edit, holding the breakpoints
+    its span of the track was left with.
+
+    Arguments:
+        edit (TrackDrawHistory.Edit) -- the edit.
+        which (int) -- 1 if the edit was done or redone, 0 if undone.
+    """
+    times, values = edit.breakpoints[which]
+    return({"op": "edit", "target": edit.target, "track": int(edit.trackNo),
+            "span": list(edit.span), "times": times, "values": values})
+
+def tracksRecord(target, tracks):
+    """ Returns a record replacing all tracks of target, "FF" or "F0". """
+    return({"op": "tracks", "target": target,
+            "tracks": tracksToJSON(tracks)})
+
+def applyRecord(session, record):
+    """ Applies one journal record to a TrackDrawData.Session. """
+    op = record["op"]
+    if op == "parms":
+        session.parms = parmsFromJSON(record["parms"])
+        return
+    if op == "tracks":
+        tracks = tracksFromJSON(record["tracks"])
+        if record["target"] == "F0":
+            session.f0_track = tracks
+        else:
+            session.tracks = tracks
+        return
+    if op == "edit":
+        tracks = session.f0_track if record["target"] == "F0" \
+                 else session.tracks
+        tracks[record["track"]].replace(record["times"], record["values"],
+                                        record["span"])
+##### End journal records #####
@@ -2,44 +2,158 @@
 # -*- coding: utf-8 -*-
 
 import TrackDrawData as TDD
+import TrackDrawJobs as TDJ
+import TrackDrawAudio as TDA
+import TrackDrawHistory as TDH
+import TrackDrawProject as TDPR
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.mlab as mlab
-import time
 import copy
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from scipy import signal
-from scipy.io import wavfile
-import synth
-
-# Check operating system, import playback library accordingly
-import platform
-if platform.system() == "Windows":
-    print("System recognized as Windows. Using sounddevice as playback library.")
-    try:
-        import sounddevice as sd
-    except ImportError:
-        print("sounddevice not installed. Please install sounddevice and try again.")
-        sys.exit()
-elif platform.system() == "Mac":
-    print("Sorry, Mac is not supported at this time.")
-    sys.exit()
-elif platform.system() == "Linux":
-    print("System recognized as Linux. Using sounddevice as playback library.")
+import os
+import threading
+# SciPy, synth, analysis and sounddevice are slow to import, so they are
+# imported where they are first used instead of here.
+
+
+def checkPlatform():
+    """
+    Checks the operating system and the playback library.
+
+    Returns None if sound can be played, otherwise a message saying why not.
+    Called before the first playback rather than at startup, since importing
+    sounddevice is slow.
+    """
+    import platform
+    if platform.system() == "Mac":
+        return("Sorry, Mac is not supported at this time.")
+    elif platform.system() in ("Windows", "Linux"):
+        print("System recognized as " + platform.system() +
+              ". Using sounddevice as playback library.")
+        try:
+            import sounddevice
+        except (ImportError, OSError):
+            return("sounddevice not installed. Please install sounddevice "
+                   "and try again.")
+    return(None)
+
+
+##### Job functions #####
+# These run in worker threads (see TrackDrawJobs) and must not touch widgets.
+def loadSound(job, fname, parms):
+    """
+    Reads and resamples a wave file and estimates its F0.
+
+    Returns (waveform, fs, f0_points, source, source_fs), where
+    source are the file's samples, memory-mapped if the format allows it.
+    """
+    from scipy import signal
+    from scipy.io import wavfile
+    import analysis
     try:
-        import sounddevice as sd
-    except ImportError:
-        print("sounddevice not installed. Please install sounddevice and try again.")
-        sys.exit()
+        old_fs, x = wavfile.read(fname, mmap=True)
+    except ValueError:
+        old_fs, x = wavfile.read(fname)
+    new_fs = parms.resample_fs
+    new_n  = round(new_fs/old_fs*len(x))
+    new_x  = signal.resample(x, new_n)
+    job.check()
+    mono = new_x if new_x.ndim == 1 else np.mean(new_x, axis=1)
+    f0_points = analysis.pitch.f0_track(mono, new_fs, parms.track_npoints,
+                                        f0_min=parms.f0_min,
+                                        f0_max=parms.f0_max,
+                                        threshold=parms.f0_threshold,
+                                        default=parms.F0)
+    return(new_x, new_fs, f0_points, x, old_fs)
+
+def synthesizeSound(job, snapshot):
+    """ Synthesizes a TrackDrawData.Snapshot, returns the waveform. """
+    import synth
+    return(synth.synthesize(snapshot, progress=job.report))
+
+def exportWav(job, path, sound, snapshot, sample_format, normalize):
+    """
+    Writes a TrackDrawData.Sound, or else the synthesis of a
+    TrackDrawData.Snapshot as it is produced, to a WAV file.
+
+    Returns the statistics returned by TrackDrawAudio.writeWav().
+    """
+    import synth
+    if sound is not None:
+        source, fs, nchannels, peak = (sound.waveform, sound.fs,
+                                       sound.nchannels, sound.peak)
+        total = sound.nsamples
+    else:
+        source = synth.synthesize_stream(snapshot)
+        fs, nchannels, peak = snapshot.parms.synth_fs, 1, None
+        total = round(snapshot.parms.dur*fs)
+    def progress(nsamples):
+        job.report(nsamples/max(total, 1))
+    return(TDA.writeWav(path, source, fs, nchannels, sample_format,
+                        normalize=normalize, peak=peak, progress=progress))
+
+def saveProjectJob(job, project, snapshot, seq):
+    """ Saves a TrackDrawData.Snapshot to a TrackDrawProject.Project. """
+    project.save(snapshot, seq)
+
+def computeTiles(job, tiled, level, indices):
+    """
+    Computes tiles of an analysis.tiles.TiledSpecgram, returns a list of
+    (index, tile) pairs to be stored from the GUI thread.
+    """
+    tiles = []
+    for index in indices:
+        job.check()
+        tiles.append((index, tiled.compute_tile(level, index)))
+    return(tiles)
+
+def fitTracksJob(job, snapshot, stop):
+    """
+    Runs analysis.fitting.fit_tracks() on the loaded sound and tracks of a
+    TrackDrawData.Snapshot, reporting each round as progress.
+
+    The fit stops early, keeping its best result so far, once the stop
+    event is set.
+    """
+    import analysis
+    def progress(iteration, distance, step):
+        job.report((iteration, distance, step))
+        return(not (stop.is_set() or job.cancelled))
+    nformant = snapshot.parms.nformant
+    return(analysis.fitting.fit_tracks(snapshot.parms, snapshot.loaded_sound,
+                                       snapshot.tracks[0:nformant],
+                                       snapshot.f0_track, progress=progress))
+##### End job functions #####
 
 
 class Slots:
-
-    def __init__(self, master):
+    """
+    Slots for the widgets of a TrackDraw main window.
+
+    Arguments:
+        master (MainWindow) -- window whose widgets are updated.
+        session (TrackDrawData.Session) -- document edited through the
+            window, defaults to a new Session.
+    """
+    def __init__(self, master, session=None):
         self.master = master
+        if session is None:
+            session = TDD.Session()
+        self.session = session
+        self.jobs = TDJ.JobManager(master)
+        self.player = TDA.Player()
+        self.history = TDH.EditHistory()
+        # Open project, autosaved to as tracks are edited
+        self.project = None
+        # Spectrogram tiles of all sounds, created once first needed
+        self.tileCache = None
+        self.playbackChecked = False
+        # Last handled drag position, (plot, x_loc, y_loc)
+        self.dragFrom = None
+        self.playTimer = QTimer(master)
+        self.playTimer.setInterval(30)
+        self.playTimer.timeout.connect(self.updatePlayhead)
 
     ##### File management slots ####
     @pyqtSlot()
@@ -47,28 +161,140 @@ class Slots:
         fname = QFileDialog.getOpenFileName(parent, "Open a wave file", "",
                 "Wav files (*.wav)")
         if fname[0]:
-            old_fs, x = wavfile.read(fname[0])
-            new_fs = TDD.DEFAULT_PARAMS.resample_fs
-            new_n  = round(new_fs/old_fs*len(x))
-            new_x  = signal.resample(x, new_n)
-            TDD.LOADED_SOUND.waveform = new_x
-            TDD.LOADED_SOUND.fs = new_fs
+            parms = self.session.parms.replace(
+                        resample_fs=TDD.DEFAULT_PARAMS.resample_fs,
+                        F0=TDD.DEFAULT_PARAMS.F0)
+            self.master.statusBar().showMessage("Loading " + fname[0] + "...")
+            self.jobs.submit("open", loadSound, args=(fname[0], parms),
+                             on_done=self.audioOpened,
+                             on_error=self.jobFailed,
+                             priority=TDJ.JobManager.BACKGROUND)
+
+    def audioOpened(self, result):
+        """
+        Applies the result of a loadSound job, see audioOpen().
+
+        Arguments:
+            result (tuple) -- return value of loadSound().
+        """
+        waveform, fs, f0_points, source, source_fs = result
+        nchannels = 1 if waveform.ndim == 1 else waveform.shape[1]
+        sound = TDD.Sound(waveform, fs, nchannels, source=source,
+                          source_fs=source_fs)
+        self.session.loaded_sound = sound
+        self.setF0Track(f0_points)
+        self.master.cw.spec_cv.setView((0.0, 1.0))
+        self.master.cw.f0_cv.setView((0.0, 1.0))
         if self.master.displayDock.loadedRadioButton.isChecked():
-            self.master.cw.spec_cv.plot_specgram(TDD.LOADED_SOUND.dur,
-                                                 TDD.LOADED_SOUND.waveform,
-                                                 TDD.LOADED_SOUND.fs,
-                                                 TDD.CURRENT_PARAMS.window_len,
-                                                 TDD.CURRENT_PARAMS.noverlap,
-                                                 TDD.CURRENT_PARAMS.window_type,
-                                                 TDD.TRACKS)
-            self.master.cw.wave_cv.plot_waveform(TDD.LOADED_SOUND.waveform)
+            self.pushDisplayUpdates(sound)
+        self.master.statusBar().showMessage("Loaded sound", 5000)
 
     @pyqtSlot()
     def audioSave(self, *arg, parent=None, **kwarg):
+        """
+        Saves the synthesized sound as a WAV file.
+
+        The sample format and normalization are chosen through the file
+        type filter. The file is written in a background job, see
+        exportWav(). If nothing has been synthesized yet, the current tracks
+        are synthesized straight into the file.
+        """
+        filters = ["16-bit WAV, normalized (*.wav)",
+                   "24-bit WAV, normalized (*.wav)",
+                   "32-bit float WAV, normalized (*.wav)",
+                   "32-bit float WAV, unscaled (*.wav)"]
+        formats = [("int16", True), ("int24", True), ("float32", True),
+                   ("float32", False)]
         fname = QFileDialog.getSaveFileName(parent, "Save the synthesized sound",
-                "", "Wav files (*.wav)")
-        if fname[0]:
-            print(fname)
+                "", ";;".join(filters))
+        if not fname[0]:
+            return
+        path = fname[0]
+        if not path.lower().endswith(".wav"):
+            path = path + ".wav"
+        sample_format, normalize = formats[filters.index(fname[1])] \
+                if fname[1] in filters else formats[0]
+        sound = self.session.synth_sound
+        snapshot = None
+        if sound.nsamples <= 1:
+            sound = None
+            snapshot = self.synthesisSnapshot()
+        def progress(fraction):
+            self.master.statusBar().showMessage("Saving " + path + "... "
+                                                + str(int(fraction*100)) + "%")
+        def done(stats):
+            self.master.statusBar().showMessage("Saved %s (%.1f s of audio, "
+                    "%.1f MB/s, %.0fx real time)" % (path, stats["seconds"],
+                    stats["mb_per_s"], stats["realtime"]), 5000)
+        self.jobs.submit("export", exportWav,
+                         args=(path, sound, snapshot, sample_format,
+                               normalize),
+                         on_done=done, on_progress=progress,
+                         on_error=self.jobFailed,
+                         priority=TDJ.JobManager.BACKGROUND)
+
+    @pyqtSlot()
+    def projectOpen(self, *arg, parent=None, **kwarg):
+        """
+        Opens a project, see TrackDrawProject.
+
+        Tracks and parameters are shown right away. The sounds are
+        memory-mapped, so the spectrogram of the displayed one is computed
+        in a background job as usual.
+        """
+        fname = QFileDialog.getOpenFileName(parent, "Open a project", "",
+                "TrackDraw projects (*.tdp)")
+        if not fname[0]:
+            return
+        try:
+            project, session = TDPR.Project.open(fname[0])
+        except (TDPR.ProjectError, OSError, KeyError) as err:
+            QMessageBox.warning(self.master, "Open project", str(err))
+            return
+        self.jobs.cancelAll()
+        if self.project is not None:
+            self.project.close()
+        self.project = project
+        # The window keeps its Session, which takes on the opened state
+        self.session.parms = session.parms
+        self.session.tracks = session.tracks
+        self.session.f0_track = session.f0_track
+        self.session.loaded_sound = session.loaded_sound
+        self.session.synth_sound = session.synth_sound
+        self.history.clear()
+        self.showParameters()
+        self.master.cw.f0_cv.fitLimits(self.session.f0_track)
+        self.master.cw.spec_cv.setView((0.0, 1.0))
+        self.master.cw.f0_cv.setView((0.0, 1.0))
+        self.pushDisplayUpdates(self.getCurrentSound())
+        self.master.setWindowTitle("TrackDraw - "
+                                   + os.path.basename(fname[0]))
+        self.master.statusBar().showMessage("Opened " + fname[0], 5000)
+
+    @pyqtSlot()
+    def projectSave(self, *arg, parent=None, **kwarg):
+        """ Saves the open project, or asks for a file name if none is. """
+        if self.project is None:
+            self.projectSaveAs(parent=parent)
+        else:
+            self.saveProject()
+
+    @pyqtSlot()
+    def projectSaveAs(self, *arg, parent=None, **kwarg):
+        """ Saves the session as a new project. """
+        fname = QFileDialog.getSaveFileName(parent, "Save the project", "",
+                "TrackDraw projects (*.tdp)")
+        if not fname[0]:
+            return
+        path = fname[0]
+        if not path.endswith(".tdp"):
+            path = path + ".tdp"
+        if self.project is not None:
+            self.project.close()
+        self.project = TDPR.Project(path)
+        self.project.create()
+        self.saveProject()
+        self.master.setWindowTitle("TrackDraw - " + os.path.basename(path))
     ##### End file management slots #####
 
 
@@ -88,15 +314,13 @@ class Slots:
 
         TODO -- need to find a better way to do this
         """
-        # Reset params
-        TDD.CURRENT_PARAMS = copy.deepcopy(TDD.DEFAULT_PARAMS)
-        # Reset tracks
-        F0 = TDD.DEFAULT_PARAMS.F0
-        allFF = TDD.DEFAULT_PARAMS.FF
-        TDD.F0_TRACK =  [TDD.Track(F0*np.ones([TDD.DEFAULT_PARAMS.track_npoints]))]
-        TDD.TRACKS   = [TDD.Track(FF*np.ones([TDD.DEFAULT_PARAMS.track_npoints])) for FF in allFF]
-        self.master.cw.spec_cv.start(TDD.TRACKS)
-        self.master.cw.f0_cv.start(TDD.F0_TRACK)
+        # Reset params and tracks
+        self.session.parms = copy.copy(TDD.DEFAULT_PARAMS)
+        self.session.resetTracks()
+        self.history.clear()
+        self.autosave()
+        self.master.cw.spec_cv.start(self.session.tracks)
+        self.master.cw.f0_cv.start(self.session.f0_track)
         # Reset sliders
         keys = self.master.displayDock.trackGroup.keys
         for i in range(len(keys)):
@@ -124,6 +348,21 @@ class Slots:
         self.master.analysisDock.windowComboBox.setCurrentIndex(0)
         self.master.synthesisDock.methodComboBox.setCurrentIndex(0)
         self.master.synthesisDock.nformantComboBox.setCurrentIndex(4)
+        self.master.synthesisDock.sineModeComboBox.setCurrentIndex(0)
+
+    @pyqtSlot()
+    def undo(self, *arg, **kwarg):
+        """ Undoes the most recent track edit. """
+        edits = self.history.undo(self.getTracks)
+        self.redrawEdits(edits)
+        self.autosave(edits, which=0)
+
+    @pyqtSlot()
+    def redo(self, *arg, **kwarg):
+        """ Redoes the most recently undone track edit. """
+        edits = self.history.redo(self.getTracks)
+        self.redrawEdits(edits)
+        self.autosave(edits)
     ##### End misc slots #####
 
 
@@ -137,7 +376,7 @@ class Slots:
             button, why is there a clear button?
         """
         self.master.cw.wave_cv.clear()
-        self.master.cw.spec_cv.start(TDD.TRACKS)
+        self.master.cw.spec_cv.start(self.session.tracks)
 
     @pyqtSlot()
     def enableTracks(self, *arg, **kwarg):
@@ -157,8 +396,7 @@ class Slots:
             matplotlib is really slow by default. maybe we can convert wave
             canvas to be animated as well if it would help.
         """
-        waveform, fs, dur = self.getCurrentWaveform()
-        self.pushDisplayUpdates(waveform, fs, dur)
+        self.pushDisplayUpdates(self.getCurrentSound())
 
     @pyqtSlot()
     def enableWave(self, *arg, **kwarg):
@@ -202,50 +440,53 @@ class Slots:
             curr_index (int) -- comes from combobox, indicates how many tracks
                 are to be used. Number of tracks is curr_index + 1.
 
-        changeNoTracks updates spec_cv's nformant and CURRENT_PARAMS's nformant
-        and then properly removes or appends Track objects from/to TRACKS. Once
-        the nformant variables and TRACKS are properly updated, the current
-        waveform is grabbed and spec_cv/wave_cv are updated accordingly.
+        changeNoTracks updates spec_cv's nformant and the session's nformant
+        and then properly removes or appends tracks from/to the session's
+        tracks. Once the nformant variables and tracks are properly updated,
+        the current waveform is grabbed and spec_cv/wave_cv are updated accordingly.
         """
         new_nformant = curr_index + 1
-        if self.master.cw.spec_cv.nformant > new_nformant:
-            TDD.TRACKS = TDD.TRACKS[0:new_nformant]
-        elif self.master.cw.spec_cv.nformant < new_nformant:
-            difference = abs(self.master.cw.spec_cv.nformant - new_nformant)
-            if difference == 1:
-                TDD.TRACKS.append(TDD.Track(np.ones([TDD.DEFAULT_PARAMS.track_npoints])*
-                                                    TDD.DEFAULT_PARAMS.FF[curr_index]))
-            elif difference > 1:
-                old_index = self.master.cw.spec_cv.nformant
-                for i in range(difference):
-                    TDD.TRACKS.append(TDD.Track(np.ones([TDD.DEFAULT_PARAMS.track_npoints])*
-                                                        TDD.DEFAULT_PARAMS.FF[old_index+i]))
+        self.session.tracks.changeNoTracks(new_nformant, TDD.DEFAULT_PARAMS.FF)
+        self.history.clear()
+        self.master.cw.spec_cv.locked_track = min(
+                self.master.cw.spec_cv.locked_track, new_nformant - 1)
         # Need to update both spec_cv's nformant and current_param's nformant
         self.master.cw.spec_cv.nformant = new_nformant
-        TDD.CURRENT_PARAMS.nformant = new_nformant
-        waveform, fs, dur = self.getCurrentWaveform()
-        self.pushDisplayUpdates(waveform, fs, dur)
+        self.session.parms.nformant = new_nformant
+        self.autosave()
+        self.pushDisplayUpdates(self.getCurrentSound())
 
     @pyqtSlot()
     def enableBubble(self, *arg, **kwarg):
+        """
+        Enables or disables track bubbles.
+
+        When bubbles are enabled, the tracks are immediately pushed apart so that
+        they respect the current bubble size.
+        """
         if self.master.displayDock.trackBubbleCheckBox.isChecked():
-            TDD.CURRENT_PARAMS.track_bubble = True
-        elif self.master.displayDock.trackBubbleCheckBox.isChecked():
-            TDD.CURRENT_PARAMS.track_bubble = False
+            self.session.parms.track_bubble = True
+            old_tracks = self.session.tracks.copy()
+            self.session.tracks.enforceBubbles(self.session.parms.bubble_len)
+            self.history.recordTracks("FF", old_tracks, self.session.tracks)
+            self.autosave()
+            for i in range(len(self.session.tracks)):
+                self.master.cw.spec_cv.updateCanvas(self.session.tracks, i)
+        else:
+            self.session.parms.track_bubble = False
 
     @pyqtSlot()
     def changeTracks(self, *arg, **kwarg):
-        TDD.CURRENT_PARAMS.bubble_len = self.master.displayDock.trackGroup.sliders["Bubble size"].value()
+        self.session.parms.bubble_len = self.master.displayDock.trackGroup.sliders["Bubble size"].value()
         new_track_npoints = self.master.displayDock.trackGroup.sliders["Number of points"].value()
-        if new_track_npoints != TDD.CURRENT_PARAMS.track_npoints:
-            TDD.CURRENT_PARAMS.track_npoints = new_track_npoints
+        if new_track_npoints != self.session.parms.track_npoints:
+            self.session.parms.track_npoints = new_track_npoints
             self.master.cw.spec_cv.track_npoints = new_track_npoints
             self.master.cw.f0_cv.track_npoints = new_track_npoints
-            for i in range(len(TDD.TRACKS)):
-                TDD.TRACKS[i].changeNoPoints(new_track_npoints)
-            TDD.F0_TRACK[0].changeNoPoints(new_track_npoints)
-            waveform, fs, dur = self.getCurrentWaveform()
-            self.pushDisplayUpdates(waveform, fs, dur)
+            self.session.tracks.changeNoPoints(new_track_npoints)
+            self.session.f0_track.changeNoPoints(new_track_npoints)
+            self.autosave()
+            self.pushDisplayUpdates(self.getCurrentSound())
 
     @pyqtSlot()
     def onResize(self, *arg, **kwarg):
@@ -256,8 +497,7 @@ class Slots:
         grabbed and sent to the pushDisplayUpdates function, which restarts
         all animated plots so that their backgrounds are appropriately updated.
         """
-        waveform, fs, dur = self.getCurrentWaveform()
-        self.pushDisplayUpdates(waveform, fs, dur)
+        self.pushDisplayUpdates(self.getCurrentSound())
     ##### End display slots #####
 
 
@@ -266,12 +506,34 @@ class Slots:
     def applyAnalysis(self, *arg, **kwarg):
         """
         Updates spec_cv and stft_cv to reflect analysis parameter changes.
+
+        The spectrogram of the current view is recomputed with the new
+        settings, see showSpecgram().
         """
-        self.master.cw.spec_cv.plot_specgram(window_len=TDD.CURRENT_PARAMS.window_len,
-                                             window_type=TDD.CURRENT_PARAMS.window_type,
-                                             noverlap=TDD.CURRENT_PARAMS.noverlap,
-                                             tracks=TDD.TRACKS, restart=True)
         self.master.cw.stft_cv.start()
+        spec_cv = self.master.cw.spec_cv
+        sound = self.getCurrentSound()
+        if spec_cv.current_waveform is None or sound.nsamples <= 1:
+            return
+        self.showSpecgram(sound, spec_cv.view, restart=True)
+
+    def changeView(self, view):
+        """
+        Shows another part of the current sound on spec_cv and f0_cv.
+
+        Arguments:
+            view (tuple) -- (start, end) of the part to be shown, as fractions
+                of the sound's duration. Comes from the canvases' scroll
+                wheel handling, see trackCanvas.connectView().
+        """
+        sound = self.getCurrentSound()
+        if sound.nsamples <= 1:
+            for canvas, tracks in ((self.master.cw.spec_cv, self.session.tracks),
+                                   (self.master.cw.f0_cv, self.session.f0_track)):
+                canvas.setView(view)
+                canvas.start(tracks)
+            return
+        self.showSpecgram(sound, view, restart=True)
 
     @pyqtSlot()
     def changeWindow(self, curr_index, *arg, **kwarg):
@@ -283,7 +545,7 @@ class Slots:
                 is to be used.
 
         Whenever the window type combobox is used, the window_type attribute of
-        CURRENT_PARAMS is updated accordingly.
+        the session's parms is updated accordingly.
 
         TODO -- is there a better way to do this? Maybe we could use the text
             of the current index so that at least we can be sure we're
@@ -291,24 +553,24 @@ class Slots:
             in the combobox?
         """
         if curr_index == 0:
-            TDD.CURRENT_PARAMS.window_type = np.hamming
+            self.session.parms.window_type = "hamming"
         if curr_index == 1:
-            TDD.CURRENT_PARAMS.window_type = np.bartlett
+            self.session.parms.window_type = "bartlett"
         if curr_index == 2:
-            TDD.CURRENT_PARAMS.window_type = np.blackman
+            self.session.parms.window_type = "blackman"
 
     @pyqtSlot()
     def changeSpectrogram(self, *arg, **kwarg):
-        TDD.CURRENT_PARAMS.window_len =\
+        self.session.parms.window_len =\
             self.master.analysisDock.spectrogramGroup.sliders["Frame size"].value()
-        TDD.CURRENT_PARAMS.noverlap =\
+        self.session.parms.noverlap =\
             self.master.analysisDock.spectrogramGroup.sliders["Frame overlap"].value()/100
 
     @pyqtSlot()
     def changeSTFTSize(self, *arg, **kwarg):
         """ Change size of frame for STFT display. """
         # Need to update both TDD and stft_cv's stftSize
-        TDD.CURRENT_PARAMS.stft_size =\
+        self.session.parms.stft_size =\
                 self.master.analysisDock.stftSizeGroup.currValue
         self.master.cw.stft_cv.stft_size =\
                 self.master.analysisDock.stftSizeGroup.currValue
@@ -327,7 +589,7 @@ class Slots:
                 is to be used.
 
         Whenever the synth type combobox is used, the synth_type attribute of
-        CURRENT_PARAMS is updated accordingly.
+        the session's parms is updated accordingly.
 
         TODO -- is there a better way to do this? Maybe we could use the text
             of the current index so that at least we can be sure we're
@@ -335,34 +597,50 @@ class Slots:
             in the combobox?
         """
         if curr_index == 0:
-            TDD.CURRENT_PARAMS.synth_type = "Klatt 1980"
+            self.session.parms.synth_type = "Klatt 1980"
         if curr_index == 1:
-            TDD.CURRENT_PARAMS.synth_type = "Sine wave"
+            self.session.parms.synth_type = "Sine wave"
+
+    @pyqtSlot()
+    def changeSineMode(self, curr_index, *arg, **kwarg):
+        """
+        Changes the mode of the sine wave synthesizer, see synth/sine.py.
+
+        Arguments:
+            curr_index (int) -- comes from the combobox, indicates which mode
+                is to be used.
+        """
+        if curr_index == 0:
+            self.session.parms.sine_mode = "formant"
+        if curr_index == 1:
+            self.session.parms.sine_mode = "harmonic"
 
     @pyqtSlot()
     def changeBW(self, *arg, **kwarg):
         """
         Updates formant bandwidth values when sliders are used.
 
+        A new BW array is assigned, since Parameters arrays are read-only and
+        may be shared with copies such as DEFAULT_PARAMS.
+
         TODO -- figure out where to store slider keys?
         """
         keys = ["F1 bandwidth", "F2 bandwidth", "F3 bandwidth", "F4 bandwidth",
                 "F5 bandwidth"]
-        for i in range(5):
-            TDD.CURRENT_PARAMS.BW[i] =\
-                 self.master.synthesisDock.FFBandwidthGroup.sliders[keys[i]].value()
+        sliders = self.master.synthesisDock.FFBandwidthGroup.sliders
+        self.session.parms.BW = [sliders[key].value() for key in keys]
 
     @pyqtSlot()
     def changeAmplitude(self, *arg, **kwarg):
         keys = ["Amplitude of voicing", "Amplitude of QS voicing",
                 "Amplitude of aspiration", "Amplitude of frication"]
-        TDD.CURRENT_PARAMS.AV =\
+        self.session.parms.AV =\
             self.master.synthesisDock.amplitudeGroup.sliders[keys[0]].value()
-        TDD.CURRENT_PARAMS.AVS =\
+        self.session.parms.AVS =\
             self.master.synthesisDock.amplitudeGroup.sliders[keys[1]].value()
-        TDD.CURRENT_PARAMS.AH =\
+        self.session.parms.AH =\
             self.master.synthesisDock.amplitudeGroup.sliders[keys[2]].value()
-        TDD.CURRENT_PARAMS.AF =\
+        self.session.parms.AF =\
             self.master.synthesisDock.amplitudeGroup.sliders[keys[3]].value()
 
     @pyqtSlot()
@@ -370,35 +648,91 @@ class Slots:
         """
         Synthesizes waveform with current syntheis parameters.
 
-        Synthesize updates CURRENT_PARAMS's F0 and FF information by extracting
-        it from F0_TRACK and TRACKS, then synthesizes a waveform based on the
-        current synthesis parameters and updates SYNTH_SOUND.waveform
-        accordingly. Then, if the synth radio button is checked, the changes
-        to the waveform are reflected in the display.
-        """
-        TDD.CURRENT_PARAMS.F0 = TDD.F0_TRACK[0].points
-        TDD.CURRENT_PARAMS.FF = np.zeros([TDD.CURRENT_PARAMS.track_npoints,
-                                          TDD.CURRENT_PARAMS.nformant])
-        for i in range(TDD.CURRENT_PARAMS.nformant):
-            TDD.CURRENT_PARAMS.FF[:,i] = TDD.TRACKS[i].points
-        if TDD.LOADED_SOUND.dur < 0.05: # random catch-all value
-            TDD.CURRENT_PARAMS.dur = 1
+        Synthesize sets the duration to that of the loaded sound, then
+        synthesizes a snapshot of the session with synth.synthesize() in a
+        background job, so tracks can be edited while it runs. A newer
+        synthesis request cancels any older one that is still running. Once
+        the job is done, the session's synth_sound is replaced accordingly
+        and, if the synth radio button is checked, the changes to the
+        waveform are reflected in the display.
+        """
+        snapshot = self.synthesisSnapshot()
+        def progress(fraction):
+            self.master.statusBar().showMessage("Synthesizing... "
+                                                + str(int(fraction*100)) + "%")
+        self.master.statusBar().showMessage("Synthesizing...")
+        self.jobs.submit("synth", synthesizeSound, args=(snapshot,),
+                         on_done=self.synthesized,
+                         on_progress=progress,
+                         on_error=self.jobFailed,
+                         priority=TDJ.JobManager.INTERACTIVE)
+
+    def synthesisSnapshot(self):
+        """
+        Sets the synthesis duration to that of the loaded sound, or to 1 s if
+        there is none, and returns a snapshot of the session.
+        """
+        if self.session.loaded_sound.dur < 0.05: # random catch-all value
+            self.session.parms.dur = 1
         else:
-            TDD.CURRENT_PARAMS.dur = TDD.LOADED_SOUND.dur
+            self.session.parms.dur = self.session.loaded_sound.dur
+        return(self.session.snapshot())
+
+    def synthesized(self, waveform):
+        """
+        Applies the result of a synthesizeSound job, see synthesize().
 
-        if TDD.CURRENT_PARAMS.synth_type == "Klatt 1980":
-            TDD.SYNTH_SOUND.waveform = synth.klatt.klatt_make(TDD.CURRENT_PARAMS)
-        elif TDD.CURRENT_PARAMS.synth_type == "Sine wave":
-            TDD.SYNTH_SOUND.waveform = synth.sine.sine_make(TDD.CURRENT_PARAMS)
+        Arguments:
+            waveform (np.array) -- return value of synthesizeSound().
+        """
+        sound = TDD.Sound(waveform, self.session.synth_sound.fs)
+        self.session.synth_sound = sound
+        self.master.statusBar().showMessage("Synthesis done", 5000)
         if self.master.displayDock.synthedRadioButton.isChecked():
-            self.master.cw.spec_cv.plot_specgram(x_right=TDD.SYNTH_SOUND.dur,
-                                                 waveform=TDD.SYNTH_SOUND.waveform,
-                                                 fs=TDD.SYNTH_SOUND.fs,
-                                                 window_len=TDD.CURRENT_PARAMS.window_len,
-                                                 noverlap=TDD.CURRENT_PARAMS.noverlap,
-                                                 window_type=TDD.CURRENT_PARAMS.window_type,
-                                                 tracks=TDD.TRACKS)
-            self.master.cw.wave_cv.plot_waveform(TDD.SYNTH_SOUND.waveform)
+            self.pushDisplayUpdates(sound)
+
+    @pyqtSlot()
+    def fitTracks(self, *arg, parent=None, **kwarg):
+        """
+        Fits the session's tracks to the loaded sound by analysis-by-synthesis.
+
+        Runs analysis.fitting.fit_tracks() in a background job starting from
+        the current tracks, showing a progress dialog which can be used to
+        stop the search early. The best tracks found so far are kept either
+        way, and the canvases are updated accordingly.
+        """
+        if len(self.session.loaded_sound.waveform) == 1:
+            QMessageBox.information(parent, "Fit tracks",
+                                    "Please open a sound file first.")
+            return
+        stop = threading.Event()
+        dialog = QProgressDialog("Fitting tracks to loaded sound...", "Stop",
+                                 0, 0, parent)
+        dialog.canceled.connect(stop.set)
+        dialog.show()
+        def progress(value):
+            iteration, distance, step = value
+            dialog.setLabelText("Round " + str(iteration + 1) + ", distance "
+                                + str(round(distance, 2)) + " dB^2")
+        def done(result):
+            dialog.close()
+            ff_points, f0_points, distance = result
+            fitted = TDD.TrackSet(ff_points)
+            fitted.changeNoPoints(self.session.tracks.track_npoints)
+            old_tracks = self.session.tracks.copy()
+            self.session.tracks[0:len(fitted)] = fitted
+            self.history.recordTracks("FF", old_tracks, self.session.tracks)
+            self.setF0Track(f0_points)
+            self.pushDisplayUpdates(self.getCurrentSound())
+            self.master.statusBar().showMessage("Fitted tracks, spectral distance "
+                    + str(round(distance, 2)) + " dB^2", 5000)
+        def failed(err):
+            dialog.close()
+            self.jobFailed(err)
+        self.jobs.submit("fit", fitTracksJob,
+                         args=(self.session.snapshot(), stop),
+                         on_done=done, on_progress=progress, on_error=failed,
+                         priority=TDJ.JobManager.BACKGROUND)
     ##### End synthesis slots #####
 
 
@@ -406,7 +740,7 @@ class Slots:
     @pyqtSlot()
     def mouse(self, *arg, **kwarg):
         """
-        Performs TRACKS, F0_TRACK, or stft updates depending on canvas activity
+        Performs track, F0 track, or stft updates depending on canvas activity
 
         Arguments:
             event (PyQt Event) -- passed as default index 0 argument in *arg.
@@ -418,6 +752,9 @@ class Slots:
             wasClick (boolean) -- passed as "wasClick" in **kwarg, used to
                 provide different functionality based on whether current mouse
                 action was a single click or a mouse drag movement.
+            events (list) -- optionally passed as "events" in **kwarg by
+                TrackDrawInteraction.InteractionScheduler, all motion events
+                coalesced into this call, oldest first. event is the last one.
 
         Whenever spec_cv or f0_cv record mouse activity, this slot handles that
         activity. If the mouse button is clicked on the spec_cv, the nearest
@@ -438,6 +775,10 @@ class Slots:
         TDD is updated, and the updated track data is sent back to the relevant
         canvas using the canvas' updateCanvas() method.
 
+        Drags follow the path of the mouse: every column between the last
+        handled position and each of the coalesced events is set, with values
+        interpolated along the way, so fast drags don't skip columns.
+
         The general pattern for stft updates is that an x_loc and y_loc are
         received from the canvas if the mouse is within the bounds of the
         plotted area. The x_loc and y_loc received are in coordinates in terms
@@ -450,7 +791,6 @@ class Slots:
             applied. See main.py for some helpful code to make those as well as
             the deprecated mouse_shift() slot below.
         TODO -- beautify the code, it's kinda ugly...
-        TODO -- add track bubble features
         """
         event = list(arg)[0]
         x_loc = None
@@ -465,204 +805,370 @@ class Slots:
         if event.button and x_loc != None:
             # Get correct tracks
             if target == "F0":
-                tracks = TDD.F0_TRACK
+                tracks = self.session.f0_track
             elif target == "FF":
-                tracks = TDD.TRACKS
-            # Find nearest x index
-            dist_to_x_pts = np.abs(np.linspace(0,
-                                   TDD.CURRENT_PARAMS.track_npoints-1,
-                                   TDD.CURRENT_PARAMS.track_npoints)-x_loc)
-            nearest_x_idx = dist_to_x_pts.argmin()
-            # Grab y coordinates from all lines at that x index
-            y_coords_at_nearest_x = np.array([track.points[nearest_x_idx]
-                                              for track in tracks])
-            # Find the nearest one
-            dist_to_y_points = np.abs(y_coords_at_nearest_x - y_loc)
-            trackNo = dist_to_y_points.argmin()
-            # Update selected track if was a click
+                tracks = self.session.tracks
+            # Find nearest column, and nearest track at that column
+            nearest_x_idx = tracks.nearestColumn(x_loc)
+            trackNo = tracks.nearestTrack(nearest_x_idx, y_loc)
+            # Update selected track if was a click, which starts a new edit
             if wasClick == True:
                 plot.locked_track = trackNo
-            # Check for track bubbles and handle that logic if necessary
-            if TDD.CURRENT_PARAMS.track_bubble == True and len(tracks) > 1:
-                if y_coords_at_nearest_x[plot.locked_track] < y_loc:
-                    try:
-                        val_above = y_coords_at_nearest_x[plot.locked_track + 1]
-                        difference = abs(val_above - y_loc)
-                        if difference <= TDD.CURRENT_PARAMS.bubble_len:
-                            tracks[plot.locked_track].points[nearest_x_idx] =\
-                                    val_above - TDD.CURRENT_PARAMS.bubble_len
-                        else:
-                            tracks[plot.locked_track].points[nearest_x_idx] = y_loc
-                    except IndexError:
-                        tracks[plot.locked_track].points[nearest_x_idx] = y_loc
-                if y_coords_at_nearest_x[plot.locked_track] > y_loc:
-                    try:
-                        val_below = y_coords_at_nearest_x[plot.locked_track - 1]
-                        difference = abs(val_below - y_loc)
-                        if difference <= TDD.CURRENT_PARAMS.bubble_len:
-                            tracks[plot.locked_track].points[nearest_x_idx] =\
-                                    val_below + TDD.CURRENT_PARAMS.bubble_len
-                        else:
-                            tracks[plot.locked_track].points[nearest_x_idx] = y_loc
-                    except IndexError:
-                        tracks[plot.locked_track].points[nearest_x_idx] = y_loc
-            else:
-                tracks[plot.locked_track].points[nearest_x_idx] = y_loc
+                self.autosave(self.history.end())
+                self.dragFrom = None
+            # Respect track bubbles if necessary
+            bubble_len = None
+            if self.session.parms.track_bubble == True:
+                bubble_len = self.session.parms.bubble_len
+            cols, values = self.dragPath(plot, tracks,
+                                         kwarg.get("events", [event]))
+            replaced = tracks.setPoints(plot.locked_track, cols, values,
+                                        bubble_len)
+            self.history.record(target, plot.locked_track,
+                                tracks[plot.locked_track], replaced)
             plot.updateCanvas(tracks, plot.locked_track)
+            self.dragFrom = (plot, x_loc, y_loc)
         if self.master.cw.stft_cv.enabled == True:
-            waveform, fs, dur = self.getCurrentWaveform()
+            sound = self.getCurrentSound()
             try:
-                x_loc = x_loc/TDD.CURRENT_PARAMS.track_npoints
-                x_loc = int(x_loc*dur*fs)
-                if TDD.CURRENT_PARAMS.stft_size < x_loc < round(fs*dur)\
-                        -TDD.CURRENT_PARAMS.stft_size:
-                    waveform = waveform/np.max(np.abs(waveform))
-                    magnitude = np.fft.rfft(waveform[x_loc-TDD.CURRENT_PARAMS.stft_size:x_loc
-                                                     +TDD.CURRENT_PARAMS.stft_size])
+                x_loc = x_loc/self.session.parms.track_npoints
+                x_loc = int(x_loc*sound.nsamples)
+                if self.session.parms.stft_size < x_loc < sound.nsamples\
+                        -self.session.parms.stft_size:
+                    waveform = sound.normalized
+                    magnitude = np.fft.rfft(waveform[x_loc-self.session.parms.stft_size:x_loc
+                                                     +self.session.parms.stft_size])
                     magnitude = 20*np.log10(np.abs(magnitude))
                     self.master.cw.stft_cv.update_stft(magnitude)
             except TypeError:
                 pass
 
-    @pyqtSlot()
-    def mouse_ctrl(self, *arg, **kwarg):
+    def dragPath(self, plot, tracks, events):
         """
-        DEPRECATED -- to be integrated into mouse() above. Don't use!
+        Finds the columns crossed by a drag and their new values.
+
+        Arguments:
+            plot (TrackDraw Canvas object) -- plot being dragged on.
+            tracks (TrackDrawData.TrackSet) -- tracks shown in plot.
+            events (list) -- motion events since the last handled position,
+                oldest first.
+
+        The path runs from the last handled position on the same plot (if the
+        drag has one) through every event inside the plot. Columns between
+        neighbouring positions get linearly interpolated values, and where
+        the path crosses a column more than once, the latest value wins.
+        Returns (cols, values) as np.arrays.
         """
-        event = list(arg)[0]
-        x_loc = None
-        y_loc = None
-        # If mouse button is down, perform track updates
-        if event.button:
-            try:
-                plot = kwarg["plot"]
-                target = kwarg["target"]
-                wasClick = kwarg["wasClick"]
-                x_loc, y_loc = plot.mouse(event)
-                dist_to_x_pts = np.abs(np.linspace(0,TDD.CURRENT_PARAMS.track_npoints-1,TDD.CURRENT_PARAMS.track_npoints) - x_loc)
-                nearest_x_idx = dist_to_x_pts.argmin()
-                if target == "F0":
-                    if wasClick == True:
-                        plot.locked_point = nearest_x_idx
-                        TDD.F0_TRACK[0].points[nearest_x_idx] = y_loc
-                        plot.update_track(TDD.F0_TRACK[0].points)
-                    elif wasClick == False:
-                        if plot.locked_point == nearest_x_idx:
-                            TDD.F0_TRACK.points[nearest_x_idx] = y_loc
-                            plot.update_track(TDD.F0_TRACK.points)
-                        elif plot.locked_point != nearest_x_idx:
-                            difference = abs(plot.locked_point - nearest_x_idx)
-                            if plot.locked_point > nearest_x_idx:
-                                TDD.F0_TRACK.points[nearest_x_idx:plot.locked_point] = np.linspace(y_loc, TDD.F0_TRACK.points[plot.locked_point], difference)
-                            elif plot.locked_point < nearest_x_idx:
-                                TDD.F0_TRACK.points[plot.locked_point:nearest_x_idx] = np.linspace(TDD.F0_TRACK.points[plot.locked_point], y_loc, difference)
-                            plot.update_track(TDD.F0_TRACK.points)
-                elif target == "FF":
-                    if wasClick == True:
-                        y_coords_at_nearest_x = np.array([track.points[nearest_x_idx] for track in TDD.TRACKS])
-                        dist_to_y_pts = np.abs(y_coords_at_nearest_x - y_loc)
-                        trackNo = dist_to_y_pts.argmin()
-                        TDD.TRACKS[trackNo].points[nearest_x_idx] = y_loc
-                        plot.update_track(TDD.TRACKS[trackNo].points, trackNo)
-                        plot.locked_track = trackNo
-                    elif wasClick == False:
-                        TDD.TRACKS[plot.locked_track].points[nearest_x_idx] = y_loc
-                        plot.update_track(TDD.TRACKS[plot.locked_track].points, plot.locked_track)
-            except TypeError:
-                pass
-        else:
-            try:
-                plot = kwarg["plot"]
-                target = kwarg["target"]
-                wasClick = kwarg["wasClick"]
-                x_loc, y_loc = plot.mouse(event)
-            except TypeError:
-                pass
-        # Regardless of if mouse button is down, perform stft update
-        waveform, fs, dur = self.getCurrentWaveform()
-        if x_loc == None:
-            try:
-                x_loc, y_loc = plot.mouse(event)
-            except TypeError:
-                pass
-            # Meed to convert from track dimensions to regular dimensions
-        try:
-            x_loc = x_loc/TDD.CURRENT_PARAMS.track_npoints
-            x_loc = int(x_loc*dur*fs)
-            if TDD.CURRENT_PARAMS.stft_size < x_loc < round(fs*dur)-TDD.CURRENT_PARAMS.stft_size:
-                waveform = waveform/np.max(np.abs(waveform))
-                magnitude = np.fft.rfft(waveform[x_loc-TDD.CURRENT_PARAMS.stft_size:x_loc+TDD.CURRENT_PARAMS.stft_size])
-                magnitude = 20*np.log10(np.abs(magnitude))
-                self.master.cw.stft_cv.update_stft(magnitude)
-        except TypeError:
-            pass
+        path = []
+        if self.dragFrom is not None and self.dragFrom[0] is plot:
+            path.append(self.dragFrom[1:])
+        for event in events:
+            loc = plot.mouse(event)
+            if event.button and loc is not None:
+                path.append(loc)
+        new = {}
+        for (x0, y0), (x1, y1) in zip(path[0:-1], path[1:]):
+            c0 = tracks.nearestColumn(x0)
+            c1 = tracks.nearestColumn(x1)
+            step = 1 if c1 >= c0 else -1
+            cols = np.arange(c0, c1 + step, step)
+            if c0 == c1:
+                new[c1] = y1
+                continue
+            for col, value in zip(cols, np.linspace(y0, y1, len(cols))):
+                new[int(col)] = value
+        x_loc, y_loc = path[-1]
+        new[tracks.nearestColumn(x_loc)] = y_loc
+        cols = np.fromiter(new.keys(), dtype=int, count=len(new))
+        values = np.fromiter(new.values(), dtype=np.float64, count=len(new))
+        return(cols, values)
+
+    @pyqtSlot()
+    def mouseRelease(self, *arg, **kwarg):
+        """ Ends the current drag, making it a single undoable edit. """
+        self.autosave(self.history.end())
+        self.dragFrom = None
     ##### End track slots #####
 
 
     ##### Playback slots #####
     @pyqtSlot()
-    def play(self):
-        """ Plays current displayed waveform after normalizing it. """
-        waveform, fs, dur = self.getCurrentWaveform()
-        waveform = waveform/np.max(np.abs(waveform))*0.9
-        sd.play(waveform, fs)
-        time.sleep(dur)
+    def play(self, *arg, **kwarg):
+        """
+        Plays current displayed waveform after normalizing it.
+
+        If a time range is selected on wave_cv, only that range is played.
+        Playback runs in sounddevice's audio thread, so this slot returns
+        immediately. Any sound that is already playing is stopped first.
+        While the sound plays, playheads are moved across spec_cv and wave_cv.
+        """
+        if not self.playbackChecked:
+            error = checkPlatform()
+            if error is not None:
+                QMessageBox.warning(self.master, "Playback", error)
+                return
+            self.playbackChecked = True
+        sound = self.getCurrentSound()
+        if sound.nsamples < 2 or sound.peak == 0:
+            return
+        start, stop = 0, sound.nsamples
+        selection = self.master.cw.wave_cv.getSelection()
+        if selection is not None:
+            start = int(selection[0]*sound.nsamples)
+            stop = int(selection[1]*sound.nsamples)
+        self.player.play(sound.waveform, sound.fs, start, stop,
+                         gain=0.9/sound.peak)
+        self.playTimer.start()
+
+    @pyqtSlot()
+    def stop(self, *arg, **kwarg):
+        """ Stops playback immediately and hides the playheads. """
+        self.player.stop()
+        self.updatePlayhead()
+
+    @pyqtSlot()
+    def updatePlayhead(self, *arg, **kwarg):
+        """
+        Moves the playheads on spec_cv and wave_cv to the playback position.
+
+        Called periodically by playTimer while a sound plays. Once playback
+        has ended, the timer is stopped and the playheads are hidden.
+        """
+        if self.player.active:
+            fraction = self.player.position/self.player.nsamples
+        else:
+            self.playTimer.stop()
+            fraction = None
+        self.master.cw.spec_cv.updatePlayhead(fraction)
+        self.master.cw.wave_cv.updatePlayhead(fraction)
     ##### End playback slots #####
 
 
     ##### Non-slots #####
-    def getCurrentWaveform(self):
+    def setF0Track(self, points):
         """
-        Grabs currently displayed waveform data.
+        Replaces the points of the session's f0_track and refreshes f0_cv.
 
-        Checks which display radio button (synth or loaded) is currently
-        checked. Then grabs the correct waveform, fs, and dur associated with
-        the current displayed signal.
+        Arguments:
+            points (np.array) -- new F0 values, one per track point.
 
-        TODO -- replace with a better system. Right now, anytime changes occur
-            to display/plotting parameters, the slot which handles that update
-            calls this method to get the current waveform. In the long run,
-            there needs to be some better way of doing this.
+        The F0 canvas limits are widened if necessary so that the whole
+        contour is visible.
+        """
+        old_tracks = self.session.f0_track
+        self.session.f0_track = TDD.TrackSet(points)
+        self.session.f0_track.changeNoPoints(self.session.parms.track_npoints)
+        self.history.recordTracks("F0", old_tracks, self.session.f0_track)
+        self.autosave()
+        self.master.cw.f0_cv.fitLimits(self.session.f0_track)
+        self.master.cw.f0_cv.start(self.session.f0_track)
+
+    def getTracks(self, target):
+        """ Returns the session's TrackSet for target "FF" or "F0". """
+        if target == "F0":
+            return(self.session.f0_track)
+        return(self.session.tracks)
+
+    def redrawEdits(self, edits):
+        """ Redraws the tracks changed by a list of TrackDrawHistory.Edits. """
+        for edit in edits:
+            if edit.target == "F0":
+                self.master.cw.f0_cv.updateCanvas(self.session.f0_track, edit.trackNo)
+            else:
+                self.master.cw.spec_cv.updateCanvas(self.session.tracks, edit.trackNo)
+
+    def jobFailed(self, err):
+        """ Reports an exception raised in a background job. """
+        self.master.statusBar().showMessage("Error: " + str(err), 5000)
+        print("Background job failed:", repr(err))
+
+    def getCurrentSound(self):
+        """
+        Grabs the currently displayed sound.
+
+        Checks which display radio button (synth or loaded) is currently
+        checked, then returns the session's synth_sound or loaded_sound.
         """
         if self.master.displayDock.synthedRadioButton.isChecked():
-            waveform = TDD.SYNTH_SOUND.waveform
-            fs = TDD.SYNTH_SOUND.fs
-            dur = TDD.SYNTH_SOUND.dur
-        elif self.master.displayDock.loadedRadioButton.isChecked():
-            waveform = TDD.LOADED_SOUND.waveform
-            fs = TDD.LOADED_SOUND.fs
-            dur = TDD.LOADED_SOUND.dur
-        return(waveform, fs, dur)
+            return(self.session.synth_sound)
+        return(self.session.loaded_sound)
 
-    def pushDisplayUpdates(self, waveform, fs, dur):
+    def pushDisplayUpdates(self, sound):
         """
         Updates all canvases to reflect any parameter changes.
 
         Arguments:
-            waveform (np.array) -- current displayed waveform, usually grabbed
-                by getCurrentWaveform() function.
-            fs (int) -- sampling rate in Hz of current displayed waveform,
-                usually grabbed by getCurrentwavform() function.
-            dur (float) -- duration in seconds of current displayed waveform,
-                usually grabbed in getCurrentWaveform() function.
+            sound (TrackDrawData.Sound) -- current displayed sound, usually
+                grabbed by getCurrentSound().
 
         This is a utility function called by various slots whenever they change
         elements pertaining to the canvases/display. It updates the display
         in an appropriate way by calling the canvases' start() methods if the
         length of the waveform is 1 (i.e. the waveform is empty) or by calling
         the canvases' plot_***() methods if the waveform contains a sound.
+        In the latter case the spectrogram of the part of the sound shown is
+        put together from cached tiles, see showSpecgram().
         """
-        if len(waveform) == 1:
-            self.master.cw.spec_cv.start(TDD.TRACKS)
-            self.master.cw.f0_cv.start(TDD.F0_TRACK)
+        self.jobs.cancel("display")
+        waveform = sound.waveform
+        if sound.nsamples == 1:
+            self.master.cw.spec_cv.start(self.session.tracks)
+            self.master.cw.f0_cv.start(self.session.f0_track)
             self.master.cw.wave_cv.plot_waveform(waveform)
             self.master.cw.wave_cv.clear()
-        else:
-            self.master.cw.spec_cv.plot_specgram(dur, waveform, fs,
-                    TDD.CURRENT_PARAMS.window_len,
-                    TDD.CURRENT_PARAMS.noverlap,
-                    TDD.CURRENT_PARAMS.window_type, TDD.TRACKS)
+            return
+        def plotWaveform():
             self.master.cw.wave_cv.plot_waveform(waveform)
-            self.master.cw.f0_cv.start(TDD.F0_TRACK)
+        self.showSpecgram(sound, self.master.cw.spec_cv.view, then=plotWaveform)
+
+    def showSpecgram(self, sound, view, restart=False, then=None):
+        """
+        Plots the spectrogram of part of a sound on spec_cv.
+
+        Arguments:
+            sound (TrackDrawData.Sound) -- sound to be shown.
+            view (tuple) -- (start, end) of the part to be shown, as fractions
+                of the sound's duration.
+            restart (boolean) -- passed on to spec_cv.plot_specgram(), True
+                if the tracks are already plotted.
+            then (function) -- called without arguments once the spectrogram
+                is plotted.
+
+        The spectrogram is assembled from the tiles of an
+        analysis.tiles.TiledSpecgram cached on the sound, at a resolution
+        matching the width of spec_cv. Tiles which are not in the tile cache
+        yet are computed in a background job, which replaces any display job
+        that is still running. f0_cv is moved to the same view.
+        """
+        spec_cv = self.master.cw.spec_cv
+        parms = self.session.parms
+        tiled = self.tiledSpecgram(sound)
+        t0, t1 = view[0]*sound.dur, view[1]*sound.dur
+        level = tiled.level(t0, t1, spec_cv.plotWidth())
+        def done(tiles):
+            for index, tile in tiles:
+                tiled.store(level, index, tile)
+            spec_cv.plot_specgram(sound.dur, sound.waveform, sound.fs,
+                    parms.window_len, parms.noverlap, parms.window_type,
+                    self.session.tracks, restart=restart,
+                    specgram=tiled.image(level, t0, t1), view=view)
+            self.master.cw.f0_cv.setView(view)
+            self.master.cw.f0_cv.start(self.session.f0_track)
+            if then is not None:
+                then()
+        missing = tiled.missing(level, tiled.tiles(level, t0, t1))
+        if not missing:
+            done([])
+            return
+        self.jobs.submit("display", computeTiles, args=(tiled, level, missing),
+                         on_done=done, on_error=self.jobFailed,
+                         priority=TDJ.JobManager.INTERACTIVE)
+
+    def tiledSpecgram(self, sound):
+        """
+        Returns the analysis.tiles.TiledSpecgram of a sound for the current
+        window settings, cached on the sound. The tiles of all sounds share
+        one memory budget.
+        """
+        import analysis
+        if self.tileCache is None:
+            self.tileCache = analysis.tiles.TileCache()
+        parms = self.session.parms
+        return(sound.analysis(("tiles", parms.window_len, parms.noverlap,
+                               parms.window_type),
+                              lambda sound: analysis.tiles.TiledSpecgram(
+                                  self.tileCache, sound.waveform, sound.fs,
+                                  parms.window_len, parms.noverlap,
+                                  parms.window_type)))
+
+    def autosave(self, edits=None, which=1):
+        """
+        Journals track changes to the open project, if there is one.
 
+        Arguments:
+            edits (list) -- TrackDrawHistory.Edits that were just done, undone
+                or redone. If None, all tracks are journaled, e.g. after
+                tracks have been reshaped.
+            which (int) -- 1 if edits were done or redone, 0 if undone.
+
+        Parameter changes are journaled along with the next track change.
+        Appending to the journal is cheap. Once the journal has grown large
+        enough, the project is saved in a background job, which compacts it.
+        """
+        if self.project is None or (edits is not None and not edits):
+            return
+        if edits is None:
+            records = [TDPR.tracksRecord("FF", self.session.tracks),
+                       TDPR.tracksRecord("F0", self.session.f0_track)]
+        else:
+            records = [TDPR.editRecord(edit, which) for edit in edits]
+        if self.project.append(records, self.session.parms) \
+                and "project" not in self.jobs.latest:
+            self.saveProject()
+
+    def saveProject(self):
+        """ Saves the session to the open project in a background job. """
+        project = self.project
+        snapshot = self.session.snapshot()
+        project.parms_digest = snapshot.parms.digest
+        def done(result):
+            self.master.statusBar().showMessage("Saved " + project.path, 5000)
+        self.jobs.submit("project", saveProjectJob,
+                         args=(project, snapshot, project.seq),
+                         on_done=done, on_error=self.jobFailed,
+                         priority=TDJ.JobManager.BACKGROUND)
+
+    def showParameters(self):
+        """
+        Sets the docks' widgets and the canvases to the session's parms, e.g.
+        after a project has been opened. Widget signals are blocked, since
+        the parameters already have the values shown.
+        """
+        parms = self.session.parms
+        cw = self.master.cw
+        cw.spec_cv.track_npoints = parms.track_npoints
+        cw.f0_cv.track_npoints = parms.track_npoints
+        cw.spec_cv.nformant = parms.nformant
+        cw.spec_cv.locked_track = min(cw.spec_cv.locked_track,
+                                      parms.nformant - 1)
+        displayDock = self.master.displayDock
+        analysisDock = self.master.analysisDock
+        synthesisDock = self.master.synthesisDock
+        groupValues = [(displayDock.trackGroup,
+                        {"Number of points": parms.track_npoints,
+                         "Bubble size": parms.bubble_len}),
+                       (analysisDock.spectrogramGroup,
+                        {"Frame size": parms.window_len,
+                         "Frame overlap": int(round(parms.noverlap*100))}),
+                       (synthesisDock.amplitudeGroup,
+                        {"Amplitude of voicing": parms.AV,
+                         "Amplitude of QS voicing": parms.AVS,
+                         "Amplitude of aspiration": parms.AH,
+                         "Amplitude of frication": parms.AF}),
+                       (synthesisDock.FFBandwidthGroup,
+                        {"F" + str(i + 1) + " bandwidth": int(bw)
+                         for i, bw in enumerate(parms.BW[0:5])})]
+        for group, values in groupValues:
+            for key, value in values.items():
+                slider = group.sliders[key]
+                slider.blockSignals(True)
+                slider.setValue(value)
+                slider.blockSignals(False)
+                group.updateValueLabel(sliderKey=key)
+        displayDock.trackBubbleCheckBox.blockSignals(True)
+        displayDock.trackBubbleCheckBox.setChecked(parms.track_bubble)
+        displayDock.trackBubbleCheckBox.blockSignals(False)
+        windows = ["hamming", "bartlett", "blackman"]
+        if parms.window_type in windows:
+            analysisDock.windowComboBox.setCurrentIndex(
+                    windows.index(parms.window_type))
+        synths = ["Klatt 1980", "Sine wave"]
+        if parms.synth_type in synths:
+            synthesisDock.methodComboBox.setCurrentIndex(
+                    synths.index(parms.synth_type))
+        synthesisDock.nformantComboBox.setCurrentIndex(parms.nformant - 1)
+        sineModes = ["formant", "harmonic"]
+        if parms.sine_mode in sineModes:
+            synthesisDock.sineModeComboBox.setCurrentIndex(
+                    sineModes.index(parms.sine_mode))
     ##### End non-slots #####
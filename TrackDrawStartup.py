@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup timing for TrackDraw 2016.
+
+Run main.py with --startup-times to get a report of where startup time goes.
+ImportTimer wraps the built-in __import__ and records, for every module
+imported for the first time, how long its import took in total and how much
+of that was spent in the module itself rather than in modules it imported,
+in the same spirit as python -X importtime. StartupTimer records named
+phases of startup up to the first paint of the main window, and prints both
+breakdowns to stderr.
+
+This module only uses the standard library at import time, so that it can
+be set up before anything else is imported.
+"""
+
+import builtins
+import sys
+import time
+
+
+class ImportTimer:
+    """
+    Times first-time imports.
+
+    Attributes:
+        records (list) -- one (depth, name, cumulative, self) tuple per timed
+            import, in the order the imports finished. Times are in seconds,
+            depth is the nesting level of the import.
+    """
+    def __init__(self):
+        self.records = []
+        self.stack = []
+        self.original = None
+
+    def install(self):
+        self.original = builtins.__import__
+        builtins.__import__ = self.timedImport
+
+    def uninstall(self):
+        if self.original is not None:
+            builtins.__import__ = self.original
+            self.original = None
+
+    def timedImport(self, name, globals=None, locals=None, fromlist=(),
+                    level=0):
+        if level != 0 or name in sys.modules:
+            return(self.original(name, globals, locals, fromlist, level))
+        # Time spent in nested imports is added to the top of the stack
+        self.stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return(self.original(name, globals, locals, fromlist, level))
+        finally:
+            total = time.perf_counter() - start
+            children = self.stack.pop()
+            if self.stack:
+                self.stack[-1] = self.stack[-1] + total
+            self.records.append((len(self.stack), name, total,
+                                 total - children))
+
+
+class StartupTimer:
+    """
+    Records the phases of startup and reports them.
+
+    Arguments:
+        start (float) -- time.perf_counter() value at which startup began.
+
+    Attributes:
+        imports (ImportTimer) -- times the imports done during startup.
+        marks (list) -- (phase name, time.perf_counter() value) pairs, in the
+            order the phases ended.
+    """
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.imports = ImportTimer()
+        self.marks = []
+        self.paintWatcher = None
+
+    def mark(self, phase):
+        """ Records the end of a phase of startup. """
+        self.marks.append((phase, time.perf_counter()))
+
+    def watchFirstPaint(self, app):
+        """
+        Reports once the first paint event after this call has been handled.
+
+        Arguments:
+            app (QApplication) -- the application, whose event loop must be
+                started afterwards.
+        """
+        from PyQt5.QtCore import QObject, QEvent, QTimer
+        timer = self
+
+        class PaintWatcher(QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Paint:
+                    app.removeEventFilter(self)
+                    # Paint events queued together are handled before this
+                    QTimer.singleShot(0, timer.firstPaint)
+                return(False)
+
+        self.paintWatcher = PaintWatcher()
+        app.installEventFilter(self.paintWatcher)
+
+    def firstPaint(self):
+        self.mark("first paint")
+        self.imports.uninstall()
+        self.report()
+
+    def report(self, n_imports=25, file=None):
+        """
+        Prints the startup phases and the slowest imports.
+
+        Arguments:
+            n_imports (int) -- number of imports listed, slowest first.
+            file -- where to print, defaults to sys.stderr.
+        """
+        if file is None:
+            file = sys.stderr
+        print("TrackDraw startup times:", file=file)
+        previous = self.start
+        for phase, end in self.marks:
+            print("  %-24s %8.1f ms" % (phase, 1000*(end - previous)),
+                  file=file)
+            previous = end
+        print("  %-24s %8.1f ms" % ("total", 1000*(previous - self.start)),
+              file=file)
+        records = sorted(self.imports.records, key=lambda r: r[2],
+                         reverse=True)[0:n_imports]
+        if not records:
+            return
+        print("Slowest imports (cumulative, self):", file=file)
+        for depth, name, total, own in records:
+            print("  %8.1f ms %8.1f ms  %s" % (1000*total, 1000*own, name),
+                  file=file)
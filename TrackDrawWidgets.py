@@ -6,17 +6,19 @@ from functools import partial
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
-import numpy as np
-import matplotlib
-matplotlib.use("QT5Agg")
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 
 
 class CanvasGrid(QWidget):
-    """ Stores canvases which display information about current waveform """
-    def __init__(self, parent=None):
+    """
+    Stores canvases which display information about current waveform
+
+    Arguments:
+        parent (QWidget) -- usually the main window.
+        renderer (str) -- "matplotlib" for the canvases in
+            TrackDrawMatplotlib, or "qpainter" for the ones in
+            TrackDrawPainter. Only the chosen module is imported.
+    """
+    def __init__(self, parent=None, renderer="matplotlib"):
         super(QWidget, self).__init__(parent)
 
         mainGrid = QGridLayout()
@@ -38,10 +40,18 @@ class CanvasGrid(QWidget):
                                      "Amplitude of QS voicing"])
         self.paramComboBox.setCurrentIndex(0)
 
-        self.wave_cv = WaveCanvas(self)
-        self.stft_cv = STFTCanvas(self)
-        self.spec_cv = SpecCanvas(self)
-        self.f0_cv = F0Canvas(self)
+        if renderer == "qpainter":
+            import TrackDrawPainter as TDP
+            self.wave_cv = TDP.WaveCanvas(self)
+            self.stft_cv = TDP.STFTCanvas(self)
+            self.spec_cv = TDP.SpecCanvas(self)
+            self.f0_cv = TDP.F0Canvas(self)
+        else:
+            import TrackDrawMatplotlib as TDM
+            self.wave_cv = TDM.WaveCanvas(self)
+            self.stft_cv = TDM.STFTCanvas(self)
+            self.spec_cv = TDM.SpecCanvas(self)
+            self.f0_cv = TDM.F0Canvas(self)
         mainGrid.addWidget(self.wave_cv, 0, 1)
         mainGrid.addWidget(self.stft_cv, 1, 0)
         mainGrid.addWidget(self.spec_cv, 1, 1)
@@ -51,355 +61,6 @@ class CanvasGrid(QWidget):
         self.current_waveform = None
         self.current_fs = None
 
-class trackCanvas(FigureCanvas):
-    """
-    Canvas object for animated canvases in TrackDraw 2016.
-
-    Arguments:
-        parent (CanvasGrid object) -- refers to parent CanvasGrid object, which
-            is a subclass of QWidget
-
-    Attributes:
-        enabled (boolean) -- if True, tracks will be drawn. If not, they will
-            still be properly stored, but will not be drawn.
-        background -- background stored from copy_from_bbox operation
-        tracks (list) -- contains canvas' current Line2D objects, which
-            represent tracks.
-        x_low (float) -- lower limit of plot in x-dimension
-        x_high (float) -- upper limit of plot in x-dimension
-        y_low (float) -- lower limit of plot in y-dimension
-        y_high (float) -- upper limit of plot in y-dimension
-        track_npoints (int) -- number of points in tracks
-        locked_track (int) -- current locked track
-
-    trackCanvas is a subclass of FigureCanvas to be used for all TrackDraw
-    animated plots which display tracks. This will allow for easy creation
-    of other similar canvas objects to allow for animated graphical input of
-    parameters. Currently, only F0Canvas and SpecCanvas use this as a parent
-    class.
-    """
-    def __init__(self, parent=None):
-        self.fig = Figure()
-        self.ax = self.fig.add_subplot(111)
-        self.ax.hold(False)
-        FigureCanvas.__init__(self, self.fig)
-        self.setParent(parent)
-
-        self.enabled = True
-        self.background = None
-        self.tracks = []
-        self.x_low = 0
-        self.x_high = 0
-        self.y_low = 0
-        self.y_high = 0
-        self.track_npoints = DEFAULT_PARAMS.track_npoints
-        self.locked_track = 0
-
-    def clear(self):
-        self.ax.clear()
-        self.fig.canvas.draw()
-
-    def getBackground(self):
-        """ Grabs current background. """
-        self.background = self.fig.canvas.copy_from_bbox(self.ax.get_figure().bbox)
-
-    def start(self, tracks):
-        """
-        Starts tracks.
-
-        Arguments:
-            tracks (list) -- list of TrackDrawData.Track objects.
-
-        Used whenever canvas is initialized, or when one needs a fresh empty background.
-        """
-        self.ax.clear()
-        self.tracks = []
-        self.ax.set_xlim(0, self.track_npoints - 1)
-        self.ax.set_ylim(self.y_low, self.y_high)
-        self.fig.canvas.draw()
-        self.getBackground()
-        for i in range(len(tracks)):
-            self.tracks.append(self.ax.plot(tracks[i].points, color="blue",
-                                          marker="o"))
-        self.ax.set_xlim(0, self.track_npoints - 1)
-        self.ax.set_ylim(self.y_low, self.y_high)
-        self.updateCanvas(redraw=True)
-
-    def mouse(self, event):
-        """ Converts mouse coordinates in pixels to data coordinates. """
-        x_loc, y_loc = self.ax.transData.inverted().transform((event.x, event.y))
-        x_min, x_max = self.ax.get_xlim()
-        y_min, y_max = self.ax.get_ylim()
-        # Only return if within plot limits
-        if x_min < x_loc < x_max and y_min < y_loc < y_max:
-            return(x_loc, y_loc)
-
-    def updateCanvas(self, new_tracks=0, trackNo=0, redraw=False):
-        """
-        Animates canvas.
-
-        Arguments:
-            new_tracks (list) -- list of Track objects.
-            trackNo (int) -- index of track which has been updated.
-            redraw (boolean) -- if True, does not use new_track and trackNo
-                arguments to change a track.
-
-        First, the current background is restored. Then, if redraw is False,
-        the trackNo-th track's y_data is changed to match the data found in
-        new_track. If self.enabled is True, the tracks are drawn. Finally,
-        the axes' clipbox is blitted to animate changes.
-        """
-        self.ax.set_xlim(0, self.track_npoints - 1)
-        self.ax.set_ylim(self.y_low, self.y_high)
-        self.fig.canvas.restore_region(self.background)
-        if redraw == False:
-            self.tracks[trackNo][0].set_ydata(new_tracks[trackNo].points)
-        if self.enabled:
-            for i in range(len(self.tracks)):
-                self.ax.draw_artist(self.tracks[i][0])
-        self.fig.canvas.blit(self.ax.clipbox)
-
-
-class WaveCanvas(FigureCanvas):
-    """
-    Contains waveform reflecting current analyzed/plotted waveform.
-
-    Arguments:
-        parent (CanvasGrid object) -- refers to parent CanvasGrid object, which
-            is a subclass of QWidget.
-
-    Attributes:
-        enabled (boolean) -- if True, wave is plotted.
-        current_waveform (np.array) -- stores most recently plotted waveform.
-
-    WaveCanvas stores the most recently plotted waveform and displays it if
-    displayDock.waveCheckBox is checked. Whenever the current display option is
-    changed (i.e. whenever displayDock's radio buttons to switch between synth
-    and loaded are pressed) the new waveform is plotted on wavecanvas using the
-    plot_waveform method even if the waveform is empty or not to be displayed.
-    This way, if the user checks waveCheckBox it will display the correct
-    waveform even if the waveCheckBox was unchecked when the display option was
-    switched.
-
-    TODO -- replace with more generic subclass of figure canvas, like a generic
-        subclass for non-animated plots? If it's worth it...
-    """
-    def __init__(self, parent=None):
-        self.fig = Figure()
-        self.ax  = self.fig.add_subplot(111)
-        self.ax.hold(False)
-        self.ax.xaxis.set_visible(False)
-        self.ax.yaxis.set_visible(False)
-        self.fig.subplots_adjust(left=0.08, right=0.95)
-        FigureCanvas.__init__(self, self.fig)
-        self.setParent(parent)
-
-        self.enabled = True
-        self.current_waveform = None
-
-    def clear(self):
-        self.ax.clear()
-        self.fig.canvas.draw()
-
-    def plot_waveform(self, waveform):
-        self.current_waveform = waveform
-        try:
-            if self.enabled == False:
-                self.clear()
-            else:
-                self.ax.plot(waveform)
-                self.fig.canvas.draw()
-        except ValueError:
-            return
-
-
-class STFTCanvas(FigureCanvas):
-    """
-    Contains mag. spec. of small snippet of waveform around mouse cursor.
-
-    Arguments:
-        parent (CanvasGrid object) -- refers to parent CanvasGrid object, which
-            is a subclass of QWidget.
-
-    Attributes:
-        background -- background stored from copy_from_bbox operation
-        enabled (boolean) -- if True, STFT is plotted.
-        stft (np.array) -- contains most recently plotted STFT
-        stft_size (int) -- size of STFT frame in samples
-
-    STFTCanvas is updated by the mouse() slot in Slots. A small chunk of the
-    current displayed/analyzed waveform is grabbed, centered on the current
-    x_loc of the mouse cursor and the magnitude spectrum of the chunk is
-    calculated and displayed (if the STFT checkbox is checked). Uses blitting
-    to animate the plot efficiently.
-
-    TODO -- consider ways to use trackCanvas as parent class, might make things
-        easier and reduce code repetition?
-    """
-    def __init__(self, parent=None):
-        self.fig = Figure()
-        self.ax  = self.fig.add_subplot(111)
-        self.ax.hold(False)
-        self.ax.xaxis.set_visible(False)
-        self.ax.yaxis.set_visible(False)
-        self.fig.subplots_adjust(top=0.95, bottom=0.1)
-        FigureCanvas.__init__(self, self.fig)
-        self.setParent(parent)
-
-        self.background = None
-        self.enabled = True
-        self.stft = None
-        self.stft_size = DEFAULT_PARAMS.stft_size
-
-    def start(self, restart=False):
-        self.ax.clear()
-        self.ax.set_xlim(-20, 40)
-        self.ax.set_ylim(0, self.stft_size)
-        self.fig.canvas.draw()
-        self.background = self.fig.canvas.copy_from_bbox(self.ax.get_figure().bbox)
-        self.stft, = self.ax.plot(np.ones([self.stft_size])*-20, np.arange(self.stft_size))
-        self.fig.canvas.draw()
-        self.ax.set_xlim(-20, 40)
-        self.ax.set_ylim(0, self.stft_size)
-        if restart:
-            self.update_stft(self.current_stft)
-
-    def update_stft(self, new_stft=0):
-        try:
-            self.stft.set_xdata(new_stft[0:-1])
-            self.current_stft = new_stft[0:-1]
-            self.fig.canvas.restore_region(self.background)
-            if self.enabled:
-                self.ax.draw_artist(self.stft)
-                self.fig.canvas.blit(self.ax.clipbox)
-        except RuntimeError:
-            pass
-
-
-class SpecCanvas(trackCanvas):
-    """
-    Contains tracks reflecting formant frequencies and plots spectrograms.
-
-    Arguments:
-        See trackCanvas's doc string.
-
-    Attributes:
-        See trackCanvas's doc string.
-        current_waveform (np.array) -- waveform corresponding to the most
-            recently plotted waveform.
-        current_fs (int) -- sampling rate in Hz corresponding to the most
-            recently plotted waveform.
-        y_high (int) -- modified from trackCanvas defaults, set as f/2 since
-            spectrogram is to be plotted.
-        nformant (int) -- just keeps track of current number of formants to be
-            reflected in tracks. May be best to replace its functionality, need
-            to change references to it in Slots.
-
-    SpecCanvas adds a number of attributes (and changes one default attribute)
-    from its parent class, trackCanvas. It also adds a new method,
-    plot_specgram(), which accepts data from TrackDraw about how to plot the
-    spectrogram and then plots it and calls the right methods to make sure
-    tracks are also still plotted.
-
-    TODO -- figure out why it's only plotting the first track on startup
-    """
-    def __init__(self, parent=None):
-        trackCanvas.__init__(self, parent=parent)
-
-        # Set SpecCanvas unique plot settings
-        self.ax.set_xlabel("Time [s]")
-        self.ax.set_ylabel("Frequency [Hz]")
-        self.fig.subplots_adjust(left=0.08, top=0.95, right=0.95, bottom=0.1)
-
-        # Initialize SpecCanvas unique attributes, or adjust defaults
-        self.current_waveform = None
-        self.current_fs = None
-        self.y_high = DEFAULT_PARAMS.synth_fs/2
-        self.nformant = DEFAULT_PARAMS.nformant
-
-    def plot_specgram(self, x_right=1.0, waveform=0, fs=0, window_len=256,
-                      noverlap=0.5, window_type=np.hanning, tracks=0,
-                      restart=False):
-        """
-        Plots spectrogram on spec_cv
-
-        Arguments:
-            x_right (float) -- right limit in x-dimension, usually set to
-                analyzed waveform's duration
-            waveform (np.array) -- waveform to be analyzed in spectrogram
-            fs (int) -- sampling rate in Hz
-            window_len (int) -- length of window to be used in samples
-            noverlap (int) -- proportion overlap to be used for windows
-            window_type (window function) -- some type of window function from
-                numpy.
-            tracks (list) -- list of TrackDrawData.Track objects, used to
-                redraw tracks after spectrogram is plotted.
-            restart (boolean) -- if False, creates spectrogram based on input
-                waveform/fs/duration/etc., if True, creates spectrogram based
-                on previously used waveform/fs/duration/etc. cached from last
-                call in current_waveform, current_fs
-
-        plot_specgram() handles the task of plotting a spectrogram to the
-        specCanvas based on input waveform/fs data or based on cached
-        waveform/fs data from the most recent call to plot_specgram(). The axes
-        are temporarily set to values appropriate for the spectrogram, then the
-        new background (containing the plotted spectrogram) is grabbed and axes
-        are restored to a scale appropriate for all Track related features.
-
-        TODO -- look into automatic zero-padding to fix scaling issues?
-        TODO -- condense restart branches into one set of code
-        TODO -- implement more clear system for setting limits and duration...
-        """
-        if restart == False:
-            self.current_waveform = waveform
-            self.current_fs = fs
-            self.y_high = fs/2
-            self.ax.clear()
-            self.tracks = []
-            self.ax.specgram(self.current_waveform, NFFT=window_len, Fs=self.current_fs,\
-                             noverlap=int(window_len*noverlap), window=window_type(window_len),
-                             cmap=plt.cm.gist_heat)
-            self.fig.canvas.draw()
-            self.getBackground()
-            for i in range(len(tracks)):
-                self.tracks.append(self.ax.plot(tracks[i].points, color="blue", marker="o"))
-            self.updateCanvas(redraw=True)
-        elif restart == True:
-            self.ax.clear()
-            self.ax.specgram(self.current_waveform, NFFT=window_len, Fs=self.current_fs,\
-                             noverlap=int(window_len*noverlap), window=window_type(window_len),
-                             cmap=plt.cm.gist_heat)
-            self.fig.canvas.draw()
-            self.background = self.fig.canvas.copy_from_bbox(self.ax.get_figure().bbox)
-            self.updateCanvas(redraw=True)
-
-
-class F0Canvas(trackCanvas):
-    """
-    Contains track representing an F0 contour.
-
-    Attributes:
-        See trackCanvas' doc string.
-        y_low (int) -- modified from trackCanvas, set to 90 as the lower margin
-            for possible F0.
-        y_high (int) -- modified from trackCavnas, set to 150 as the upper
-            margin for possible F0.
-
-    F0Canvas simply changes a handful fo default values from trackCanvas, and
-    otherwise functions as a typical trackCanvas.
-    """
-    def __init__(self, parent=None):
-        trackCanvas.__init__(self, parent=parent)
-
-        # Set F0Canvas unique plot settings
-        self.ax.xaxis.set_visible(False)
-        self.fig.subplots_adjust(left=0.08, right=0.95)
-
-        # Initialize F0Canvas unique attributes, or adjust defaults
-        self.y_low = 90
-        self.y_high = 150
-
-
 class DisplayDock(QDockWidget):
     """
     Contains interface/controls for all main window display parameters.
@@ -459,7 +120,7 @@ class DisplayDock(QDockWidget):
                 keys=["Number of points", "Bubble size"],
                 units=["", "Hz"],
                 mins=[20, 50],
-                maxs=[100, 500],
+                maxs=[400, 500],
                 values=[DEFAULT_PARAMS.track_npoints,
                        DEFAULT_PARAMS.bubble_len])
 
@@ -617,6 +278,8 @@ class SynthesisDock(QDockWidget):
             number of formants to be synthesized.
         klattGroup (QGroupBox) -- groupbox for Klatt synthesizer parameters
         sineGroup (QGroupBox) -- groupbox for Sine wave synthesizer parameters
+        sineModeComboBox (QComboBox) -- combobox allowing for selection of
+            the sine wave synthesizer's mode, see synth/sine.py.
         amplitudeGroup (SliderGroup2) -- group of sliders to control different
             amplifier parameters in the Klatt synthesizer.
         FFBandwidthGroup (SliderGroup2) -- group of sliders to allow for
@@ -687,9 +350,7 @@ class SynthesisDock(QDockWidget):
                 units=["Hz", "Hz", "Hz", "Hz", "Hz"],
                 mins=[50, 50, 10, 50, 50],
                 maxs=[250, 250, 250, 250, 250],
-                values=[DEFAULT_PARAMS.BW[0], DEFAULT_PARAMS.BW[1],
-                        DEFAULT_PARAMS.BW[2], DEFAULT_PARAMS.BW[3],
-                        DEFAULT_PARAMS.BW[4]])
+                values=[int(bw) for bw in DEFAULT_PARAMS.BW])
 
         klattVBox.addWidget(voicingGroup)
         klattVBox.addWidget(self.amplitudeGroup)
@@ -700,6 +361,13 @@ class SynthesisDock(QDockWidget):
         self.sineGroup = QGroupBox("Sine wave synthesizer settings")
         sineVBox = QVBoxLayout()
         self.sineGroup.setLayout(sineVBox)
+        sineModeLabel = QLabel("Mode:")
+        self.sineModeComboBox = QComboBox()
+        self.sineModeComboBox.addItems(["One sine wave per formant",
+                                        "Harmonics of F0"])
+        self.sineModeComboBox.setCurrentIndex(0)
+        sineVBox.addWidget(sineModeLabel)
+        sineVBox.addWidget(self.sineModeComboBox)
         ###
 
         ### Synthesize button
@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analysis routines for TrackDraw 2016 (pitch estimation, etc.).
+"""
+
+import analysis.pitch
+import analysis.fitting
+import analysis.spectrogram
+import analysis.tiles
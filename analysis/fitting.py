@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@name:    fitting.py
+@date:    10/18/2026
+@version: 0.1
+@purpose: Fit formant and F0 tracks to a loaded sound by analysis-by-synthesis.
+
+@overview:
+    fit_tracks() adjusts formant tracks and an F0 track so that the output of
+    the synthesizer selected in a Parameters object matches a target sound as
+    closely as possible, measured by a frame-wise spectral distance.
+
+    The search is a pattern search over a small number of knots spread along
+    each track. In every round, each knot of each track is nudged up and down
+    by the current step (a fraction of the track's value), with the change
+    tapering off linearly towards the neighbouring knots. All of these
+    candidates are synthesized and scored in parallel in a process pool. The
+    best single move is compared against the combination of all improving
+    moves and the better one is kept. When a round brings no improvement the
+    step is halved, and the search stops after patience rounds without
+    improvement, when the step falls below min_step, or after max_iter
+    rounds.
+
+    fit_tracks() does not need Qt and can be called from scripts. Progress is
+    reported through an optional callback.
+"""
+import copy
+import numpy as np
+
+from analysis.pitch import frame_signal
+
+
+def log_spectrogram(waveform, fs, window_len=256, hop=None, floor_db=-60):
+    """
+    Computes a frame-wise log-magnitude spectrum.
+
+    Arguments:
+        waveform (np.array) -- signal to be analyzed.
+        fs (int) -- sampling rate in Hz.
+        window_len (int) -- length of Hamming window in samples.
+        hop (int) -- number of samples between frames, defaults to half a
+            window.
+        floor_db (float) -- spectra are floored at this level relative to
+            the maximum of the whole spectrogram.
+
+    Returns an (n_frames, window_len//2 + 1) array of levels in dB, with each
+    frame's mean level subtracted so that only spectral shape is compared.
+    Also returns the frame levels in dB before this normalization.
+    """
+    if hop is None:
+        hop = window_len//2
+    frames = frame_signal(np.asarray(waveform, dtype=np.float64),
+                          window_len, hop)
+    spec = np.abs(np.fft.rfft(frames*np.hamming(window_len), axis=1))
+    spec = 20*np.log10(spec + 1e-12)
+    spec = np.maximum(spec, spec.max() + floor_db)
+    level = spec.mean(axis=1)
+    return(spec - level[:, np.newaxis], level)
+
+
+def spectral_distance(spec, target_spec, weights):
+    """
+    Weighted mean squared difference between two normalized spectrograms.
+
+    Arguments:
+        spec, target_spec (np.array) -- outputs of log_spectrogram().
+        weights (np.array) -- one weight per frame of target_spec.
+
+    If spec has a different number of frames than target_spec, only the
+    frames they have in common are compared.
+    """
+    n = min(spec.shape[0], target_spec.shape[0])
+    err = np.mean((spec[0:n] - target_spec[0:n])**2, axis=1)
+    return(float(np.sum(err*weights[0:n])/np.sum(weights[0:n])))
+
+
+##### Worker process state and functions #####
+_WORKER = {}
+
+def _init_worker(parms, target_spec, weights, window_len):
+    """ Stores data shared by all evaluations in a worker process. """
+    _WORKER["parms"] = parms
+    _WORKER["target_spec"] = target_spec
+    _WORKER["weights"] = weights
+    _WORKER["window_len"] = window_len
+
+def _evaluate(candidate):
+    """
+    Synthesizes one candidate and scores it against the target.
+
+    Arguments:
+        candidate (np.array) -- (n_form + 1, track_npoints) array, one row
+            per formant track followed by the F0 track.
+    """
+    import synth
+    parms = copy.copy(_WORKER["parms"])
+    parms.FF = candidate[0:-1].T
+    parms.F0 = candidate[-1]
+    if parms.synth_type == "Sine wave":
+        waveform = synth.sine.sine_make(parms)
+    else:
+        waveform = synth.klatt.klatt_make(parms)
+    spec, _ = log_spectrogram(waveform, parms.synth_fs,
+                              _WORKER["window_len"])
+    return(spectral_distance(spec, _WORKER["target_spec"],
+                             _WORKER["weights"]))
+##### End worker process state and functions #####
+
+
+def _knot_bumps(n_knots, track_npoints):
+    """
+    Builds one triangular bump per knot, each of length track_npoints.
+
+    Neighbouring bumps overlap so that they sum to one everywhere, so a move
+    applied to every knot at once shifts the whole track.
+    """
+    knots = np.linspace(0, track_npoints - 1, n_knots)
+    x = np.arange(track_npoints)
+    width = knots[1] - knots[0] if n_knots > 1 else track_npoints
+    return(np.maximum(0, 1 - np.abs(x[np.newaxis, :] - knots[:, np.newaxis])
+                                 /width))
+
+
+def _constrain(points, fs, gap=50):
+    """
+    Keeps formant tracks ordered and within the synthesizable range.
+
+    Arguments:
+        points (np.array) -- (n_form + 1, track_npoints) candidate array. The
+            last row (F0) is left untouched apart from a lower limit.
+        fs (int) -- synthesis sampling rate in Hz.
+        gap (float) -- minimum distance in Hz between neighbouring formants.
+    """
+    formants = np.clip(points[0:-1], gap, fs/2 - gap)
+    for i in range(1, formants.shape[0]):
+        formants[i] = np.maximum(formants[i], formants[i-1] + gap)
+    points[0:-1] = np.minimum(formants, fs/2 - gap)
+    points[-1] = np.maximum(points[-1], 20)
+    return(points)
+
+
+def fit_tracks(parms, target, tracks, f0_track, n_knots=8, step=0.1,
+               min_step=0.005, patience=3, max_iter=50, n_workers=None,
+               progress=None):
+    """
+    Fits formant and F0 tracks to a target sound by analysis-by-synthesis.
+
+    Arguments:
+        parms (TrackDrawData.Parameters object) -- synthesis parameters. Its
+            FF and F0 values are ignored, everything else (bandwidths,
+            amplitudes, synth_type, synth_fs, window_len) is used as is.
+        target (TrackDrawData.Sound object) -- sound to be matched.
+        tracks (TrackDrawData.TrackSet object) -- the formant tracks used
+            as a starting point.
+        f0_track (TrackDrawData.TrackSet object) -- the F0 track used as a
+            starting point.
+        n_knots (int) -- number of adjustable knots along each track.
+        step (float) -- initial size of moves, as a fraction of the value of
+            the track at each point.
+        min_step (float) -- search stops once the step is smaller than this.
+        patience (int) -- search stops after this many consecutive rounds
+            without improvement.
+        max_iter (int) -- maximum number of rounds.
+        n_workers (int) -- number of worker processes, defaults to the
+            number of CPUs.
+        progress (function) -- called after every round as
+            progress(iteration, distance, step). If it returns False, the
+            search stops early.
+
+    Returns (ff_points, f0_points, distance), where ff_points is an
+    (n_form, track_npoints) array of fitted formant tracks, f0_points a
+    track_npoints array and distance the spectral distance of the fit.
+    The input tracks are not modified.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    parms = copy.copy(parms)
+    fs = parms.synth_fs
+    waveform = target.waveform
+    if waveform.ndim > 1:
+        waveform = np.mean(waveform, axis=1)
+    if target.fs != fs:
+        from scipy import signal
+        waveform = signal.resample(waveform, round(fs/target.fs*len(waveform)))
+    parms.dur = len(waveform)/fs
+    target_spec, level = log_spectrogram(waveform, fs, parms.window_len)
+    # Ignore frames that are close to silent in the target
+    weights = (level > level.max() - 40).astype(np.float64)
+
+    current = np.vstack((tracks.points, f0_track.points[0:1]))
+    current = _constrain(current, fs)
+    n_rows, track_npoints = current.shape
+    bumps = _knot_bumps(n_knots, track_npoints)
+
+    # Spawned rather than forked, since the GUI runs fits from a thread pool
+    # and a forked worker could inherit locks held by other threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(parms, target_spec, weights,
+                                       parms.window_len),
+                             mp_context=context) as pool:
+        distance = pool.submit(_evaluate, current).result()
+        stale = 0
+        for iteration in range(max_iter):
+            # One move up and one move down for every knot of every track
+            moves = []
+            for row in range(n_rows):
+                for knot in range(n_knots):
+                    for sign in (1, -1):
+                        delta = np.zeros_like(current)
+                        delta[row] = sign*step*current[row]*bumps[knot]
+                        moves.append(delta)
+            candidates = [_constrain(current + delta, fs) for delta in moves]
+            scores = np.array(list(pool.map(_evaluate, candidates)))
+            # Combine the better direction of every improving knot
+            best = scores.argmin()
+            pairs = scores.reshape(-1, 2)
+            improving = pairs.min(axis=1) < distance
+            new_points, new_distance = candidates[best], scores[best]
+            if improving.sum() > 1:
+                combined = current.copy()
+                for idx in np.flatnonzero(improving):
+                    combined += moves[2*idx + pairs[idx].argmin()]
+                combined = _constrain(combined, fs)
+                combined_distance = pool.submit(_evaluate, combined).result()
+                if combined_distance < new_distance:
+                    new_points, new_distance = combined, combined_distance
+            if new_distance < distance:
+                current, distance = new_points, new_distance
+                stale = 0
+            else:
+                step = step/2
+                stale = stale + 1
+            if progress is not None:
+                if progress(iteration, distance, step) is False:
+                    break
+            if stale >= patience or step < min_step:
+                break
+    return(current[0:-1], current[-1], distance)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@name:    pitch.py
+@date:    10/18/2026
+@version: 0.1
+@purpose: Estimate fundamental frequency contours of loaded sounds.
+
+@overview:
+    pitch.py implements a YIN-style F0 estimator (de Cheveigne & Kawahara,
+    2002). Rather than looping over frames, the whole waveform is cut into
+    overlapping frames with a strided view and the difference function for
+    every frame is computed at once from batched FFT cross-correlations and
+    cumulative energy sums. This keeps the cost on the order of a spectrogram
+    computation, so F0 can be estimated automatically whenever a sound is
+    loaded.
+
+    yin() returns frame-wise F0 estimates with voicing decisions, and
+    f0_track() resamples those estimates to the points of a TrackDraw track.
+
+    de Cheveigne, A., & Kawahara, H. (2002). YIN, a fundamental frequency
+    estimator for speech and music. The Journal of the Acoustical Society of
+    America, 111(4), 1917-1930. http://dx.doi.org/10.1121/1.1458024
+"""
+import numpy as np
+
+
+def frame_signal(x, frame_len, hop):
+    """
+    Cuts a signal into overlapping frames without copying it.
+
+    Arguments:
+        x (np.array) -- signal to be framed.
+        frame_len (int) -- length of each frame in samples.
+        hop (int) -- number of samples between the starts of frames.
+
+    The signal is zero-padded at its end so that every sample starts at most
+    one hop before a frame. Returns a read-only (n_frames, frame_len) view of
+    the padded signal.
+    """
+    n_frames = max(1, int(np.ceil(len(x)/hop)))
+    padded = np.zeros([(n_frames - 1)*hop + frame_len])
+    padded[0:len(x)] = x
+    stride = padded.strides[0]
+    frames = np.lib.stride_tricks.as_strided(padded,
+                                             shape=(n_frames, frame_len),
+                                             strides=(hop*stride, stride))
+    frames.flags.writeable = False
+    return(frames)
+
+
+def yin(waveform, fs, f0_min=60, f0_max=400, threshold=0.15, hop=None,
+        silence_db=-40):
+    """
+    Estimates a frame-wise F0 contour with the YIN algorithm.
+
+    Arguments:
+        waveform (np.array) -- signal to be analyzed.
+        fs (int) -- sampling rate in Hz.
+        f0_min (float) -- lowest F0 to be detected in Hz.
+        f0_max (float) -- highest F0 to be detected in Hz.
+        threshold (float) -- absolute threshold on the cumulative mean
+            normalized difference function below which a frame is voiced.
+        hop (int) -- number of samples between frames, defaults to 5 ms.
+        silence_db (float) -- frames whose energy is this many dB below the
+            most energetic frame are always treated as unvoiced.
+
+    Returns (times, f0, voiced, aperiodicity), each with one entry per frame.
+    times are frame centers in seconds, f0 is in Hz (the best estimate is
+    given even for unvoiced frames), voiced is a boolean array, and
+    aperiodicity is the minimum of the normalized difference function (0 for
+    perfectly periodic frames).
+    """
+    x = np.asarray(waveform, dtype=np.float64)
+    if hop is None:
+        hop = int(round(0.005*fs))
+    tau_min = max(2, int(fs/f0_max))
+    tau_max = int(np.ceil(fs/f0_min)) + 1
+    win_len = tau_max
+    frame_len = win_len + tau_max + 1
+    frames = frame_signal(x, frame_len, hop)
+
+    # Cross term of the difference function for all frames and lags at once
+    nfft = int(2**np.ceil(np.log2(frame_len)))
+    head = np.fft.rfft(frames[:, 0:win_len], nfft)
+    full = np.fft.rfft(frames, nfft)
+    corr = np.fft.irfft(np.conj(head)*full, nfft)[:, 0:tau_max+1]
+    # Energy terms from cumulative sums of squares
+    energy = np.zeros([frames.shape[0], frame_len + 1])
+    np.cumsum(frames**2, axis=1, out=energy[:, 1:])
+    shifted = energy[:, win_len:win_len+tau_max+1] - energy[:, 0:tau_max+1]
+    diff = shifted[:, 0:1] + shifted - 2*corr
+    diff[:, 0] = 0
+    np.maximum(diff, 0, out=diff)
+
+    # Cumulative mean normalized difference function
+    lags = np.arange(tau_max + 1)
+    running = np.cumsum(diff, axis=1)
+    running[running == 0] = np.finfo(np.float64).tiny
+    cmndf = np.ones_like(diff)
+    cmndf[:, 1:] = diff[:, 1:]*lags[1:]/running[:, 1:]
+
+    # First local minimum below threshold, else the global minimum
+    search = cmndf[:, tau_min:tau_max]
+    below = search < threshold
+    below[:, :-1] &= search[:, 1:] >= search[:, :-1]
+    found = below.any(axis=1)
+    tau = np.where(found, below.argmax(axis=1),
+                   search.argmin(axis=1)) + tau_min
+    rows = np.arange(frames.shape[0])
+    aperiodicity = cmndf[rows, tau]
+
+    # Parabolic interpolation around the chosen lag
+    left = cmndf[rows, tau - 1]
+    right = cmndf[rows, tau + 1]
+    denom = left - 2*aperiodicity + right
+    safe = np.abs(denom) > 1e-12
+    offset = np.zeros_like(aperiodicity)
+    offset[safe] = 0.5*(left[safe] - right[safe])/denom[safe]
+    f0 = fs/(tau + np.clip(offset, -1, 1))
+
+    # Voicing decision
+    power = shifted[:, 0]/win_len
+    loud = 10*np.log10(power/max(power.max(), 1e-30) + 1e-30) > silence_db
+    voiced = found & loud & (f0 >= f0_min) & (f0 <= f0_max)
+    times = (rows*hop + win_len/2)/fs
+    return(times, f0, voiced, aperiodicity)
+
+
+def f0_track(waveform, fs, track_npoints, f0_min=60, f0_max=400,
+             threshold=0.15, hop=None, default=100):
+    """
+    Estimates an F0 contour and samples it at the points of a track.
+
+    Arguments:
+        waveform (np.array) -- signal to be analyzed.
+        fs (int) -- sampling rate in Hz.
+        track_npoints (int) -- number of points in the output track.
+        f0_min, f0_max, threshold, hop -- see yin().
+        default (float) -- F0 value used when no frame is voiced.
+
+    Track points are spread evenly from the start to the end of the
+    waveform, in the same way the synthesizers interpolate tracks. Unvoiced
+    stretches are bridged by linear interpolation between the neighbouring
+    voiced frames, and held flat before the first and after the last one.
+    Returns an np.array of length track_npoints.
+    """
+    dur = len(waveform)/fs
+    times, f0, voiced, _ = yin(waveform, fs, f0_min=f0_min, f0_max=f0_max,
+                               threshold=threshold, hop=hop)
+    if not voiced.any():
+        return(default*np.ones([track_npoints]))
+    track_times = np.linspace(0, dur, track_npoints)
+    return(np.interp(track_times, times[voiced], f0[voiced]))
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@name:    spectrogram.py
+@date:    10/18/2026
+@version: 0.1
+@purpose: Compute spectrograms for display, independently of any canvas.
+
+@overview:
+    specgram() performs the same computation as matplotlib's Axes.specgram(),
+    but returns the image data and its extent instead of drawing it. This
+    allows the spectrogram to be computed in a worker thread while the canvas
+    is only touched from the GUI thread.
+"""
+import numpy as np
+
+
+def specgram(waveform, fs, window_len=256, noverlap=0.5, window_type="hamming"):
+    """
+    Computes a spectrogram image in dB.
+
+    Arguments:
+        waveform (np.array) -- waveform to be analyzed.
+        fs (int) -- sampling rate in Hz.
+        window_len (int) -- length of window to be used in samples.
+        noverlap (float) -- proportion overlap to be used for windows.
+        window_type (str or window function) -- name of a window function
+            from numpy, e.g. "hamming", or the function itself.
+
+    Returns (Z, extent), where Z is a (n_freqs, n_frames) array with the
+    highest frequency in the first row, ready to be passed to imshow() with
+    origin="upper", and extent is (x_min, x_max, f_min, f_max) in seconds and
+    Hz.
+    """
+    import matplotlib.mlab as mlab
+    if isinstance(window_type, str):
+        window_type = getattr(np, window_type)
+    overlap = int(window_len*noverlap)
+    spec, freqs, t = mlab.specgram(waveform, NFFT=window_len, Fs=fs,
+                                   noverlap=overlap,
+                                   window=window_type(window_len))
+    Z = np.flipud(10*np.log10(spec))
+    pad_xextent = (window_len - overlap)/fs/2
+    extent = (np.min(t) - pad_xextent, np.max(t) + pad_xextent,
+              freqs[0], freqs[-1])
+    return(Z, extent)
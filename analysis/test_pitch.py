@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@name:    test_pitch.py
+@date:    10/18/2026
+@version: 0.1
+@purpose: Tests of the YIN F0 estimator on synthetic tones.
+"""
+import numpy as np
+
+import analysis.pitch as pitch
+
+
+FS = 10000
+
+
+def tone(f0, dur=0.5, n_harm=10):
+    """
+    Returns a harmonic tone whose F0 follows f0, a constant or a function
+    of time in seconds, with harmonics falling off at 6 dB per octave.
+    """
+    t = np.arange(int(dur*FS))/FS
+    f0 = np.broadcast_to(f0(t) if callable(f0) else f0, t.shape)
+    phase = 2*np.pi*np.cumsum(f0)/FS
+    return(sum(np.sin(k*phase)/k for k in range(1, n_harm + 1)))
+
+
+def test_frame_signal():
+    x = np.arange(10.0)
+    frames = pitch.frame_signal(x, 4, 3)
+    assert frames.shape == (4, 4)
+    assert list(frames[1]) == [3, 4, 5, 6]
+    assert list(frames[-1]) == [9, 0, 0, 0]
+    assert not frames.flags.writeable
+
+def test_yin_steady_tone():
+    times, f0, voiced, aperiodicity = pitch.yin(tone(150), FS)
+    assert len(times) == len(f0) == len(voiced) == len(aperiodicity)
+    assert np.all(np.diff(times) > 0)
+    # Frames reaching into the zero padding at the end may be unvoiced
+    inner = slice(0, len(f0) - 10)
+    assert voiced[inner].all()
+    assert np.allclose(f0[inner], 150, rtol=0.01)
+    assert np.all(aperiodicity[inner] < 0.15)
+
+def test_yin_default_hop():
+    times, _, _, _ = pitch.yin(tone(150), FS)
+    assert np.allclose(np.diff(times), 0.005)
+    times, _, _, _ = pitch.yin(tone(150), FS, hop=100)
+    assert np.allclose(np.diff(times), 0.01)
+
+def test_yin_silence_and_noise_unvoiced():
+    _, _, voiced, _ = pitch.yin(np.zeros(FS//2), FS)
+    assert not voiced.any()
+    rng = np.random.RandomState(0)
+    _, _, voiced, _ = pitch.yin(rng.randn(FS//2), FS)
+    assert voiced.mean() < 0.1
+
+def test_yin_quiet_frames_unvoiced():
+    x = tone(200)
+    x[0:FS//4] *= 1e-4
+    times, f0, voiced, _ = pitch.yin(x, FS)
+    assert not voiced[times < 0.2].any()
+    middle = (times > 0.3) & (times < 0.45)
+    assert voiced[middle].all()
+    assert np.allclose(f0[middle], 200, rtol=0.01)
+
+def test_yin_respects_range():
+    _, _, voiced, _ = pitch.yin(tone(150), FS, f0_min=200, f0_max=400)
+    assert voiced.mean() < 0.1
+
+def test_f0_track_glide():
+    x = tone(lambda t: 100 + 200*t, dur=0.5)
+    track = pitch.f0_track(x, FS, 11)
+    assert track.shape == (11,)
+    expected = 100 + 200*np.linspace(0, 0.5, 11)
+    # The ends are held at the first and last voiced frames
+    assert np.allclose(track[1:-1], expected[1:-1], rtol=0.03)
+
+def test_f0_track_unvoiced_default():
+    track = pitch.f0_track(np.zeros(FS//2), FS, 20, default=120)
+    assert np.array_equal(track, 120*np.ones(20))
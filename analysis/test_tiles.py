@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@name:    test_tiles.py
+@date:    10/18/2026
+@version: 0.1
+@purpose: Tests of the tiled spectrogram against analysis.spectrogram.
+"""
+import numpy as np
+import pytest
+
+import analysis.tiles as tiles
+from analysis.spectrogram import specgram
+
+
+FS = 10000
+
+
+@pytest.fixture
+def waveform():
+    rng = np.random.RandomState(0)
+    t = np.arange(3*FS)/FS
+    return(np.sin(2*np.pi*440*t) + 0.1*rng.randn(len(t)))
+
+def compute_all(tiled, level):
+    """ Computes and stores every tile of a level. """
+    n = tiled.n_frames(level)
+    for index in range((n - 1)//tiles.TILE_FRAMES + 1):
+        tiled.store(level, index, tiled.compute_tile(level, index))
+
+def level_power(tiled, level):
+    """ Power of every frame of a level, pooled the slow way from level 0. """
+    power = tiled.power(0, tiled.n_frames(0))
+    factor = 1 << level
+    out = []
+    for j in range(tiled.n_frames(level)):
+        lo = max(j*factor - factor//2, 0)
+        out.append(power[lo:(j + 1)*factor - factor//2].max(axis=0))
+    return(np.array(out))
+
+
+@pytest.mark.parametrize("window_len, noverlap, window_type",
+                         [(256, 0.5, "hamming"), (255, 0.75, "hanning"),
+                          (64, 0, "blackman")])
+def test_level_0_matches_specgram(waveform, window_len, noverlap,
+                                  window_type):
+    Z, extent = specgram(waveform, FS, window_len, noverlap, window_type)
+    tiled = tiles.TiledSpecgram(tiles.TileCache(), waveform, FS, window_len,
+                                noverlap, window_type)
+    assert tiled.n_frames(0) == Z.shape[1]
+    compute_all(tiled, 0)
+    image, image_extent = tiled.image(0, 0, len(waveform)/FS)
+    assert image.shape == Z.shape
+    assert np.allclose(image, Z, atol=1e-3)
+    assert np.allclose(image_extent, extent)
+
+def test_image_of_part(waveform):
+    Z, _ = specgram(waveform, FS)
+    tiled = tiles.TiledSpecgram(tiles.TileCache(), waveform, FS)
+    compute_all(tiled, 0)
+    first, last = tiled.frame_range(0, 1.0, 1.5)
+    image, extent = tiled.image(0, 1.0, 1.5)
+    assert np.allclose(image, Z[:, first:last + 1], atol=1e-3)
+    assert extent[0] <= 1.0 and extent[1] >= 1.5
+
+@pytest.mark.parametrize("level", [1, 3, 7])
+def test_coarse_levels_pool_frames(waveform, level):
+    tiled = tiles.TiledSpecgram(tiles.TileCache(), waveform, FS)
+    compute_all(tiled, level)
+    image, _ = tiled.image(level, 0, len(waveform)/FS)
+    expected = 10*np.log10(level_power(tiled, level))
+    assert np.allclose(image, np.flipud(expected.T), atol=1e-3)
+
+def test_coarse_levels_keep_clicks():
+    x = np.zeros(3*FS)
+    x[12345:12349] = 1
+    tiled = tiles.TiledSpecgram(tiles.TileCache(), x, FS)
+    for level in range(8):
+        compute_all(tiled, level)
+        image, _ = tiled.image(level, 0, len(x)/FS)
+        assert image.max() > -50
+
+def test_missing_and_image_without_tiles(waveform):
+    tiled = tiles.TiledSpecgram(tiles.TileCache(), waveform, FS)
+    indices = tiled.tiles(2, 0, 1)
+    assert tiled.missing(2, indices) == list(indices)
+    assert tiled.image(2, 0, 1) is None
+    for index in indices:
+        tiled.store(2, index, tiled.compute_tile(2, index))
+    assert tiled.missing(2, indices) == []
+    assert tiled.image(2, 0, 1) is not None
+
+def test_level_choice(waveform):
+    tiled = tiles.TiledSpecgram(tiles.TileCache(), waveform, FS)
+    assert tiled.level(0, 0.1, 1000) == 0
+    level = tiled.level(0, 3, 200)
+    assert tiled.n_frames(level) >= 200 > tiled.n_frames(level + 1)
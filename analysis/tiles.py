@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@name:    tiles.py
+@date:    10/18/2026
+@version: 0.1
+@purpose: Compute spectrograms for display in tiles, at several resolutions.
+
+@overview:
+    A spectrogram of a whole long recording has far more frames than any
+    screen has pixel columns, so TiledSpecgram never computes one. Frames are
+    grouped into tiles of TILE_FRAMES frames each, at a number of levels: at
+    level 0 frames are spaced as in specgram(), and every level above doubles
+    the spacing. A view of the sound only needs the tiles of the coarsest
+    level that still has at least one frame per pixel column, so the number
+    of frames drawn for a view depends on the width of the plot, not on the
+    length of the sound or the part of it shown.
+
+    A frame at level L stands for the 2**L level 0 frames centered on it,
+    and holds the maximum of their power spectra in every frequency bin. So
+    a zoomed out view is a real lower resolution view of the sound: short
+    bursts and clicks between the frames' centers still show up, at their
+    full level, rather than being skipped. The maximum is used rather than
+    the mean so that they aren't smeared out to nothing over long hops.
+    Computing a coarse tile therefore reads all the samples it covers, in
+    chunks of POOL_CHUNK level 0 frames, which bounds the memory used.
+
+    Tiles are kept in a TileCache, shared by all sounds and window settings,
+    which drops the least recently used tiles once their total size exceeds a
+    memory budget. Panning or zooming only computes the tiles which are not
+    in the cache yet.
+
+    Tiles hold 10*log10 of the power spectral density, scaled as by
+    matplotlib's specgram(), so a view built from tiles looks the same as the
+    output of analysis.spectrogram.specgram() over the same stretch.
+"""
+from collections import OrderedDict
+import numpy as np
+
+
+TILE_FRAMES = 256
+MAX_LEVEL = 20
+# Level 0 frames computed at a time when pooling them into coarser levels
+POOL_CHUNK = 4096
+
+
+class TileCache:
+    """
+    Least recently used cache of spectrogram tiles with a memory budget.
+
+    Arguments:
+        budget (int) -- largest total size of the cached tiles in bytes.
+
+    Attributes:
+        nbytes (int) -- current total size of the cached tiles in bytes.
+
+    Not thread-safe. Tiles can be computed anywhere, but the cache is only
+    meant to be used from one thread, e.g. the GUI thread.
+    """
+    def __init__(self, budget=64*1024*1024):
+        self.budget = budget
+        self.nbytes = 0
+        self.tiles = OrderedDict()
+
+    def __contains__(self, key):
+        return(key in self.tiles)
+
+    def __len__(self):
+        return(len(self.tiles))
+
+    def get(self, key):
+        """ Returns the tile stored under key, or None, and marks it used. """
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return(tile)
+
+    def put(self, key, tile):
+        """ Stores a tile, dropping least recently used ones if needed. """
+        old = self.tiles.pop(key, None)
+        if old is not None:
+            self.nbytes = self.nbytes - old.nbytes
+        self.tiles[key] = tile
+        self.nbytes = self.nbytes + tile.nbytes
+        while self.nbytes > self.budget and len(self.tiles) > 1:
+            _, dropped = self.tiles.popitem(last=False)
+            self.nbytes = self.nbytes - dropped.nbytes
+
+    def clear(self):
+        self.tiles.clear()
+        self.nbytes = 0
+
+
+class TiledSpecgram:
+    """
+    The spectrogram of one sound with one set of window settings.
+
+    Arguments:
+        cache (TileCache) -- where tiles are kept.
+        waveform (np.array) -- signal to be analyzed, multiple channels are
+            averaged.
+        fs (int) -- sampling rate in Hz.
+        window_len (int) -- length of window to be used in samples.
+        noverlap (float) -- proportion overlap to be used for windows.
+        window_type (str or window function) -- name of a window function
+            from numpy, e.g. "hamming", or the function itself.
+
+    Attributes:
+        hop (int) -- samples between frames at level 0.
+        n_freqs (int) -- number of frequency bins of every frame.
+
+    compute_tile() only reads the waveform and can run in a worker thread.
+    The other methods use the cache, see TileCache.
+    """
+    def __init__(self, cache, waveform, fs, window_len=256, noverlap=0.5,
+                 window_type="hamming"):
+        if isinstance(window_type, str):
+            window_type = getattr(np, window_type)
+        self.cache = cache
+        self.waveform = waveform
+        self.fs = fs
+        self.window_len = window_len
+        self.window = window_type(window_len)
+        self.hop = max(1, window_len - int(window_len*noverlap))
+        self.n_freqs = window_len//2 + 1
+        # Stands for this spectrogram in cache keys, so that the cache does
+        # not keep the waveform alive
+        self.token = object()
+        # Scaling of the power spectral density, as in mlab.specgram()
+        self.scale = np.full(self.n_freqs, 2/(fs*np.sum(self.window**2)))
+        self.scale[0] = self.scale[0]/2
+        if window_len % 2 == 0:
+            self.scale[-1] = self.scale[-1]/2
+
+    def n_frames(self, level):
+        """ Number of frames at a level. """
+        n = len(self.waveform)
+        if n < self.window_len:
+            return(1)
+        return((n - self.window_len)//(self.hop << level) + 1)
+
+    def frame_range(self, level, t0, t1):
+        """ Returns (first, last) frame whose spacing overlaps t0 to t1 s. """
+        hop = self.hop << level
+        half = self.window_len/2
+        last = self.n_frames(level) - 1
+        first = int(np.floor((t0*self.fs - half)/hop))
+        end = int(np.ceil((t1*self.fs - half)/hop))
+        return(min(max(first, 0), last), min(max(end, 0), last))
+
+    def level(self, t0, t1, width):
+        """
+        Returns the coarsest level with at least one frame per pixel column
+        when t0 to t1 s are shown in width columns.
+        """
+        span = (t1 - t0)*self.fs/(self.hop*max(width, 1))
+        if span < 2:
+            return(0)
+        return(min(int(np.log2(span)), MAX_LEVEL))
+
+    def tiles(self, level, t0, t1):
+        """ Returns the indices of the tiles of a level covering t0 to t1 s. """
+        first, last = self.frame_range(level, t0, t1)
+        return(range(first//TILE_FRAMES, last//TILE_FRAMES + 1))
+
+    def key(self, level, index):
+        return((self.token, level, index))
+
+    def missing(self, level, indices):
+        """ Returns those indices whose tiles are not in the cache. """
+        return([index for index in indices
+                if self.key(level, index) not in self.cache])
+
+    def store(self, level, index, tile):
+        self.cache.put(self.key(level, index), tile)
+
+    def compute_tile(self, level, index):
+        """
+        Computes one tile.
+
+        Returns an (n_freqs, n) float32 array of levels in dB, lowest
+        frequency first, where n is TILE_FRAMES except for the last tile.
+        Above level 0, each frame pools the level 0 frames centered on it,
+        see the module doc string.
+        """
+        first = index*TILE_FRAMES
+        n = min(TILE_FRAMES, self.n_frames(level) - first)
+        if level == 0:
+            spec = self.power(first, n)
+        else:
+            factor = 1 << level
+            # Frame j pools level 0 frames bounds[j] to bounds[j + 1] - 1
+            bounds = np.clip((first + np.arange(n + 1))*factor - factor//2,
+                             0, self.n_frames(0))
+            spec = np.zeros((n, self.n_freqs))
+            for lo in range(bounds[0], bounds[-1], POOL_CHUNK):
+                hi = min(lo + POOL_CHUNK, bounds[-1])
+                j0 = np.searchsorted(bounds, lo, side="right") - 1
+                j1 = min(np.searchsorted(bounds, hi, side="left"), n)
+                starts = np.maximum(bounds[j0:j1], lo) - lo
+                pooled = np.maximum.reduceat(self.power(lo, hi - lo), starts,
+                                             axis=0)
+                np.maximum(spec[j0:j1], pooled, out=spec[j0:j1])
+        spec = 10*np.log10(np.maximum(spec, 1e-20))
+        return(np.ascontiguousarray(spec.T, dtype=np.float32))
+
+    def power(self, first, n):
+        """
+        Returns the (n, n_freqs) power spectral densities of n level 0
+        frames starting at frame first.
+        """
+        # Only the samples under the frames' windows are read
+        idx = first*self.hop + np.arange(n)[:, np.newaxis]*self.hop\
+                + np.arange(self.window_len)
+        outside = idx >= len(self.waveform)
+        frames = np.asarray(self.waveform[np.minimum(idx,
+                                                     len(self.waveform) - 1)],
+                            dtype=np.float64)
+        if frames.ndim > 2:
+            frames = np.mean(frames, axis=2)
+        frames[outside] = 0
+        return(np.abs(np.fft.rfft(frames*self.window, axis=1))**2*self.scale)
+
+    def image(self, level, t0, t1):
+        """
+        Assembles the spectrogram of t0 to t1 s from cached tiles.
+
+        Returns (Z, extent) like analysis.spectrogram.specgram(), covering
+        the frames of the level which overlap t0 to t1 s, or None if any of
+        the tiles needed is not in the cache. Missing tiles can be computed
+        with compute_tile() and added with store() first.
+        """
+        first, last = self.frame_range(level, t0, t1)
+        parts = []
+        for index in range(first//TILE_FRAMES, last//TILE_FRAMES + 1):
+            tile = self.cache.get(self.key(level, index))
+            if tile is None:
+                return(None)
+            lo = max(first - index*TILE_FRAMES, 0)
+            hi = min(last + 1 - index*TILE_FRAMES, tile.shape[1])
+            parts.append(tile[:, lo:hi])
+        Z = np.flipud(np.hstack(parts))
+        hop = (self.hop << level)/self.fs
+        half = self.window_len/2/self.fs
+        # The top bin is below fs/2 for odd window lengths
+        extent = (first*hop + half - hop/2, last*hop + half + hop/2,
+                  0, (self.n_freqs - 1)*self.fs/self.window_len)
+        return(Z, extent)
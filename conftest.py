@@ -0,0 +1,6 @@
+"""
+pytest configuration. Tests live next to the modules they test, as
+test_<module>.py.
+"""
+# Profiling script, not a test module
+collect_ignore = ["synth/klatt_test.py"]
@@ -1,34 +1,52 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import sys
+# With --startup-times, everything imported from here on is timed
+STARTUP = None
+if "--startup-times" in sys.argv:
+    import TrackDrawStartup
+    STARTUP = TrackDrawStartup.StartupTimer()
+    STARTUP.imports.install()
+
 import TrackDrawWidgets as TDW
 import TrackDrawSlots as TDS
 import TrackDrawData as TDD
-import sys
+import TrackDrawInteraction as TDI
+import argparse
 from functools import partial
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 
+if STARTUP is not None:
+    STARTUP.mark("imports")
+
 
 __version__ = "0.2.0"
 
 
 class MainWindow(QMainWindow):
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, renderer="matplotlib"):
         super(MainWindow, self).__init__(parent)
-        self.cw = TDW.CanvasGrid(self)
+        self.cw = TDW.CanvasGrid(self, renderer=renderer)
         self.setCentralWidget(self.cw)
-        slots = TDS.Slots(master=self)
+        self.session = TDD.Session()
+        slots = TDS.Slots(master=self, session=self.session)
 
         ##### Callbacks #####
         # Callbacks created using functools.partial
         audioOpen = partial(slots.audioOpen, parent=self)
         audioSave = partial(slots.audioSave, parent=self)
+        projectOpen = partial(slots.projectOpen, parent=self)
+        projectSave = partial(slots.projectSave, parent=self)
+        projectSaveAs = partial(slots.projectSaveAs, parent=self)
 
         helpAbout = partial(slots.helpAbout, parent=self)
         applyDefaults = partial(slots.applyDefaults)
+        undo = partial(slots.undo)
+        redo = partial(slots.redo)
 
         clearPlots = partial(slots.clearPlots)
         switchPlots = partial(slots.switchPlots)
@@ -46,11 +64,18 @@ class MainWindow(QMainWindow):
         changeSTFTSize = partial(slots.changeSTFTSize)
 
         synthesize = partial(slots.synthesize)
+        fitTracks = partial(slots.fitTracks, parent=self)
         changeBW = partial(slots.changeBW)
         changeSynth = partial(slots.changeSynth)
+        changeSineMode = partial(slots.changeSineMode)
         changeAmplitude = partial(slots.changeAmplitude)
 
         play = partial(slots.play)
+        stop = partial(slots.stop)
+
+        # Canvas motion events are coalesced and handled once per frame
+        self.scheduler = TDI.InteractionScheduler(slots.mouse, self)
+        showStats = partial(self.scheduler.showOverlay, self.cw)
         ##### End callbacks setup #####
 
         ##### Menus #####
@@ -62,6 +87,14 @@ class MainWindow(QMainWindow):
                 self.createMenuAction("&Save synthesis...", audioSave,
                     QKeySequence.Save, None, "Save the synthesized sound file"),
                 "|",
+                self.createMenuAction("Open &project...", projectOpen,
+                    "Ctrl+Shift+O", None, "Open a TrackDraw project"),
+                self.createMenuAction("Save p&roject", projectSave,
+                    "Ctrl+Shift+S", None,
+                    "Save tracks, parameters and sounds as a project"),
+                self.createMenuAction("Save project &as...", projectSaveAs,
+                    None, None, "Save the project under a new name"),
+                "|",
                 self.createMenuAction("&Quit", self.close, "Ctrl+Q", None,
                     "Close TrackDraw")]
         self.fileMenu = self.menuBar().addMenu("&File")
@@ -70,6 +103,15 @@ class MainWindow(QMainWindow):
                 self.fileMenu.addSeparator()
             else:
                 self.fileMenu.addAction(action)
+        # Edit menu
+        editMenuActions = [\
+                self.createMenuAction("&Undo", undo, QKeySequence.Undo, None,
+                    "Undo the last track edit"),
+                self.createMenuAction("&Redo", redo, QKeySequence.Redo, None,
+                    "Redo the last undone track edit")]
+        self.editMenu = self.menuBar().addMenu("&Edit")
+        for action in editMenuActions:
+            self.editMenu.addAction(action)
         # Analysis/Synthesis menu
         ASMenuActions = [\
                 self.createMenuAction("C&lear plots", clearPlots, "Ctrl+L",
@@ -78,8 +120,13 @@ class MainWindow(QMainWindow):
                     "Ctrl+R", None, "Apply analysis settings and refresh"),
                 self.createMenuAction("S&ynthesize", synthesize,
                     "Ctrl+Y", None, "Synthesize using current settings"),
+                self.createMenuAction("&Fit tracks to loaded sound",
+                    fitTracks, "Ctrl+T", None,
+                    "Fit tracks to the loaded sound by analysis-by-synthesis"),
                 self.createMenuAction("Play", play, "Ctrl+P", None,
-                    "Play current displayed waveform"),
+                    "Play current displayed waveform, or the selected part of it"),
+                self.createMenuAction("Stop", stop, "Escape", None,
+                    "Stop playback"),
                 self.createMenuAction("Apply defaults", applyDefaults,
                     "Ctrl+D", None, "Return all parameters to defaults")]
         self.ASMenu = self.menuBar().addMenu("A&nalysis/Synthesis")
@@ -88,7 +135,11 @@ class MainWindow(QMainWindow):
         # Help menu
         helpMenuActions = [\
                 self.createMenuAction("&About", helpAbout,
-                    tip="About TrackDraw")]
+                    tip="About TrackDraw"),
+                self.createMenuAction("Show &interaction statistics",
+                    showStats, "Ctrl+Shift+I", None,
+                    "Show counts of merged and dropped mouse events",
+                    checkable=True)]
         self.helpMenu = self.menuBar().addMenu("&Help")
         for action in helpMenuActions:
             self.helpMenu.addAction(action)
@@ -126,6 +177,7 @@ class MainWindow(QMainWindow):
         ##### Combo boxes #####
         self.analysisDock.windowComboBox.activated.connect(changeWindow)
         self.synthesisDock.methodComboBox.activated.connect(changeSynth)
+        self.synthesisDock.sineModeComboBox.activated.connect(changeSineMode)
         self.synthesisDock.nformantComboBox.activated.connect(changeNoTracks)
         #### End Combo Boxes Setup #####
 
@@ -158,15 +210,19 @@ class MainWindow(QMainWindow):
         ##### End buttons setup #####
 
         ##### Canvases #####
-        click_f0 = partial(slots.mouse, wasClick=True, plot=self.cw.f0_cv, target="F0")
-        drag_f0 = partial(slots.mouse, wasClick=False, plot=self.cw.f0_cv, target="F0")
-        self.cw.f0_cv.fig.canvas.mpl_connect('button_press_event', click_f0)
-        self.cw.f0_cv.fig.canvas.mpl_connect('motion_notify_event', drag_f0)
-
-        click_ff = partial(slots.mouse, wasClick=True, plot=self.cw.spec_cv, target="FF")
-        drag_ff = partial(slots.mouse, wasClick=False, plot=self.cw.spec_cv, target="FF")
-        self.cw.spec_cv.fig.canvas.mpl_connect('button_press_event', click_ff)
-        self.cw.spec_cv.fig.canvas.mpl_connect('motion_notify_event', drag_ff)
+        release = partial(self.scheduler.call, slots.mouseRelease)
+        click_f0 = partial(self.scheduler.call, slots.mouse, wasClick=True, plot=self.cw.f0_cv, target="F0")
+        drag_f0 = partial(self.scheduler.post, wasClick=False, plot=self.cw.f0_cv, target="F0")
+        self.cw.f0_cv.connectMouse(click_f0, drag_f0, release)
+
+        click_ff = partial(self.scheduler.call, slots.mouse, wasClick=True, plot=self.cw.spec_cv, target="FF")
+        drag_ff = partial(self.scheduler.post, wasClick=False, plot=self.cw.spec_cv, target="FF")
+        self.cw.spec_cv.connectMouse(click_ff, drag_ff, release)
+
+        # Scroll wheel zooms, shift+wheel pans both track canvases together
+        changeView = partial(self.scheduler.call, slots.changeView)
+        self.cw.spec_cv.connectView(changeView)
+        self.cw.f0_cv.connectView(changeView)
         ##### End canvases setup #####
 
     def createMenuAction(self, text, slot=None, shortcut=None, icon=None,
@@ -190,16 +246,34 @@ class MainWindow(QMainWindow):
 
 
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="TrackDraw")
+    parser.add_argument("--renderer", choices=["matplotlib", "qpainter"],
+                        default="matplotlib",
+                        help="how canvases are drawn, qpainter is faster on "
+                             "large screens and long sounds")
+    parser.add_argument("--startup-times", action="store_true",
+                        help="print how long startup and imports took, up to "
+                             "the first paint of the window")
+    # Anything not recognized is left for Qt
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[0:1] + qt_args)
     app.setApplicationName("TrackDraw")
-    mainWindow = MainWindow()
+    if STARTUP is not None:
+        STARTUP.mark("QApplication")
+    mainWindow = MainWindow(renderer=args.renderer)
+    if STARTUP is not None:
+        STARTUP.mark("main window")
+        STARTUP.watchFirstPaint(app)
     mainWindow.show()
     # Have to start canvasses here, otherwise they're the wrong size!!
-    mainWindow.cw.spec_cv.start(TDD.TRACKS)
-    mainWindow.cw.f0_cv.start(TDD.F0_TRACK)
+    mainWindow.cw.spec_cv.start(mainWindow.session.tracks)
+    mainWindow.cw.f0_cv.start(mainWindow.session.f0_track)
     mainWindow.cw.stft_cv.start()
+    if STARTUP is not None:
+        STARTUP.mark("show and start canvases")
     app.exec_()
 
 
-main()
+if __name__ == "__main__":
+    main()
 
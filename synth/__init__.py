@@ -6,5 +6,70 @@ Created on Thu Jul  7 12:48:00 2016
 @author: daniel
 """
 
+import copy
+import numpy as np
+
+import synth.glottal
 import synth.klatt
 import synth.sine
+
+
+def synthesize(snapshot, progress=None):
+    """
+    Synthesizes the tracks of a session snapshot.
+
+    Arguments:
+        snapshot (TrackDrawData.Snapshot) -- parameters and tracks to be
+            synthesized, F0 and FF are taken from its f0_track and tracks.
+        progress (function) -- passed on to synthesizers which report
+            progress.
+
+    Returns the synthesized waveform as an np.array.
+    """
+    return(synthesize_parms(synthesis_parms(snapshot), progress=progress))
+
+
+def synthesize_parms(parms, progress=None):
+    """
+    Synthesizes a Parameters object whose F0 and FF hold the tracks, as
+    made by synthesis_parms(), see synthesize().
+    """
+    if parms.synth_type == "Klatt 1980":
+        waveform = synth.klatt.klatt_make(parms, progress=progress)
+    elif parms.synth_type == "Sine wave":
+        waveform = synth.sine.sine_make(parms)
+    else:
+        raise ValueError("Unknown synth_type: " + parms.synth_type)
+    return(np.asarray(waveform))
+
+
+def synthesize_stream(snapshot, progress=None, block_size=10000):
+    """
+    Synthesizes the tracks of a session snapshot block by block.
+
+    Arguments:
+        snapshot (TrackDrawData.Snapshot) -- see synthesize().
+        progress (function) -- see synthesize().
+        block_size (int) -- approximate number of samples per block.
+
+    Returns a generator of np.arrays which together make up the waveform
+    synthesize() returns. Synthesizers which can't stream produce the whole
+    waveform first, which is then handed out in blocks.
+    """
+    parms = synthesis_parms(snapshot)
+    if parms.synth_type == "Klatt 1980":
+        return(synth.klatt.klatt_stream(parms, max(1, block_size//50),
+                                        progress=progress))
+    if parms.synth_type == "Sine wave":
+        return(synth.sine.sine_stream(parms, block_size))
+    waveform = synthesize(snapshot, progress=progress)
+    return(waveform[i:i + block_size]
+           for i in range(0, len(waveform), block_size))
+
+
+def synthesis_parms(snapshot):
+    """ Returns a copy of snapshot's parms with F0 and FF from its tracks. """
+    parms = copy.copy(snapshot.parms)
+    parms.F0 = snapshot.f0_track.points[0]
+    parms.FF = snapshot.tracks.matrix(parms.nformant)
+    return(parms)
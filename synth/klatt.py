@@ -26,14 +26,27 @@
     http://dx.doi.org/10.1121/1.383940
 """
 import math
+import threading
+import numpy as np
 from numpy.random import normal
 
-def klatt_make(parms):
+# Amplifiers with a lower gain output silence, and filters whose delay taps
+# are all below SILENT_STATE while their input is silent skip filtering
+SILENT_GAIN = 1e-6
+SILENT_STATE = 1e-12
+
+def db_to_gain(dB):
+    """ Converts a level in dB to a linear gain. """
+    return(math.sqrt(10)**(dB/10))
+
+def klatt_make(parms, progress=None):
     """
     Extracts necessary parameters from TrackDraw 2016 Parameters object.
     
     Arguments:
         parms (TrackDrawData.Parameters object) -- input parameters
+        progress (function) -- optional progress callback, see
+            Klatt_Synth.synth()
     
     klatt_make extracts necessary parameters from a Parameters object for
     syntheisizing a vowel waveform in the Klatt synthesizer, then calls
@@ -49,10 +62,33 @@ def klatt_make(parms):
     af = parms.AF
     fs = parms.synth_fs
     dur = parms.dur
-    y = klatt_bridge(f0, ff, bw, av, avs, ah, af, fs, dur)
+    y = klatt_bridge(f0, ff, bw, av, avs, ah, af, fs, dur, progress=progress,
+                     glottal_model=parms.glottal_model)
     return(y)
-    
-def klatt_bridge(f0, ff, bw, av, avs, ah, af, fs, dur, inv_samp=50):
+
+def klatt_stream(parms, block_invs=200, progress=None):
+    """
+    Synthesizes a Parameters object block by block, see Klatt_Synth.stream().
+
+    Arguments:
+        parms (TrackDrawData.Parameters object) -- input parameters
+        block_invs (int) -- number of intervals synthesized per block.
+        progress (function) -- optional progress callback, see
+            Klatt_Synth.synth()
+
+    Returns a generator of np.arrays which together make up the same
+    waveform klatt_make() returns, so that long sounds can be written out
+    while they are synthesized instead of being held in memory whole.
+    """
+    synth = POOL.acquire(parms.synth_fs, parms.FF.shape[1], 50)
+    synth = klatt_setup(parms.F0, parms.FF, parms.BW, parms.AV, parms.AVS,
+                        parms.AH, parms.AF, parms.synth_fs, parms.dur,
+                        glottal_model=parms.glottal_model, synth=synth)
+    return(POOL.release_after(synth, synth.stream(block_invs=block_invs,
+                                                  progress=progress)))
+
+def klatt_bridge(f0, ff, bw, av, avs, ah, af, fs, dur, inv_samp=50,
+                 progress=None, glottal_model="impulse"):
     """
     Processes/interpolates input parameters for Klatt synth, runs synth.
     
@@ -68,15 +104,37 @@ def klatt_bridge(f0, ff, bw, av, avs, ah, af, fs, dur, inv_samp=50):
         dur (float) -- duration in seconds
         inv_samp (sample) -- number of samples to be synthesized in a single
             interval. 
+        progress (function) -- optional progress callback, see
+            Klatt_Synth.synth()
+        glottal_model (str) -- voicing source model, see Klatt_Synth.
         
     Takes a variety of synthesis parameters passed to it from klatt_make and 
     interpolates them or derives other values from them as necessary for Klatt
     synthesis. Then passes them to a Klatt_Synth object and runs the synthesis
     routine, returning the resultant waveform back to klatt_make. 
+
+    The Klatt_Synth object is taken from POOL, and handed back to it
+    afterwards.
+    """
+    synth = POOL.acquire(fs, ff.shape[1], inv_samp)
+    synth = klatt_setup(f0, ff, bw, av, avs, ah, af, fs, dur, inv_samp,
+                        glottal_model, synth=synth)
+    try:
+        synth.synth(progress=progress)
+        return(synth.output)
+    finally:
+        POOL.release(synth)
+
+def klatt_setup(f0, ff, bw, av, avs, ah, af, fs, dur, inv_samp=50,
+                glottal_model="impulse", synth=None):
+    """
+    Processes/interpolates input parameters for Klatt synth.
+
+    Takes the same arguments as klatt_bridge() and returns a Klatt_Synth
+    object ready to be run with its synth() or stream() method. If synth,
+    a Klatt_Synth with the same fs, n_form and inv_samp, is given, it is
+    updated and returned instead of a new one.
     """
-    from scipy.interpolate import interp1d
-    import numpy as np
-    
     # First, determine necessary number of update intervals
     n_inv = round(dur*fs/inv_samp)
     # Next, determine the number of formants
@@ -91,7 +149,7 @@ def klatt_bridge(f0, ff, bw, av, avs, ah, af, fs, dur, inv_samp=50):
             n_input_steps = len(input_vector)
             seq = np.arange(0, n_input_steps)
             seq_new = np.linspace(0, n_input_steps-1, n_inv)
-            return(list(interp1d(seq, input_vector)(seq_new)))
+            return(list(np.interp(seq_new, seq, input_vector)))
         except TypeError:
             return([input_vector] * n_inv) # Returns constant function in len = 1
     interp_f0 = []
@@ -104,12 +162,70 @@ def klatt_bridge(f0, ff, bw, av, avs, ah, af, fs, dur, inv_samp=50):
                 interp_bw.append(interpolate(bw[:,i], n_inv))
             except IndexError:
                 interp_bw.append(interpolate(bw[i], n_inv))
-    # Finally, create synth object, run it, and return its output waveform    
+    # Finally, create or update synth object
+    if synth is not None:
+        synth.update(f0=interp_f0, ff=interp_ff, bw=interp_bw, n_inv=n_inv,
+                     av=av, avs=avs, ah=ah, af=af, glottal_model=glottal_model)
+        return(synth)
     synth = Klatt_Synth(f0=interp_f0, ff=interp_ff, bw=interp_bw, av=av, avs=avs,
                         fs=fs, n_inv=n_inv, n_form=n_form, inv_samp=inv_samp,
-                        ah=ah, af=af)
-    synth.synth()
-    return(synth.output)
+                        ah=ah, af=af, glottal_model=glottal_model)
+    return(synth)
+
+
+class Synth_Pool:
+    """
+    Idle Klatt_Synth objects kept for reuse.
+
+    Arguments:
+        per_key (int) -- largest number of idle objects kept for each
+            (fs, n_form, inv_samp).
+
+    Building a Klatt_Synth creates all of its sections and components, which
+    for short sounds costs about as much as synthesizing them. A synth taken
+    with acquire() and handed back with release() keeps all of that, and
+    only gets new controls with Klatt_Synth.update() on its next use.
+    Thread-safe, so synthesis jobs running at the same time each get their
+    own object.
+    """
+    def __init__(self, per_key=2):
+        self.per_key = per_key
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, fs, n_form, inv_samp):
+        """
+        Returns an idle Klatt_Synth for these settings, or None if there is
+        none, in which case a new one has to be built.
+        """
+        with self.lock:
+            idle = self.idle.get((fs, n_form, inv_samp))
+            if idle:
+                return(idle.pop())
+        return(None)
+
+    def release(self, synth):
+        """ Hands back a Klatt_Synth which is no longer used. """
+        synth.output = []
+        synth.glottal_source = None
+        synth.glottal_renderer = None
+        with self.lock:
+            idle = self.idle.setdefault(synth.key, [])
+            if len(idle) < self.per_key and synth not in idle:
+                idle.append(synth)
+
+    def release_after(self, synth, blocks):
+        """ Passes on a generator of blocks, then releases synth. """
+        try:
+            yield from blocks
+        finally:
+            self.release(synth)
+
+    def clear(self):
+        with self.lock:
+            self.idle.clear()
+
+POOL = Synth_Pool()
     
     
 class Klatt_Synth:
@@ -132,9 +248,20 @@ class Klatt_Synth:
         bgp (float) -- bandwidth of glottal pole resonator, Hz
         fgz (float) -- center frequency of glottal zero resonator, Hz
         bgz (float) -- bandwidth of glottal zero resonator, Hz
+        glottal_model (str) -- voicing source model, one of
+            synth.glottal.MODELS. With "impulse" the voicing source is made
+            sample by sample in each interval, with the other models it is
+            rendered from wavetables for the whole sound before the first
+            interval, see synth/glottal.py. "klatt" gives the same source
+            as "impulse" while fgp, bgp, fgz, bgz and bgs are constant.
+        glottal_shape (tuple) -- shape parameters of glottal_model, or None
+            for its defaults. The "klatt" model always uses fgp, bgp, fgz,
+            bgz and bgs.
     
     To generate a waveform from a Klatt_Synth object using the parameters
-    provided to it, call its synth() method.
+    provided to it, call its synth() method. Its update() method replaces
+    the parameters other than fs, n_form and inv_samp, so that one object
+    can be run many times, see Synth_Pool.
     
     Klatt_Synth synthesizes the waveform inv_samp samples at a time, so its
     synth() method loops n_inv times and writes the final result of all the
@@ -170,10 +297,45 @@ class Klatt_Synth:
         multiple inputs that go to different components in a clear way, need
         something that can accomodate multiple outputs at the section level
     """
-    def __init__(self, f0, ff, bw, fs, n_inv, n_form, inv_samp,
-                 av=0, af=0, ah=0, avs=0, fgp=0, bgp=100, fgz=1500, bgz=6000,
-                 bgs=200, fnp=270, fnz=270, bnp=100, bnz=100, sw=0, a1=0,
-                 a2=0, a3=0, a4=0, a5=0, a6=0, an=0):
+    def __init__(self, f0, ff, bw, fs, n_inv, n_form, inv_samp, **controls):
+        # Initialize non-time-varying synthesis parameters 
+        self.inv_samp = inv_samp
+        self.n_form = n_form
+        self.fs = fs
+        self.dt = 1/self.fs
+        
+        # Output vector, allocated by synth() or stream(). Output writes
+        # interval current_ind of the sound to output[current_ind - offset]
+        self.output = []
+        self.output_offset = 0
+
+        # Initialize sections, every component adds itself to components
+        self.components = []
+        self.voice = Klatt_Voice(self)
+        self.noise = Klatt_Noise(self)
+        self.cascade = Klatt_Cascade(self, [self.voice, self.noise])
+        self.parallel = Klatt_Parallel(self, [self.voice, self.noise])
+        self.radiation = Klatt_Radiation(self, [self.cascade, self.parallel])
+        self.output_module = Klatt_Output(self, [self.radiation])
+
+        self.update(f0, ff, bw, n_inv, **controls)
+
+    @property
+    def key(self):
+        """ (fs, n_form, inv_samp), which can't be changed by update(). """
+        return((self.fs, self.n_form, self.inv_samp))
+
+    def update(self, f0, ff, bw, n_inv, av=0, af=0, ah=0, avs=0, fgp=0,
+               bgp=100, fgz=1500, bgz=6000, bgs=200, fnp=270, fnz=270,
+               bnp=100, bnz=100, sw=0, a1=0, a2=0, a3=0, a4=0, a5=0, a6=0,
+               an=0, glottal_model="impulse", glottal_shape=None):
+        """
+        Replaces all controls, see the class doc string for the arguments.
+
+        Sections, components and their buffers are kept, as are resonator
+        coefficients wherever the controls turn out the same, so that a
+        synth can be run again with new tracks at almost no setup cost.
+        """
         # Initialize time-varying synthesis parameters
         self.f0 = f0
         self.ff = ff
@@ -199,52 +361,123 @@ class Klatt_Synth:
         self.a5 = [a5]*n_inv
         self.a6 = [a6]*n_inv
         self.an = [an]*n_inv
-        
-        # Initialize non-time-varying synthesis parameters 
-        self.inv_samp = inv_samp
         self.n_inv = n_inv
-        self.n_form = n_form
-        self.fs = fs
-        self.dt = 1/self.fs
-        
-        # Initialize trackers
-        self.last_glot_pulse = 0
-        self.current_inv = 0 # Index in terms of intervals
-        self.next_inv = 1
-        self.current_ind = self.current_inv*self.inv_samp # Index in terms of samples
-        self.next_ind = self.next_inv*self.inv_samp
-        
-        # Initialize output vector
-        self.output = [0] * self.n_inv*self.inv_samp
 
-        # Initialize sections
-        self.voice = Klatt_Voice(self)
-        self.noise = Klatt_Noise(self)
-        self.cascade = Klatt_Cascade(self, [self.voice, self.noise])
-        self.parallel = Klatt_Parallel(self, [self.voice, self.noise])
-        self.radiation = Klatt_Radiation(self, [self.cascade, self.parallel])
-        self.output_module = Klatt_Output(self, [self.radiation])
+        self.glottal_model = glottal_model
+        self.glottal_shape = glottal_shape
+        if glottal_model == "klatt":
+            self.glottal_shape = (fgp, bgp, fgz, bgz, bgs)
+        # (voicing, qs) of the current block rendered by synth.glottal,
+        # starting at sample source_offset, see render_source()
+        self.glottal_source = None
+        self.source_offset = 0
+        self.glottal_renderer = None
+        self.voice.connect()
+        self.reset_state()
+
+    def reset_state(self):
+        """
+        Puts every filter back at rest and rewinds to the first interval.
+        """
+        for component in self.components:
+            component.reset_state()
+        self.last_glot_pulse = 0
+        self.glottal_renderer = None
+        self.reset()
         
-    def synth(self):
+    def synth(self, progress=None):
         """
         Runs each section of the synthesizer in the correct order.
+
+        Arguments:
+            progress (function) -- if provided, called every 50 intervals as
+                progress(fraction) with the fraction of intervals synthesized
+                so far. If it returns False, synthesis stops early and the
+                rest of the output is left silent.
         """
-        import time
-        start = time.time()
+        self.reset_state()
+        self.render_source(self.n_inv)
+        self.output = [0] * self.n_inv*self.inv_samp
+        self.output_offset = 0
         for i in range(self.n_inv):
-            self.voice.run()
-            self.noise.run()
-            if self.sw[self.current_inv] == 0:
-                self.cascade.run()
-            elif self.sw[self.current_inv] == 1:
-                self.parallel.run()
-            self.radiation.run()
-            self.output_module.run()
-            self.update_inv() 
+            if progress is not None and i % 50 == 0:
+                if progress(i/self.n_inv) is False:
+                    break
+            self.run_inv()
         self.reset()
-        end = time.time()
-        print("Elapsed: ", end-start)
+
+    def stream(self, block_invs=200, progress=None):
+        """
+        Runs the synthesizer, yielding the output block by block.
+
+        Arguments:
+            block_invs (int) -- number of intervals synthesized per block.
+            progress (function) -- see synth(), called once per block.
+
+        A generator of np.arrays of block_invs*inv_samp samples, the last one
+        possibly shorter. Only one block of output is held at a time, instead
+        of the whole waveform as with synth().
+        """
+        import numpy as np
+        self.reset_state()
+        try:
+            for first in range(0, self.n_inv, block_invs):
+                if progress is not None:
+                    if progress(first/self.n_inv) is False:
+                        return
+                n_block = min(block_invs, self.n_inv - first)
+                self.render_source(n_block)
+                self.output = [0] * n_block*self.inv_samp
+                self.output_offset = self.current_ind
+                for i in range(n_block):
+                    self.run_inv()
+                yield(np.array(self.output))
+        finally:
+            self.output = []
+            self.output_offset = 0
+            self.glottal_source = None
+            self.reset()
+
+    def render_source(self, n_invs):
+        """
+        Renders the voicing source of the next n_invs intervals, from the
+        current one on, unless glottal_model is "impulse". Pulses running
+        past the end of one block are carried over into the next one.
+        """
+        if self.glottal_model == "impulse":
+            return
+        if self.glottal_renderer is None:
+            import synth.glottal as glottal
+            self.glottal_renderer = glottal.Source_Renderer(
+                self.f0, self.fs, self.inv_samp, model=self.glottal_model,
+                shape=self.glottal_shape)
+        self.glottal_source = self.glottal_renderer.render(n_invs)
+        self.source_offset = self.current_ind
+
+    def run_inv(self):
+        """ Synthesizes the current interval and moves on to the next. """
+        self.voice.run()
+        self.noise.run()
+        if self.sw[self.current_inv] == 0:
+            self.cascade.run()
+        elif self.sw[self.current_inv] == 1:
+            self.parallel.run()
+        self.radiation.run()
+        self.output_module.run()
+        self.update_inv()
                 
+    def noise_silent(self):
+        """
+        Returns True if every amplifier fed by the noise source in the
+        current interval is silent, see SILENT_GAIN.
+        """
+        inv = self.current_inv
+        if self.sw[inv] == 0:
+            levels = (self.ah[inv],)
+        else:
+            levels = (self.af[inv], self.a5[inv])
+        return(all(db_to_gain(dB) < SILENT_GAIN for dB in levels))
+
     def update_inv(self):
         """
         Updates current and next interval trackers
@@ -283,6 +516,11 @@ class Klatt_Section:
 class Klatt_Voice(Klatt_Section):
     """
     Generates a voicing waveform. 
+
+    With a glottal_model other than "impulse", the impulse generator and
+    glottal resonators are replaced by two Wavetable components reading the
+    voicing sources rendered by Klatt_Synth.render_source(). Both are built,
+    and connect() hooks the amplifiers up to the one in use.
     """
     def __init__(self, master):
         Klatt_Section.__init__(self, master)
@@ -290,11 +528,25 @@ class Klatt_Voice(Klatt_Section):
         self.rgp = Resonator(master=self.master, input_connect=[self.impulse])
         self.rgz = Resonator(master=self.master, input_connect=[self.rgp], anti=True)
         self.rgs = Resonator(master=self.master, input_connect=[self.rgp])
+        self.voicing = Wavetable(master=self.master, source=0)
+        self.qs = Wavetable(master=self.master, source=1)
         self.av = Amplifier(master=self.master, input_connect=[self.rgz])
         self.avs = Amplifier(master=self.master, input_connect=[self.rgs])
         self.mixer = Mixer(master=self.master, input_connect=[self.av, self.avs])
+
+    def connect(self):
+        """ Connects av and avs to the source of the master's glottal_model. """
+        if self.master.glottal_model == "impulse":
+            self.av.input_connect = [self.rgz]
+            self.avs.input_connect = [self.rgs]
+        else:
+            self.av.input_connect = [self.voicing]
+            self.avs.input_connect = [self.qs]
         
     def run(self):
+        if self.master.glottal_model != "impulse":
+            self.run_wavetable()
+            return
         self.impulse.impulse_gen()
         self.rgp.resonate(ff=self.master.fgp[self.master.current_inv],
                           bw=self.master.bgp[self.master.current_inv])
@@ -306,6 +558,14 @@ class Klatt_Voice(Klatt_Section):
         self.avs.amplify(dB=self.master.avs[self.master.current_inv])
         self.mixer.mix()
         self.output[:] = self.mixer.output[:]
+
+    def run_wavetable(self):
+        self.voicing.read()
+        self.av.amplify(dB=self.master.av[self.master.current_inv])
+        self.qs.read()
+        self.avs.amplify(dB=self.master.avs[self.master.current_inv])
+        self.mixer.mix()
+        self.output[:] = self.mixer.output[:]
         
 
 class Klatt_Noise(Klatt_Section):
@@ -317,6 +577,10 @@ class Klatt_Noise(Klatt_Section):
             noise generator output. Right now, noise generator output is too
             loud compared to the voicing generator, so a 100 dB offset is
             applied.
+
+    Intervals in which nothing listens to the noise, see
+    Klatt_Synth.noise_silent(), are skipped and output silence. The lowpass
+    filter keeps its state and picks up from it once noise is needed again.
     """
     def __init__(self, master):
         Klatt_Section.__init__(self, master)
@@ -326,6 +590,9 @@ class Klatt_Noise(Klatt_Section):
         self.temp_amp = Amplifier(master=self.master, input_connect=[self.lp])
         
     def run(self):
+        if self.master.noise_silent():
+            self.output[:] = [0]*self.master.inv_samp
+            return
         self.noise.noise_gen()
         self.lp.filt()
         self.temp_amp.amplify(dB=self.offset)
@@ -342,33 +609,32 @@ class Klatt_Cascade(Klatt_Section):
         excited the cascade. The first source is voicing, the second noise.
         The first source should be sent directly to the mixer, the second goes
         through ah first and then to the mixer.
+
+    The nasal pole rnp, nasal zero rnz and the n_form formant resonators are
+    run as one Resonator_Cascade, so the cost of an interval hardly depends
+    on the number of formants, which may be any number.
     """
     def __init__(self, master, input_connect=None):
         Klatt_Section.__init__(self, master)
         self.ah = Amplifier(master=self.master, input_connect=[input_connect[1]])
         self.mixer = Mixer(master=self.master, input_connect=[input_connect[0],
                                                               self.ah])
-        self.rnp = Resonator(master=self.master, input_connect=[self.mixer])
-        self.rnz = Resonator(master=self.master, input_connect=[self.rnp],
-                             anti=True)
-        self.formants = []
-        self.formants.append(Resonator(master=self.master, input_connect=[self.rnz]))
-        previous_formant = self.formants[0]
-        for form in range(1, self.master.n_form):
-            self.formants.append(Resonator(master=self.master, input_connect=[previous_formant]))
-            previous_formant = self.formants[form]
+        self.resonators = Resonator_Cascade(master=self.master,
+                                            input_connect=[self.mixer],
+                                            anti=[False, True]
+                                                 + [False]*self.master.n_form)
 
     def run(self):
-        self.ah.amplify(self.master.ah[self.master.current_inv])
+        inv = self.master.current_inv
+        master = self.master
+        self.ah.amplify(master.ah[inv])
         self.mixer.mix()
-        self.rnp.resonate(self.master.fnp[self.master.current_inv],
-                          self.master.bnp[self.master.current_inv])
-        self.rnz.resonate(self.master.fnz[self.master.current_inv],
-                          self.master.bnz[self.master.current_inv])
-        for form in range(self.master.n_form):
-            self.formants[form].resonate(self.master.ff[form][self.master.current_inv],
-                                         self.master.bw[form][self.master.current_inv])
-        self.output[:] = self.formants[-1].output[:]
+        self.resonators.resonate(
+                ff=[master.fnp[inv], master.fnz[inv]]
+                   + [master.ff[form][inv] for form in range(master.n_form)],
+                bw=[master.bnp[inv], master.bnz[inv]]
+                   + [master.bw[form][inv] for form in range(master.n_form)])
+        self.output[:] = self.resonators.output
 
 
 class Klatt_Parallel(Klatt_Section):
@@ -381,62 +647,52 @@ class Klatt_Parallel(Klatt_Section):
             sources (voicing and noise), and they are handed to different
             components. The voicing source is the 0-th source, and goes to
             a1 and first_diff, while the noise source is the 1-th source and
-            goes to the mixer and the fifth/sixth formant.
+            goes to the mixer and the fifth formant.
+
+    The resonators rnp and r1-r5 are independent, so they are run together
+    as one Resonator_Bank. Each row of the bank is fed its source scaled by
+    its amplifier gain (an, a1-a5), and the bank's rows are summed to give
+    the output.
             
     TODO -- figure out how to balance everything properly
+    TODO -- 6th formant not part of the bank, not sure what values to give
+        to it... need to keep reading Klatt 1980.
     """
     def __init__(self, master, input_connect=None):
         Klatt_Section.__init__(self, master)
+        self.sources = input_connect
         self.af = Amplifier(master=self.master, input_connect=[input_connect[1]])
-        self.a1 = Amplifier(master=self.master, input_connect=[input_connect[0]])
-        self.r1 = Resonator(master=self.master, input_connect=[self.a1])
         self.first_diff = First_Diff(master=self.master,
                                      input_connect=[input_connect[0]])
         self.mixer = Mixer(master=self.master,
                            input_connect=[self.first_diff, self.af])
-        self.an = Amplifier(master=self.master, input_connect=[self.mixer])
-        self.rnp = Resonator(master=self.master, input_connect=[self.an])
-        self.a2 = Amplifier(master=self.master, input_connect=[self.mixer])
-        self.r2 = Resonator(master=self.master, input_connect=[self.a2])
-        self.a3 = Amplifier(master=self.master, input_connect=[self.mixer])
-        self.r3 = Resonator(master=self.master, input_connect=[self.a3])
-        self.a4 = Amplifier(master=self.master, input_connect=[self.mixer])
-        self.r4 = Resonator(master=self.master, input_connect=[self.a4])
-        self.a5 = Amplifier(master=self.master, input_connect=[input_connect[1]])
-        self.r5 = Resonator(master=self.master, input_connect=[self.a5])
-        # 6th formant currently not part of run routine! Not sure what values
-        # to give to it... need to keep reading Klatt 1980. 
-        self.a6 = Amplifier(master=self.master, input_connect=[input_connect[1]])
-        self.r6 = Resonator(master=self.master, input_connect=[self.a6])
-        self.output_mixer = Mixer(master=self.master,
-                                  input_connect=[self.r1, self.rnp, self.r2,
-                                                 self.r3, self.r4, self.r5,
-                                                 self.r6])
+        self.bank = Resonator_Bank(master=self.master, n=6)
+        self.levels = None
+        self.gains = None
         
     def run(self):
-        self.af.amplify(dB=self.master.af[self.master.current_inv])
-        self.a1.amplify(dB=self.master.a1[self.master.current_inv])
-        self.r1.resonate(ff=self.master.ff[0][self.master.current_inv],
-                         bw=self.master.bw[0][self.master.current_inv])
+        inv = self.master.current_inv
+        master = self.master
+        self.af.amplify(dB=master.af[inv])
         self.first_diff.differentiate()
         self.mixer.mix()
-        self.an.amplify(dB=self.master.an[self.master.current_inv])
-        self.rnp.resonate(ff=self.master.fnp[self.master.current_inv],
-                          bw=self.master.bnp[self.master.current_inv])
-        self.a2.amplify(dB=self.master.a2[self.master.current_inv])
-        self.r2.resonate(ff=self.master.ff[1][self.master.current_inv],
-                         bw=self.master.bw[1][self.master.current_inv])
-        self.a3.amplify(dB=self.master.a3[self.master.current_inv])
-        self.r3.resonate(ff=self.master.ff[2][self.master.current_inv],
-                         bw=self.master.bw[2][self.master.current_inv])
-        self.a4.amplify(dB=self.master.a4[self.master.current_inv])
-        self.r4.resonate(ff=self.master.ff[3][self.master.current_inv],
-                         bw=self.master.bw[3][self.master.current_inv])
-        self.a5.amplify(dB=self.master.a5[self.master.current_inv])
-        self.r5.resonate(ff=self.master.ff[4][self.master.current_inv],
-                         bw=self.master.bw[4][self.master.current_inv])
-        self.output_mixer.mix()
-        self.output[:] = self.output_mixer.output[:]
+        levels = (master.an[inv], master.a1[inv], master.a2[inv],
+                  master.a3[inv], master.a4[inv], master.a5[inv])
+        if levels != self.levels:
+            self.gains = np.array([db_to_gain(dB) if db_to_gain(dB)
+                                   >= SILENT_GAIN else 0 for dB in levels])
+            self.levels = levels
+        mixed = self.mixer.output
+        inputs = np.array([mixed, self.sources[0].output, mixed, mixed, mixed,
+                           self.sources[1].output])
+        self.bank.resonate(inputs*self.gains[:, np.newaxis],
+                           ff=(master.fnp[inv], master.ff[0][inv],
+                               master.ff[1][inv], master.ff[2][inv],
+                               master.ff[3][inv], master.ff[4][inv]),
+                           bw=(master.bnp[inv], master.bw[0][inv],
+                               master.bw[1][inv], master.bw[2][inv],
+                               master.bw[3][inv], master.bw[4][inv]))
+        self.output[:] = self.bank.output.sum(axis=0).tolist()
         
 
 class Klatt_Radiation(Klatt_Section):
@@ -490,12 +746,21 @@ class Klatt_Component:
         input (list, len inv_samp) -- input buffer
         output (list, len inv_samp) -- output buffer, accessed by following
             component's pull() (or similar) method using input_connect system
+
+    Components add themselves to master.components, so that
+    Klatt_Synth.reset_state() can call reset_state() on all of them.
+    Components which keep state from one interval to the next override it.
     """
     def __init__(self, master, input_connect=None):
         self.master = master
         self.input = [0]*self.master.inv_samp
         self.output = [0]*self.master.inv_samp
         self.input_connect = input_connect
+        self.master.components.append(self)
+
+    def reset_state(self):
+        """ Forgets everything carried over from the last interval. """
+        pass
         
     def pull(self):
         """ Perpetuates signal from previous component to this component """
@@ -520,6 +785,14 @@ class Resonator(Klatt_Component):
             samples of any given interval needs the final two samples from the
             previous interval's output (if resonating) or input (if anti-
             resonating).
+        controls (tuple) -- (ff, bw) the current coefficients were calculated
+            for. Coefficients are only recalculated when these change, so
+            stretches where the frequency and bandwidth are flat cost only the
+            filtering.
+        coef (tuple) -- current (a, b, c) coefficients.
+
+    While the input is silent and the delay taps have decayed below
+    SILENT_STATE, intervals are not filtered, their output is silence.
         
     TODO -- replace main filter loop with Cython code? Or find some way to
         optimize.
@@ -528,6 +801,11 @@ class Resonator(Klatt_Component):
         Klatt_Component.__init__(self, master, input_connect)
         self.anti = anti
         self.delay = [0]*2
+        self.controls = None
+        self.coef = None
+
+    def reset_state(self):
+        self.delay = [0]*2
 
     def calc_coef(self, ff, bw, anti=False):
         """
@@ -552,7 +830,14 @@ class Resonator(Klatt_Component):
     
     def resonate(self, ff, bw):
         self.pull()
-        a, b, c = self.calc_coef(ff, bw, anti=self.anti)
+        if not any(self.input) and abs(self.delay[0]) < SILENT_STATE\
+                and abs(self.delay[1]) < SILENT_STATE:
+            self.delay = [0]*2
+            return
+        if (ff, bw) != self.controls:
+            self.coef = self.calc_coef(ff, bw, anti=self.anti)
+            self.controls = (ff, bw)
+        a, b, c = self.coef
         if self.anti == True:
             self.output[0] = a*self.input[0] + b*self.delay[1]\
                                 + c*self.delay[0]
@@ -573,6 +858,219 @@ class Resonator(Klatt_Component):
             self.delay = self.output[len(self.output)-2:len(self.output)]
 
 
+class Resonator_Bank(Klatt_Component):
+    """
+    A bank of independent Klatt resonators run together.
+
+    Arguments:
+        n (int) -- number of resonators.
+
+    Attributes:
+        delay (np.array, (n, 2)) -- final two output values of each
+            resonator in the last interval, latest last, see Resonator.
+        controls (list) -- (ff, bw) each row's matrices were calculated for.
+        H (np.array, (n, inv_samp, inv_samp)) -- each resonator's response
+            to an interval of input, starting at rest.
+        G (np.array, (n, inv_samp, 2)) -- each resonator's response to its
+            delay taps, with no input.
+        output (np.array, (n, inv_samp)) -- output of each resonator.
+
+    Within an interval a resonator is linear and time-invariant, so its
+    output is H times its input plus G times its delay taps. H and G follow
+    in closed form from the resonator's poles r*exp(+-j*theta): with
+    u[k] = r**k*sin((k + 1)*theta)/sin(theta), H holds a*u[i - j] and G
+    holds u[i + 1] and c*u[i]. This replaces a Python loop over samples for
+    every resonator with one batched matrix product per interval. Rows
+    whose controls change are recalculated together, rows whose controls
+    don't are reused.
+    """
+    def __init__(self, master, n):
+        Klatt_Component.__init__(self, master)
+        size = self.master.inv_samp
+        self.n = n
+        self.delay = np.zeros((n, 2))
+        self.controls = [None]*n
+        self.H = np.zeros((n, size, size))
+        self.G = np.zeros((n, size, 2))
+        self.output = np.zeros((n, size))
+        lag = np.arange(size)[:, np.newaxis] - np.arange(size)
+        self.lag = np.where(lag >= 0, lag, size + 1)
+
+    def reset_state(self):
+        self.delay = np.zeros((self.n, 2))
+
+    def calc_matrices(self, rows, ff, bw):
+        """ Recalculates H and G of rows for arrays ff and bw in Hz. """
+        size = self.master.inv_samp
+        k = np.arange(size + 1)
+        theta = 2*math.pi*ff*self.master.dt
+        r = np.exp(-math.pi*bw*self.master.dt)
+        b = 2*r*np.cos(theta)
+        c = -r**2
+        a = 1 - b - c
+        sin = np.sin(theta)[:, np.newaxis]
+        # Poles on the real axis, u[k] tends to (k + 1)*r**k
+        flat = np.abs(sin) < 1e-9
+        u = r[:, np.newaxis]**k*np.where(flat, k + 1,
+                np.sin((k + 1)*theta[:, np.newaxis])/np.where(flat, 1, sin))
+        # Column size + 1 of padded is zero, for samples before the input
+        padded = np.hstack((u, np.zeros((len(rows), 1))))
+        self.H[rows] = a[:, np.newaxis, np.newaxis]\
+                       *padded[:, self.lag]
+        self.G[rows, :, 1] = u[:, 1:]
+        self.G[rows, :, 0] = c[:, np.newaxis]*u[:, :-1]
+
+    def resonate(self, inputs, ff, bw):
+        """
+        Filters one interval.
+
+        Arguments:
+            inputs (np.array, (n, inv_samp)) -- input of each resonator.
+            ff, bw (sequences, len n) -- center frequency and bandwidth of
+                each resonator in Hz.
+        """
+        controls = list(zip(ff, bw))
+        changed = [i for i in range(self.n)
+                   if controls[i] != self.controls[i]]
+        if changed:
+            self.calc_matrices(changed, np.array([ff[i] for i in changed]),
+                               np.array([bw[i] for i in changed]))
+            for i in changed:
+                self.controls[i] = controls[i]
+        self.output = np.matmul(self.H, inputs[:, :, np.newaxis])[:, :, 0]\
+                      + np.matmul(self.G, self.delay[:, :, np.newaxis])[:, :, 0]
+        self.delay = self.output[:, -2:].copy()
+
+
+class Resonator_Cascade(Klatt_Component):
+    """
+    A chain of Klatt resonators and antiresonators run as one filter.
+
+    Arguments:
+        anti (list of booleans) -- one per section, in the order the signal
+            passes through them, True for antiresonators.
+
+    Attributes:
+        sos (np.array, (n, 6)) -- the sections as second-order sections for
+            scipy.signal.sosfilt().
+        state (np.array, (n, 2)) -- state of the sections, as used by
+            sosfilt().
+        controls (tuple) -- (ff, bw) sos was calculated for.
+        matrices (tuple) -- (T, S, A, B) state-space form of the chain for
+            one interval, see resonate(), or None.
+
+    An interval is filtered by a single sosfilt() call, whatever the number
+    of sections. Once the controls have stayed the same for an interval, the
+    chain is also linear and time-invariant across intervals, and its effect
+    on one interval is captured in four matrices: output = T @ input +
+    S @ state, and next state = A @ input + B @ state. Those are computed
+    with one sosfilt() call on a batch of unit inputs and states, after
+    which every flat interval costs a few small matrix products.
+
+    When the controls change, each section's state is converted to the new
+    coefficients through the two samples a Resonator keeps as its delay
+    taps, so the output stays the same as that of a chain of Resonators.
+    While the input is silent and the state is below SILENT_STATE,
+    intervals are not filtered, their output is silence.
+    """
+    def __init__(self, master, input_connect=None, anti=()):
+        Klatt_Component.__init__(self, master, input_connect)
+        self.anti = np.array(anti, dtype=bool)
+        self.sos = np.zeros((len(anti), 6))
+        self.sos[:, 3] = 1
+        self.state = np.zeros((len(anti), 2))
+        self.controls = None
+        self.matrices = None
+
+    def reset_state(self):
+        self.state = np.zeros(self.state.shape)
+
+    def calc_coef(self, ff, bw):
+        """
+        Fills sos with the coefficients of Resonator.calc_coef() for arrays
+        ff and bw in Hz.
+        """
+        c = -np.exp(-2*math.pi*bw*self.master.dt)
+        b = 2*np.exp(-math.pi*bw*self.master.dt)\
+            *np.cos(2*math.pi*ff*self.master.dt)
+        a = 1 - b - c
+        anti = self.anti
+        # Resonators, y[n] = a*x[n] + b*y[n-1] + c*y[n-2]
+        self.sos[~anti, 0] = a[~anti]
+        self.sos[~anti, 1:3] = 0
+        self.sos[~anti, 4] = -b[~anti]
+        self.sos[~anti, 5] = -c[~anti]
+        # Antiresonators, y[n] = (x[n] - b*x[n-1] - c*x[n-2])/a
+        self.sos[anti, 0] = 1/a[anti]
+        self.sos[anti, 1] = -b[anti]/a[anti]
+        self.sos[anti, 2] = -c[anti]/a[anti]
+        self.sos[anti, 4:6] = 0
+
+    def taps(self):
+        """
+        Returns the weights (p, q) of the two samples each section keeps:
+        the feedback coefficients of a resonator, which keeps its last two
+        outputs, or the feedforward coefficients of an antiresonator, which
+        keeps its last two inputs. A section's state is
+        (p*h1 + q*h2, q*h1), h1 being the latest sample.
+        """
+        p = np.where(self.anti, self.sos[:, 1], -self.sos[:, 4])
+        q = np.where(self.anti, self.sos[:, 2], -self.sos[:, 5])
+        return(p, q)
+
+    def calc_matrices(self):
+        """ Returns (T, S, A, B) for the current coefficients. """
+        from scipy.signal import sosfilt
+        size = self.master.inv_samp
+        n = 2*len(self.sos)
+        inputs = np.zeros((size + n, size))
+        inputs[np.arange(size), np.arange(size)] = 1
+        states = np.zeros((len(self.sos), size + n, 2))
+        states.reshape(-1, 2)[np.arange(n)//2*(size + n) + size
+                              + np.arange(n), np.arange(n) % 2] = 1
+        out, final = sosfilt(self.sos, inputs, zi=states)
+        final = final.transpose(0, 2, 1)
+        return(out[:size].T, out[size:].T,
+               final[:, :, :size].reshape(n, size),
+               final[:, :, size:].reshape(n, n))
+
+    def resonate(self, ff, bw):
+        """
+        Filters one interval.
+
+        Arguments:
+            ff, bw (lists) -- center frequency and bandwidth of each section
+                in Hz.
+        """
+        from scipy.signal import sosfilt
+        self.pull()
+        if not any(self.input) and np.all(np.abs(self.state) < SILENT_STATE):
+            self.state[:] = 0
+            return
+        controls = (tuple(ff), tuple(bw))
+        if controls != self.controls:
+            p, q = self.taps()
+            h1 = np.where(q != 0, self.state[:, 1]/np.where(q != 0, q, 1), 0)
+            h2 = np.where(q != 0, (self.state[:, 0] - p*h1)
+                                  /np.where(q != 0, q, 1), 0)
+            self.calc_coef(np.array(ff, dtype=float),
+                           np.array(bw, dtype=float))
+            p, q = self.taps()
+            self.state = np.stack((p*h1 + q*h2, q*h1), axis=1)
+            self.controls = controls
+            self.matrices = None
+            out, self.state = sosfilt(self.sos, self.input, zi=self.state)
+            self.output = out.tolist()
+            return
+        if self.matrices is None:
+            self.matrices = self.calc_matrices()
+        T, S, A, B = self.matrices
+        x = np.array(self.input)
+        state = self.state.ravel()
+        self.output = (T @ x + S @ state).tolist()
+        self.state = (A @ x + B @ state).reshape(-1, 2)
+
+
 class Impulse(Klatt_Component):
     """
     Klatt time-varying impulse generator.
@@ -597,6 +1095,25 @@ class Impulse(Klatt_Component):
             if (self.master.current_ind + n) - self.master.last_glot_pulse >= glot_period:
                 self.output[n] = 1
                 self.master.last_glot_pulse = self.master.current_ind + n
+
+
+class Wavetable(Klatt_Component):
+    """
+    Reads the current interval of a voicing source rendered by synth.glottal,
+    from the block starting at master.source_offset.
+
+    Arguments:
+        source (int) -- which of master.glottal_source to read, 0 for
+            voicing, 1 for quasi-sinusoidal voicing.
+    """
+    def __init__(self, master, source=0):
+        Klatt_Component.__init__(self, master)
+        self.source = source
+
+    def read(self):
+        signal = self.master.glottal_source[self.source]
+        start = self.master.current_ind - self.master.source_offset
+        self.output = signal[start:start + self.master.inv_samp].tolist()
                 
                 
 class Noise(Klatt_Component):
@@ -617,10 +1134,18 @@ class Amplifier(Klatt_Component):
     Simple amplifier.
     
     Scales input sample values by a decibel value. Can handle negative and
-    positive decibel values.
+    positive decibel values. Gains below SILENT_GAIN output silence.
+
+    Attributes:
+        dB (float) -- level the current gain was calculated for. The gain is
+            only recalculated when the level changes, which for the usually
+            flat amplitude controls means once per synthesis.
+        gain (float) -- current linear gain.
     """
     def __init__(self, master, input_connect=None):
         Klatt_Component.__init__(self, master, input_connect)
+        self.dB = None
+        self.gain = 1
             
     def amplify(self, dB):
         """ 
@@ -630,9 +1155,16 @@ class Amplifier(Klatt_Component):
             dB (float) -- amount of amplification/attenuation in decibels.
         """
         self.pull()
-        dB = math.sqrt(10)**(dB/10)
-        for n in range(self.master.inv_samp):
-            self.output[n] = self.input[n]*dB
+        if dB != self.dB:
+            self.gain = db_to_gain(dB)
+            self.dB = dB
+        if self.gain < SILENT_GAIN:
+            return
+        if self.gain == 1:
+            self.output[:] = self.input
+            return
+        gain = self.gain
+        self.output[:] = [x*gain for x in self.input]
 
 
 class Mixer(Klatt_Component):
@@ -670,6 +1202,9 @@ class First_Diff(Klatt_Component):
         Klatt_Component.__init__(self, master, input_connect)
         self.delay = [0]*1
 
+    def reset_state(self):
+        self.delay = [0]*1
+
     def differentiate(self):
         self.pull()
         self.output[0] = self.input[0] - self.delay[0]
@@ -686,6 +1221,9 @@ class Lowpass(Klatt_Component):
         Klatt_Component.__init__(self, master, input_connect)
         self.delay = [0]*1
 
+    def reset_state(self):
+        self.delay = [0]*1
+
     def filt(self):
         self.pull()
         self.output[0] = self.input[0] + self.delay[0]
@@ -713,5 +1251,7 @@ class Output(Klatt_Component):
         
     def run(self):
         self.pull()
-        self.master.output[self.master.current_ind:self.master.next_ind] = self.input[:]
+        offset = self.master.output_offset
+        self.master.output[self.master.current_ind - offset:
+                           self.master.next_ind - offset] = self.input[:]
 ##### END COMPONENTS #####                   
\ No newline at end of file
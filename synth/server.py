@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@name:    server.py
+@date:    10/18/2026
+@version: 0.1
+@purpose: Local synthesis service for scripts and other programming
+          languages.
+
+@overview:
+    Synth_Server is a long-lived process which synthesizes sounds for
+    clients connecting over a Unix socket or a localhost TCP port, so that
+    tools such as MATLAB, R or experiment runners can generate stimuli
+    without starting Python for every call. It runs from the repository's
+    root directory:
+
+        python3 -m synth.server --port 5077
+        python3 -m synth.server --unix /tmp/trackdraw.sock
+
+    Synthesis runs in a pool of worker processes, which import the
+    synthesizers and render a short sound once when they start, so their
+    Klatt_Synth pool and glottal wavetables are warm by the first request.
+    Results are kept in a Result_Cache keyed by the digest of their
+    Parameters, so repeated requests are answered without synthesis.
+
+    Protocol: requests and responses are JSON objects, one per line, UTF-8
+    encoded. Every request has an "op", and may have an "id" which is
+    copied into its response. Responses have "ok": true, or "ok": false
+    and an "error" message. A connection may send several requests, which
+    are answered in order. Ops:
+
+        {"op": "synthesize", "parms": {...}, "tracks": [[...], ...],
+         "f0": [...], "output": "inline"}
+            parms -- Parameters fields as written by
+                TrackDrawProject.parmsToJSON(), missing fields keep their
+                defaults. FF and F0 hold the tracks, as made by
+                synth.synthesis_parms().
+            tracks -- optional formant tracks, one list of points per
+                formant, replacing FF.
+            f0 -- optional F0 track, a list of points, replacing F0.
+            output -- how the waveform is returned:
+                "inline" -- as "data", base64 of little-endian float32.
+                "shm" -- in a shared memory block named "shm", of
+                    "nbytes" bytes holding little-endian float32. On Linux
+                    it can be read as the file /dev/shm/<name>. The block
+                    is freed by a "release" request, or when the
+                    connection closes.
+                "file" -- written to the WAV file "path" given in the
+                    request, with optional "sample_format" (see
+                    TrackDrawAudio.WavWriter) and "normalize". Only
+                    available if the server was started with --output-dir,
+                    see below.
+            Responses also hold "fs", "nsamples" and "cached".
+        {"op": "release", "shm": name}
+            Frees a shared memory block.
+        {"op": "ping"}
+            Responds with "version" and "workers".
+        {"op": "shutdown"}
+            Stops the server once the response is sent.
+
+    Synth_Client speaks this protocol from Python.
+
+    Security: the server doesn't authenticate its clients. Anyone who can
+    connect to it, i.e. any local user for a TCP port, or those allowed by
+    the permissions of a Unix socket, can make it synthesize. Since "file"
+    outputs are written with the server's permissions, they are disabled
+    unless --output-dir is given, and then confined to that directory:
+    relative paths are taken relative to it, and a path which resolves to
+    anywhere outside it, e.g. through ".." or a symbolic link, is rejected.
+"""
+import argparse
+import base64
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+VERSION = 1
+DEFAULT_PORT = 5077
+
+
+##### Worker process functions #####
+def _init_worker():
+    """ Imports the synthesizers and warms them up with a short sound. """
+    import synth
+    synth.synthesize_parms(make_parms({"dur": 0.1}))
+
+def _render(fields, tracks, f0):
+    """ Synthesizes request fields, returns (digest, fs, float32 waveform). """
+    import synth
+    parms = make_parms(fields, tracks, f0)
+    waveform = synth.synthesize_parms(parms)
+    return(parms.digest, parms.synth_fs, waveform.astype(np.float32))
+##### End worker process functions #####
+
+
+def make_parms(fields, tracks=None, f0=None):
+    """
+    Returns the Parameters of a synthesize request.
+
+    Arguments:
+        fields (dict) -- Parameters fields, see TrackDrawProject.parmsToJSON().
+        tracks (list) -- formant tracks, one list of points per formant, or
+            None to use FF from fields.
+        f0 (list) -- F0 track, or None to use F0 from fields.
+
+    Formant tracks given as a single point per formant, like the default
+    FF, are held constant over the sound.
+    """
+    import TrackDrawProject as TDPR
+    parms = TDPR.parmsFromJSON(fields)
+    if tracks is not None:
+        parms.FF = np.array(tracks, dtype=np.float64).T
+    if f0 is not None:
+        parms.F0 = f0
+    if np.ndim(parms.FF) == 1:
+        parms.FF = np.tile(np.asarray(parms.FF, dtype=np.float64), (2, 1))
+    return(parms)
+
+
+class Result_Cache:
+    """
+    Least recently used cache of synthesized waveforms with a memory budget.
+
+    Arguments:
+        budget (int) -- largest total size of the cached waveforms in bytes.
+
+    Thread-safe, it is shared by all connections.
+    """
+    def __init__(self, budget=256*1024*1024):
+        self.budget = budget
+        self.nbytes = 0
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """ Returns (fs, waveform) stored under key, or None. """
+        with self.lock:
+            result = self.results.get(key)
+            if result is not None:
+                self.results.move_to_end(key)
+            return(result)
+
+    def put(self, key, fs, waveform):
+        """ Stores a read-only waveform, dropping old ones if needed. """
+        waveform.setflags(write=False)
+        with self.lock:
+            old = self.results.pop(key, None)
+            if old is not None:
+                self.nbytes = self.nbytes - old[1].nbytes
+            self.results[key] = (fs, waveform)
+            self.nbytes = self.nbytes + waveform.nbytes
+            while self.nbytes > self.budget and len(self.results) > 1:
+                _, (_, dropped) = self.results.popitem(last=False)
+                self.nbytes = self.nbytes - dropped.nbytes
+
+
+class Synth_Handler(socketserver.StreamRequestHandler):
+    """
+    Serves the requests of one connection, see the module doc string.
+
+    Attributes:
+        blocks (dict) -- shared memory blocks handed out on this
+            connection and not released yet, by name.
+    """
+    def setup(self):
+        socketserver.StreamRequestHandler.setup(self)
+        self.blocks = {}
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            request = {}
+            try:
+                request = json.loads(line.decode())
+                response = self.server.respond(request, self.blocks)
+            except Exception as err:
+                if not isinstance(request, dict):
+                    request = {}
+                response = {"ok": False, "error": type(err).__name__ + ": "
+                                                  + str(err)}
+            if "id" in request:
+                response["id"] = request["id"]
+            self.wfile.write((json.dumps(response) + "\n").encode())
+            self.wfile.flush()
+            if request.get("op") == "shutdown":
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+    def finish(self):
+        for name in list(self.blocks):
+            release_block(self.blocks, name)
+        socketserver.StreamRequestHandler.finish(self)
+
+
+def release_block(blocks, name):
+    """ Frees the shared memory block name and forgets it. """
+    shm = blocks.pop(name)
+    shm.close()
+    shm.unlink()
+
+
+class Synth_Server(socketserver.ThreadingMixIn):
+    """
+    Mixin with the state and request handling of the synthesis service.
+    Use Synth_Server.create() to make a server listening on an address.
+
+    Arguments:
+        n_workers (int) -- number of worker processes, defaults to the
+            number of CPUs.
+        cache_bytes (int) -- memory budget of the Result_Cache.
+
+    Every connection is served by its own thread, which waits for its
+    requests' synthesis in the worker pool, so several clients are served
+    at once, up to the number of workers.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    @classmethod
+    def create(cls, address, n_workers=None, cache_bytes=256*1024*1024,
+               output_dir=None):
+        """
+        Returns a server listening on address, a (host, port) tuple for TCP
+        or a path for a Unix socket. "file" outputs are written below
+        output_dir, or refused if it is None.
+        """
+        if isinstance(address, str):
+            base = socketserver.UnixStreamServer
+            if os.path.exists(address):
+                # Only a socket left behind by an earlier server is replaced
+                if not stat.S_ISSOCK(os.stat(address).st_mode):
+                    raise OSError("Can't listen on " + address
+                                  + ", the path is in use")
+                os.remove(address)
+        else:
+            base = socketserver.TCPServer
+        server_class = type("Synth_Server_" + base.__name__, (cls, base), {})
+        server = server_class(address, Synth_Handler)
+        server.output_dir = None if output_dir is None \
+                            else os.path.realpath(output_dir)
+        server.start_workers(n_workers, cache_bytes)
+        return(server)
+
+    def start_workers(self, n_workers, cache_bytes):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, wait
+        self.cache = Result_Cache(cache_bytes)
+        self.n_workers = n_workers or os.cpu_count() or 1
+        # Spawned rather than forked, since the server runs threads
+        self.pool = ProcessPoolExecutor(
+                max_workers=self.n_workers, initializer=_init_worker,
+                mp_context=multiprocessing.get_context("spawn"))
+        # Start and warm up every worker before the first request
+        wait([self.pool.submit(int) for _ in range(self.n_workers)])
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+        if isinstance(self.server_address, str) \
+                and os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+    def respond(self, request, blocks):
+        """ Returns the response to one request, see the module doc string. """
+        op = request.get("op")
+        if op == "ping":
+            return({"ok": True, "version": VERSION,
+                    "workers": self.n_workers})
+        if op == "shutdown":
+            return({"ok": True})
+        if op == "release":
+            release_block(blocks, request["shm"])
+            return({"ok": True})
+        if op != "synthesize":
+            raise ValueError("Unknown op: " + str(op))
+        fields = request.get("parms", {})
+        tracks = request.get("tracks")
+        f0 = request.get("f0")
+        digest = make_parms(fields, tracks, f0).digest
+        result = self.cache.get(digest)
+        cached = result is not None
+        if not cached:
+            digest, fs, waveform = self.pool.submit(_render, fields, tracks,
+                                                    f0).result()
+            self.cache.put(digest, fs, waveform)
+            result = (fs, waveform)
+        fs, waveform = result
+        response = {"ok": True, "fs": fs, "nsamples": len(waveform),
+                    "cached": cached}
+        output = request.get("output", "inline")
+        data = waveform.astype("<f4", copy=False)
+        if output == "inline":
+            response["data"] = base64.b64encode(data.tobytes()).decode()
+        elif output == "shm":
+            from multiprocessing import shared_memory
+            shm = shared_memory.SharedMemory(create=True,
+                                             size=max(data.nbytes, 1))
+            np.ndarray(data.shape, dtype="<f4", buffer=shm.buf)[:] = data
+            blocks[shm.name] = shm
+            response["shm"] = shm.name
+            response["nbytes"] = data.nbytes
+        elif output == "file":
+            import TrackDrawAudio as TDA
+            path = self.output_path(request["path"])
+            response["path"] = path
+            response["stats"] = TDA.writeWav(
+                    path, waveform, fs,
+                    sample_format=request.get("sample_format", "int16"),
+                    normalize=request.get("normalize", False))
+        else:
+            raise ValueError("Unknown output: " + str(output))
+        return(response)
+
+
+    def output_path(self, path):
+        """
+        Returns the absolute path a "file" output requested as path is
+        written to. Raises PermissionError if file outputs are disabled or
+        path lies outside the output directory.
+        """
+        if self.output_dir is None:
+            raise PermissionError("File output is disabled, start the "
+                                  "server with --output-dir")
+        full = os.path.realpath(os.path.join(self.output_dir, path))
+        if os.path.commonpath([full, self.output_dir]) != self.output_dir:
+            raise PermissionError(path + " is outside the output directory")
+        return(full)
+
+
+class Synth_Client:
+    """
+    Client of a Synth_Server.
+
+    Arguments:
+        address -- (host, port) tuple or Unix socket path the server
+            listens on.
+    """
+    def __init__(self, address=("127.0.0.1", DEFAULT_PORT)):
+        family = socket.AF_UNIX if isinstance(address, str) \
+                 else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.connect(address)
+        self.rfile = self.sock.makefile("rb")
+        self.next_id = 0
+
+    def request(self, **request):
+        """
+        Sends one request, given as keywords, and returns its response as a
+        dict. Raises RuntimeError if the server reports an error.
+        """
+        self.next_id = self.next_id + 1
+        request["id"] = self.next_id
+        self.sock.sendall((json.dumps(request) + "\n").encode())
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("Synthesis server closed the connection")
+        response = json.loads(line.decode())
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return(response)
+
+    def synthesize(self, parms, tracks=None, f0=None, output="shm"):
+        """
+        Synthesizes on the server.
+
+        Arguments:
+            parms (TrackDrawData.Parameters or dict) -- parameters, see the
+                module doc string for tracks in FF and F0.
+            tracks (list or np.array) -- optional formant tracks, one row
+                per formant.
+            f0 (list or np.array) -- optional F0 track.
+            output (str) -- "shm" or "inline", how the samples are sent.
+
+        Returns (waveform, fs), waveform as a float32 np.array.
+        """
+        import TrackDrawProject as TDPR
+        if not isinstance(parms, dict):
+            parms = TDPR.parmsToJSON(parms)
+        request = {"op": "synthesize", "parms": parms, "output": output}
+        if tracks is not None:
+            request["tracks"] = np.asarray(tracks, dtype=np.float64).tolist()
+        if f0 is not None:
+            request["f0"] = np.asarray(f0, dtype=np.float64).tolist()
+        response = self.request(**request)
+        n = response["nsamples"]
+        if output == "inline":
+            waveform = np.frombuffer(base64.b64decode(response["data"]),
+                                     dtype="<f4").astype(np.float32)
+        else:
+            waveform = read_block(response["shm"], n)
+            self.request(op="release", shm=response["shm"])
+        return(waveform, response["fs"])
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_block(name, n):
+    """ Returns a copy of n float32 samples in the shared memory block name. """
+    from multiprocessing import shared_memory
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block for removal when
+        # this process exits, which is up to the server instead
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        return(np.ndarray((n,), dtype="<f4", buffer=shm.buf)
+               .astype(np.float32))
+    finally:
+        shm.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TrackDraw synthesis server")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="localhost TCP port to listen on")
+    parser.add_argument("--unix", help="Unix socket path to listen on "
+                                       "instead of a TCP port")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument("--cache-mb", type=int, default=256,
+                        help="memory budget of the result cache in MB")
+    parser.add_argument("--output-dir",
+                        help="directory \"file\" outputs are written to, "
+                             "they are refused without it")
+    args = parser.parse_args(argv)
+    address = args.unix if args.unix else ("127.0.0.1", args.port)
+    server = Synth_Server.create(address, n_workers=args.workers,
+                                 cache_bytes=args.cache_mb*1024*1024,
+                                 output_dir=args.output_dir)
+    print("Synthesis server listening on " + str(address) + " with "
+          + str(server.n_workers) + " workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
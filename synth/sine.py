@@ -4,51 +4,252 @@
 @name:    sine.py
 @author:  Daniel R Guest
 @date:    07/20/2016
-@version: 1.0
+@version: 1.1
 @purpose: Synthesize "sine wave" vowels.
 
 @overview:
-    Formant tracks provided by TrackDraw 2016 are used as frequency contours 
-    for 5 sine waves. Output waveform is returned
+    Formant tracks provided by TrackDraw 2016 are used to synthesize a vowel
+    from sine waves, in one of two modes (Parameters.sine_mode):
+        "formant" -- one sine wave per formant, following its track, as in
+            sine wave speech.
+        "harmonic" -- the harmonics of F0 below the Nyquist frequency, each
+            weighted by the formant envelope, i.e. the spectrum of an impulse
+            train at F0 filtered by a cascade of Klatt (1980) resonators at
+            the formant frequencies and bandwidths. Every frame of HOP_MS
+            the harmonic spectrum is turned into a one-period wavetable by
+            an inverse FFT, and the wavetables of neighbouring frames are
+            read at the phase of F0 and overlap-added. So the cost per sample
+            doesn't grow with the number of harmonics.
+    The output is scaled by the amplitude envelope ENV in both modes.
+
+    Sine_Synth renders a sound block by block, carrying the oscillator
+    phases from one block to the next, so that sine_stream() can hand out a
+    long sound in pieces which together make up what sine_make() returns.
 """
-def sine_make(params):
-    # Import
-    import numpy as np
-    from scipy.interpolate import interp1d
-    import matplotlib.pyplot as plt
-    
-    # Extract necessary variables from TrackDraw 2016 Parameters object
-    input_formants = params.FF
-    input_envelope = params.ENV
-    dur = params.dur
-    Fs = params.synth_fs
-    
-    # Create necessary variables
-    dt = 1/Fs
-    n_formants = input_formants.shape[1]
-    n_samples = round(dur*Fs)
-    
-    # Interpolate "formants"
-    interpolated_formants = np.zeros([n_samples, n_formants])
-    for i in range(n_formants):
-        seq = np.arange(0, input_formants.shape[0])
-        seq_new = np.linspace(0, input_formants.shape[0]-1, n_samples)
-        temp = interp1d(seq, input_formants[:,i])(seq_new)
-        interpolated_formants[:,i] = temp
-
-    # Interpolate envelope
-    seq = np.arange(0, input_envelope.shape[0])
-    seq_new = np.linspace(0, input_envelope.shape[0]-1, n_samples)
-    interpolated_envelope = interp1d(seq, input_envelope)(seq_new)
-    
-    # Generate sine waves
-    waves = []
-    for i in range(n_formants):
-        phase = np.cumsum(2*np.pi*interpolated_formants[:,i]/Fs)
-        waves.append(np.cos(phase))
-    output_wave = np.zeros([n_samples])
-    for i in range(n_formants):
-        output_wave = output_wave + waves[i]
-    output_wave = output_wave*interpolated_envelope
-    return(output_wave)
-        
\ No newline at end of file
+import math
+import numpy as np
+
+
+MODES = ("formant", "harmonic")
+# Frame hop of the harmonic mode in ms
+HOP_MS = 5
+# Wavetables have at least TABLE_LEN samples and TABLE_OVERSAMPLE samples
+# per period of the highest harmonic, to keep linear interpolation accurate
+TABLE_LEN = 2048
+TABLE_OVERSAMPLE = 32
+# Frames with a lower F0 in Hz are silent in the harmonic mode
+MIN_F0 = 20
+
+
+def sine_make(params, dtype=np.float64, block_size=10000):
+    """
+    Synthesizes a Parameters object, see the module doc string.
+
+    Arguments:
+        params (TrackDrawData.Parameters) -- input parameters, with F0 and
+            FF holding the tracks as made by synth.synthesis_parms().
+        dtype (np.dtype) -- np.float64 or np.float32, type of the output.
+        block_size (int) -- number of samples rendered at a time. Besides
+            the output, memory use only grows with the block size, not with
+            the duration.
+
+    Returns the waveform as an np.array.
+    """
+    synth = Sine_Synth(params, dtype)
+    out = np.empty(synth.n_samples, dtype=dtype)
+    while synth.position < synth.n_samples:
+        start = synth.position
+        out[start:start + block_size] = synth.render(block_size)
+    return(out)
+
+
+def sine_stream(params, block_size=10000, dtype=np.float64):
+    """
+    Synthesizes a Parameters object block by block.
+
+    Arguments:
+        params (TrackDrawData.Parameters) -- see sine_make().
+        block_size (int) -- number of samples per block.
+        dtype (np.dtype) -- see sine_make().
+
+    Returns a generator of np.arrays which together make up the waveform
+    sine_make() returns.
+    """
+    synth = Sine_Synth(params, dtype)
+    while synth.position < synth.n_samples:
+        yield synth.render(block_size)
+
+
+def interp_tracks(tracks, positions, n_samples):
+    """
+    Linearly interpolates tracks at sample positions.
+
+    Arguments:
+        tracks (np.array) -- (n_points, n_tracks) array, or a single track,
+            with the points spread evenly over the sound.
+        positions (np.array) -- sample positions to interpolate at.
+        n_samples (int) -- number of samples in the sound.
+
+    Returns an (n_tracks, len(positions)) array, or a 1-D array for a single
+    track. All tracks are interpolated at once.
+    """
+    tracks = np.asarray(tracks, dtype=np.float64)
+    single = tracks.ndim < 2
+    if single:
+        tracks = tracks.reshape(-1, 1)
+    n_points, n_tracks = tracks.shape
+    x = np.asarray(positions, dtype=np.float64)*(max(n_points - 1, 0)
+                                                 /max(n_samples - 1, 1))
+    # The tracks are laid end to end, a point apart, so that one np.interp
+    # call does all of them
+    x = x + (np.arange(n_tracks)*n_points)[:, np.newaxis]
+    out = np.interp(x, np.arange(tracks.size, dtype=np.float64),
+                    tracks.T.ravel())
+    return(out[0] if single else out)
+
+
+def harmonics(f0, fs):
+    """ Returns the number of harmonics of f0 strictly below fs/2. """
+    return(np.ceil(fs/2/np.asarray(f0)).astype(int) - 1)
+
+
+def formant_response(freqs, ff, bw, fs):
+    """
+    Returns the complex response of a cascade of Klatt (1980) resonators.
+
+    Arguments:
+        freqs (np.array) -- (n_frames, n_freqs) frequencies in Hz.
+        ff (np.array) -- (n_frames, n_form) formant frequencies in Hz.
+        bw (np.array) -- n_form bandwidths in Hz.
+        fs (int) -- sampling rate in Hz.
+
+    Each resonator has a gain of 1 at 0 Hz, as in synth.klatt.Resonator.
+    """
+    z1 = np.exp(-2j*math.pi*freqs/fs)
+    z2 = z1*z1
+    response = np.ones(np.shape(freqs), dtype=complex)
+    for i, bw_i in enumerate(bw):
+        c = -math.exp(-2*math.pi*bw_i/fs)
+        b = (2*math.exp(-math.pi*bw_i/fs)
+             *np.cos(2*math.pi*ff[:, i]/fs))[:, np.newaxis]
+        response *= (1 - b - c)/(1 - b*z1 - c*z2)
+    return(response)
+
+
+class Sine_Synth:
+    """
+    Renders a sine wave vowel block by block, see the module doc string.
+
+    Arguments:
+        params (TrackDrawData.Parameters) -- see sine_make().
+        dtype (np.dtype) -- see sine_make().
+
+    Attributes:
+        n_samples (int) -- length of the sound.
+        position (int) -- first sample of the next block.
+        phase (np.array) -- phase of each formant's sine wave at the last
+            sample rendered, in radians, in the formant mode.
+        cycles (float) -- phase of F0 at the last sample rendered, in
+            periods, in the harmonic mode.
+    """
+    def __init__(self, params, dtype=np.float64):
+        self.mode = getattr(params, "sine_mode", "formant")
+        if self.mode not in MODES:
+            raise ValueError("Unknown sine_mode: " + str(self.mode))
+        self.fs = params.synth_fs
+        self.n_samples = round(params.dur*self.fs)
+        self.dtype = np.dtype(dtype)
+        self.ff = np.asarray(params.FF, dtype=np.float64)
+        if self.ff.ndim == 1:
+            self.ff = self.ff[np.newaxis, :]
+        self.n_form = self.ff.shape[1]
+        self.bw = np.asarray(params.BW, dtype=np.float64)[0:self.n_form]
+        self.f0 = params.F0
+        self.env = params.ENV
+        self.hop = max(1, round(HOP_MS*self.fs/1000))
+        # Same wavetable length for every block, enough for the lowest F0
+        max_harm = int(harmonics(max(np.min(self.f0), MIN_F0), self.fs))
+        self.table_len = max(TABLE_LEN, 1 << (TABLE_OVERSAMPLE*max_harm
+                                              - 1).bit_length())
+        self.position = 0
+        self.phase = np.zeros(self.n_form)
+        self.cycles = 0.0
+
+    def render(self, n):
+        """ Returns the next n samples, or fewer at the end of the sound. """
+        start = self.position
+        stop = min(start + n, self.n_samples)
+        self.position = stop
+        positions = np.arange(start, stop)
+        if self.mode == "formant":
+            out = self.render_formants(positions)
+        else:
+            out = self.render_harmonics(positions)
+        out *= interp_tracks(self.env, positions, self.n_samples)
+        return(out.astype(self.dtype, copy=False))
+
+    def render_formants(self, positions):
+        """ Sums one sine wave per formant, all in a single pass. """
+        phase = interp_tracks(self.ff, positions, self.n_samples)
+        np.cumsum(phase, axis=1, out=phase)
+        phase *= 2*math.pi/self.fs
+        phase += self.phase[:, np.newaxis]
+        if phase.shape[1]:
+            self.phase = np.mod(phase[:, -1], 2*math.pi)
+        if self.dtype == np.float32:
+            # Large phases lose their precision in float32
+            phase = np.mod(phase, 2*math.pi, out=phase).astype(np.float32)
+        np.cos(phase, out=phase)
+        return(phase.sum(axis=0, dtype=np.float64))
+
+    def render_harmonics(self, positions):
+        """
+        Overlap-adds the harmonic wavetables of the frames around positions.
+        Frame j is centered on sample j*hop and faded in and out over the
+        hops before and after it with a squared sine window.
+        """
+        if len(positions) == 0:
+            return(np.zeros(0))
+        cycles = np.cumsum(interp_tracks(self.f0, positions, self.n_samples))
+        cycles /= self.fs
+        cycles += self.cycles
+        self.cycles = cycles[-1] % 1
+        first = positions[0]//self.hop
+        frames = np.arange(first, positions[-1]//self.hop + 2)
+        tables = self.wavetables(frames)
+        length = tables.shape[1] - 1
+        phase = np.mod(cycles, 1)*length
+        idx = np.minimum(phase.astype(int), length - 1)
+        frac = phase - idx
+        frame = positions//self.hop - first
+        fade = np.sin(0.5*math.pi*(positions % self.hop)/self.hop)**2
+        out = np.zeros(len(positions))
+        for offset, weight in ((0, 1 - fade), (1, fade)):
+            out += weight*(tables[frame + offset, idx]*(1 - frac)
+                           + tables[frame + offset, idx + 1]*frac)
+        return(out)
+
+    def wavetables(self, frames):
+        """
+        Returns one period of the harmonic signal of each frame, as an
+        (n_frames, length + 1) array whose last column repeats the first.
+        """
+        centers = np.minimum(frames*self.hop, self.n_samples - 1)
+        f0 = interp_tracks(self.f0, centers, self.n_samples)
+        ff = interp_tracks(self.ff, centers, self.n_samples).T
+        voiced = f0 >= MIN_F0
+        f0 = np.where(voiced, f0, MIN_F0)
+        n_harm = np.where(voiced, harmonics(f0, self.fs), 0)
+        max_harm = max(int(n_harm.max()), 1)
+        length = self.table_len
+        k = np.arange(1, max_harm + 1)
+        freqs = f0[:, np.newaxis]*k
+        # Harmonic k of a unit impulse train at F0 is 2*F0/fs, irfft()
+        # divides by length/2
+        spectrum = np.zeros((len(frames), length//2 + 1), dtype=complex)
+        spectrum[:, 1:max_harm + 1] = formant_response(freqs, ff, self.bw,
+                                                       self.fs)\
+                                      *(length*f0/self.fs)[:, np.newaxis]\
+                                      *(k <= n_harm[:, np.newaxis])
+        tables = np.fft.irfft(spectrum, length, axis=1)
+        return(np.concatenate((tables, tables[:, 0:1]), axis=1))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@name:    test_klatt.py
+@date:    10/18/2026
+@version: 0.1
+@purpose: Regression tests of the Klatt synthesizer.
+
+@overview:
+    klatt_baseline.npz holds the output of klatt.py as of the first commit
+    of this repository, before the synthesizer was optimized, for the cases
+    in CASES and BRIDGE. Each was synthesized right after
+    np.random.seed(SEED), with the Klatt_Synth or klatt_bridge() arguments
+    used below. The tests check that today's synthesizer still produces the
+    same waveforms with either glottal model, whether it is run whole,
+    streamed, or taken from the pool after rendering another sound.
+
+    The "impulse" model runs the same filters as the baseline, so it has to
+    match to rounding. The "klatt" model adds up truncated wavetables, see
+    synth/glottal.py, so it gets a looser tolerance.
+"""
+import os
+import numpy as np
+import pytest
+
+import synth.klatt as klatt
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), "klatt_baseline.npz")
+SEED = 0
+FS = 10000
+INV_SAMP = 50
+N_INV = 40
+# Largest difference from the baseline, relative to its peak
+TOLERANCE = {"impulse": 1e-9, "klatt": 1e-7}
+
+CASES = {
+    "cascade": dict(n_form=5, sw=0, av=60, avs=40, ah=50),
+    "parallel": dict(n_form=5, sw=1, av=60, af=50, a1=60, a2=55, a3=50,
+                     a4=45, a5=40),
+    "cascade_7": dict(n_form=7, sw=0, av=60, avs=40, ah=50),
+}
+BRIDGE = dict(f0=np.linspace(120, 90, 7),
+              ff=np.array([[700, 1200, 2500, 3500, 4500],
+                           [300, 2200, 2900, 3600, 4500]]),
+              bw=np.array([60, 90, 150, 200, 250]),
+              av=60, avs=0, ah=45, af=0, fs=FS, dur=0.2)
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    with np.load(BASELINE) as data:
+        return({name: data[name] for name in data.files})
+
+def tracks(n_form):
+    """ Returns rising (f0, ff, bw) tracks of N_INV intervals. """
+    t = np.linspace(0, 1, N_INV)
+    f0 = list(100 + 40*t)
+    ff = [list((500 + 1000*i)*(1 + 0.1*t)) for i in range(n_form)]
+    bw = [[50.0 + 20*i]*N_INV for i in range(n_form)]
+    return(f0, ff, bw)
+
+def make_synth(name, glottal_model):
+    controls = dict(CASES[name])
+    n_form = controls.pop("n_form")
+    f0, ff, bw = tracks(n_form)
+    return(klatt.Klatt_Synth(f0=f0, ff=ff, bw=bw, fs=FS, n_inv=N_INV,
+                             n_form=n_form, inv_samp=INV_SAMP,
+                             glottal_model=glottal_model, **controls))
+
+def assert_matches(output, expected, glottal_model):
+    output = np.asarray(output)
+    assert output.shape == expected.shape
+    error = np.max(np.abs(output - expected))/np.max(np.abs(expected))
+    assert error < TOLERANCE[glottal_model]
+
+
+@pytest.mark.parametrize("glottal_model", ["impulse", "klatt"])
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_synth_matches_baseline(baseline, name, glottal_model):
+    synth = make_synth(name, glottal_model)
+    np.random.seed(SEED)
+    synth.synth()
+    assert_matches(synth.output, baseline[name], glottal_model)
+
+@pytest.mark.parametrize("glottal_model", ["impulse", "klatt"])
+@pytest.mark.parametrize("block_invs", [1, 7, N_INV])
+def test_stream_matches_baseline(baseline, block_invs, glottal_model):
+    synth = make_synth("cascade", glottal_model)
+    np.random.seed(SEED)
+    output = np.concatenate(list(synth.stream(block_invs=block_invs)))
+    assert_matches(output, baseline["cascade"], glottal_model)
+
+@pytest.mark.parametrize("glottal_model", ["impulse", "klatt"])
+def test_bridge_matches_baseline(baseline, glottal_model):
+    np.random.seed(SEED)
+    output = klatt.klatt_bridge(glottal_model=glottal_model, **BRIDGE)
+    assert_matches(output, baseline["bridge"], glottal_model)
+
+@pytest.mark.parametrize("glottal_model", ["impulse", "klatt"])
+def test_pooled_rerender_matches_baseline(baseline, glottal_model):
+    klatt.POOL.clear()
+    # Leave a synth with the same key in the pool, with its filters and
+    # glottal source set up for another sound
+    other = dict(BRIDGE, f0=BRIDGE["f0"]*1.5, ff=BRIDGE["ff"][::-1], ah=0,
+                 dur=0.35)
+    klatt.klatt_bridge(glottal_model="klatt", **other)
+    pooled = klatt.POOL.acquire(FS, 5, INV_SAMP)
+    assert pooled is not None
+    klatt.POOL.release(pooled)
+    np.random.seed(SEED)
+    output = klatt.klatt_bridge(glottal_model=glottal_model, **BRIDGE)
+    assert klatt.POOL.acquire(FS, 5, INV_SAMP) is pooled
+    assert_matches(output, baseline["bridge"], glottal_model)
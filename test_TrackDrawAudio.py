@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of WAV export in TrackDrawAudio, read back with scipy.io.wavfile.
+"""
+
+import numpy as np
+import pytest
+from scipy.io import wavfile
+
+import TrackDrawAudio as TDA
+
+
+FS = 10000
+# Full scale of the samples scipy returns, and the largest rounding error
+FORMATS = {"int16": (2**15, np.int16, 2**-15),
+           "int24": (2**31, np.int32, 2**-23),
+           "float32": (1, np.float32, 1e-7)}
+
+
+@pytest.fixture
+def waveform():
+    rng = np.random.RandomState(0)
+    return(np.clip(0.3*rng.randn(20001), -0.99, 0.99))
+
+def read(path, sample_format):
+    fs, data = wavfile.read(path)
+    scale, dtype, _ = FORMATS[sample_format]
+    assert fs == FS
+    assert data.dtype == dtype
+    return(data/scale)
+
+
+@pytest.mark.parametrize("sample_format", sorted(FORMATS))
+def test_writer_round_trip(tmp_path, waveform, sample_format):
+    path = str(tmp_path/"out.wav")
+    with TDA.WavWriter(path, FS, sample_format=sample_format) as writer:
+        for i in range(0, len(waveform), 999):
+            writer.write(waveform[i:i + 999])
+    assert writer.nsamples == len(waveform)
+    data = read(path, sample_format)
+    assert np.allclose(data, waveform, atol=FORMATS[sample_format][2])
+
+@pytest.mark.parametrize("sample_format", sorted(FORMATS))
+def test_write_wav_stereo(tmp_path, waveform, sample_format):
+    path = str(tmp_path/"out.wav")
+    stereo = np.stack((waveform, -waveform), axis=1)
+    info = TDA.writeWav(path, stereo, FS, nchannels=2,
+                        sample_format=sample_format, chunk_size=1000)
+    assert info["nsamples"] == len(waveform)
+    assert np.isclose(info["seconds"], len(waveform)/FS)
+    data = read(path, sample_format)
+    assert data.shape == stereo.shape
+    assert np.allclose(data, stereo, atol=FORMATS[sample_format][2])
+
+@pytest.mark.parametrize("sample_format", sorted(FORMATS))
+def test_write_wav_normalized_stream(tmp_path, waveform, sample_format):
+    path = str(tmp_path/"out.wav")
+    blocks = (3*waveform[i:i + 4096] for i in range(0, len(waveform), 4096))
+    TDA.writeWav(path, blocks, FS, sample_format=sample_format,
+                 normalize=True, level=0.5, chunk_size=3000)
+    data = read(path, sample_format)
+    expected = 0.5*waveform/np.max(np.abs(waveform))
+    # Streams to be normalized are spooled as float32
+    assert np.allclose(data, expected, atol=FORMATS[sample_format][2] + 1e-7)
+
+def test_integer_formats_clip(tmp_path):
+    path = str(tmp_path/"out.wav")
+    TDA.writeWav(path, np.array([2.0, -2.0, 0.5]), FS)
+    _, data = wavfile.read(path)
+    assert list(data) == [2**15 - 1, -2**15, 2**14]
+
+def test_write_wav_stops_on_progress(tmp_path, waveform):
+    path = str(tmp_path/"out.wav")
+    info = TDA.writeWav(path, waveform, FS, chunk_size=1000,
+                        progress=lambda n: n < 3000)
+    assert info["nsamples"] == 3000
+    assert len(read(path, "int16")) == 3000
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        TDA.WavWriter(str(tmp_path/"out.wav"), FS, sample_format="int8")
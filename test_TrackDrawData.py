@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the tracks, parameters and sounds in TrackDrawData.
+"""
+
+import copy
+import pickle
+import numpy as np
+import pytest
+
+import TrackDrawData as TDD
+
+
+##### Track #####
+def test_track_drops_collinear_points():
+    track = TDD.Track([0, 1, 2, 3, 2, 2])
+    assert np.allclose(track.times, [0, 0.6, 0.8, 1])
+    assert track.values == [0.0, 3.0, 2.0, 2.0]
+    assert np.allclose(track.sample(6), [0, 1, 2, 3, 2, 2])
+
+def test_track_value_interpolates_and_holds_ends():
+    track = TDD.Track([10, 20], times=[0.25, 0.75])
+    assert track.value(0) == 10
+    assert track.value(0.5) == 15
+    assert track.value(1) == 20
+
+def test_track_insert_and_version():
+    track = TDD.Track([100])
+    version = track.version
+    track.insert(0.5, 200)
+    track.insert(0.5, 300)
+    assert track.times == [0.0, 0.5]
+    assert track.values == [100.0, 300.0]
+    assert track.version == version + 2
+
+def test_track_replace_returns_old_breakpoints():
+    track = TDD.Track([0, 1, 2, 3, 4], times=[0, 0.25, 0.5, 0.75, 1])
+    old = track.replace([0.3, 0.6], [9, 9], span=(0.25, 0.75))
+    assert old == ([0.25, 0.5, 0.75], [1.0, 2.0, 3.0])
+    assert track.times == [0.0, 0.3, 0.6, 1.0]
+    track.replace(*old, span=(0.25, 0.75))
+    assert track.breakpoints(0, 1) == ([0, 0.25, 0.5, 0.75, 1],
+                                       [0, 1, 2, 3, 4])
+
+def test_track_sample_is_cached_and_read_only():
+    track = TDD.Track([1, 2, 3])
+    sampled = track.sample(5)
+    assert track.sample(5) is sampled
+    assert not sampled.flags.writeable
+    track.insert(0.5, 7)
+    assert track.sample(5)[2] == 7
+
+def test_track_copy_is_independent():
+    track = TDD.Track([1, 2, 3])
+    other = copy.copy(track)
+    other.insert(0.5, 7)
+    assert track.value(0.5) == 2
+##### End Track #####
+
+
+##### TrackSet #####
+@pytest.fixture
+def tracks():
+    return(TDD.TrackSet.flat([500, 1500, 2500], 21))
+
+def test_trackset_points(tracks):
+    points = tracks.points
+    assert points.shape == (3, 21)
+    assert not points.flags.writeable
+    assert np.all(points[1] == 1500)
+    assert tracks.points is points
+
+def test_set_points_changes_only_edited_columns(tracks):
+    before = tracks.points.copy()
+    replaced = tracks.setPoints(1, [4, 5, 6, 12], [1000, 1100, 1200, 1800])
+    after = tracks.points
+    assert len(replaced) == 2
+    assert after[1, 5] == 1100 and after[1, 12] == 1800
+    untouched = np.ones(21, dtype=bool)
+    untouched[[4, 5, 6, 12]] = False
+    assert np.array_equal(after[1, untouched], before[1, untouched])
+    assert np.array_equal(after[[0, 2]], before[[0, 2]])
+
+def test_set_points_replaced_undoes_edit(tracks):
+    track = tracks[1]
+    old = track.breakpoints(0, 1)
+    replaced = tracks.setPoints(1, slice(3, 9), 900)
+    for span, breakpoints in reversed(replaced):
+        track.replace(*breakpoints, span=span)
+    assert track.breakpoints(0, 1) == old
+
+def test_set_points_bubbles(tracks):
+    tracks.setPoints(1, [10], 400, bubble_len=250)
+    assert tracks.points[1, 10] == 750
+    tracks.setPoints(1, [10], 2400, bubble_len=250)
+    assert tracks.points[1, 10] == 2250
+
+def test_enforce_bubbles(tracks):
+    tracks.setPoints(1, slice(0, 21), 2450)
+    tracks.enforceBubbles(250)
+    points = tracks.points
+    assert np.all(np.diff(points, axis=0) >= 250 - 1e-9)
+    assert np.all(points[2] == 2700)
+
+def test_change_no_points_keeps_breakpoints(tracks):
+    tracks.setPoints(0, [7], 300)
+    breakpoints = tracks[0].breakpoints(0, 1)
+    tracks.changeNoPoints(41)
+    assert tracks.points.shape == (3, 41)
+    assert tracks[0].breakpoints(0, 1) == breakpoints
+    assert tracks.points[0, 14] == 300
+    tracks.changeNoPoints(21)
+    assert tracks.points[0, 7] == 300
+
+def test_change_no_tracks(tracks):
+    tracks.changeNoTracks(5, [500, 1500, 2500, 3500, 4500])
+    assert tracks.points.shape == (5, 21)
+    assert np.all(tracks.points[4] == 4500)
+    tracks.changeNoTracks(2, [])
+    assert len(tracks) == 2
+
+def test_trackset_slices_share_tracks(tracks):
+    part = tracks[0:2]
+    assert part[1] is tracks[1]
+    assert tracks.copy()[1] is not tracks[1]
+    assert tracks.matrix(2).shape == (21, 2)
+##### End TrackSet #####
+
+
+##### Parameters #####
+def test_parameters_coercion():
+    parms = TDD.Parameters(AV=60.7, dur="2", F0=[100, 120],
+                           FF=[[500, 1500]], window_type=np.hanning)
+    assert parms.AV == 60 and isinstance(parms.AV, int)
+    assert parms.dur == 2.0
+    assert parms.F0.dtype == np.float64 and not parms.F0.flags.writeable
+    assert parms.FF.shape == (1, 2)
+    assert parms.window_type == "hanning"
+    parms.F0 = 110
+    assert parms.F0 == 110.0 and isinstance(parms.F0, float)
+
+def test_parameters_reject_unknown():
+    with pytest.raises(ValueError):
+        TDD.Parameters(window_type="kaiser")
+    with pytest.raises(AttributeError):
+        TDD.Parameters().replace(no_such_field=1)
+
+def test_parameters_replace():
+    parms = TDD.Parameters()
+    other = parms.replace(dur=2, nformant=4)
+    assert other.dur == 2.0 and other.nformant == 4
+    assert parms.dur == 1.0 and parms.nformant == 5
+    assert other.FF is parms.FF
+
+def test_parameters_digest():
+    parms = TDD.Parameters()
+    digest = parms.digest
+    assert TDD.Parameters().digest == digest
+    assert copy.deepcopy(parms).digest == digest
+    assert pickle.loads(pickle.dumps(parms)).digest == digest
+    assert parms.replace(FF=[500, 1500, 2500, 3500, 4501]).digest != digest
+    parms.AV = 10
+    assert parms.digest != digest
+##### End Parameters #####
+
+
+##### Sound #####
+def test_sound_waveform_is_read_only_copy():
+    samples = np.ones(100)
+    sound = TDD.Sound(samples, 10000)
+    assert not sound.waveform.flags.writeable
+    samples[0] = 5
+    assert sound.waveform[0] == 1
+    assert sound.nsamples == 100 and sound.dur == 0.01
+
+def test_sound_derived_values_cached():
+    sound = TDD.Sound(np.array([[0.5, -1.5], [0.25, 0.75]]), 10000,
+                      nchannels=2)
+    assert np.allclose(sound.mono, [-0.5, 0.5])
+    assert sound.peak == 1.5
+    assert np.isclose(sound.rms, 0.5)
+    assert np.allclose(sound.normalized, [-1/3, 1/3])
+    assert sound.normalized is sound.normalized
+    lows, highs = sound.envelope(1)
+    assert lows[0] == -0.5 and highs[0] == 0.5
+
+def test_sound_analysis_cache():
+    sound = TDD.Sound(np.arange(10.0), 10000)
+    calls = []
+    def compute(s):
+        calls.append(1)
+        return(s.nsamples)
+    assert sound.analysis("n") is None
+    assert sound.analysis("n", compute) == 10
+    assert sound.analysis("n", compute) == 10
+    assert len(calls) == 1
+    sound.store("other", 3)
+    assert sound.analysis("other") == 3
+
+def test_sound_cache_cleared_on_new_waveform():
+    sound = TDD.Sound(np.ones(10), 10000)
+    assert sound.peak == 1
+    sound.store("other", 3)
+    sound.waveform = 2*np.ones(20)
+    assert sound.peak == 2
+    assert sound.analysis("other") is None
+    assert sound.nsamples == 20
+
+def test_sound_uses_read_only_arrays_as_is():
+    samples = np.ones(10, dtype=np.float32)
+    samples.flags.writeable = False
+    assert TDD.Sound(samples, 10000).waveform is samples
+##### End Sound #####
+
+
+def test_snapshot_is_frozen_copy():
+    session = TDD.Session()
+    snapshot = session.snapshot()
+    session.tracks.setPoints(0, [3], 700)
+    assert snapshot.tracks.points[0, 3] == 500
+    assert snapshot.loaded_sound is session.loaded_sound
+    with pytest.raises(AttributeError):
+        snapshot.parms = None
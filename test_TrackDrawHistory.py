@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of undo and redo of track edits in TrackDrawHistory.
+"""
+
+import numpy as np
+import pytest
+
+import TrackDrawData as TDD
+import TrackDrawHistory as TDH
+
+
+@pytest.fixture
+def session():
+    return(TDD.Session())
+
+@pytest.fixture
+def history():
+    return(TDH.EditHistory())
+
+def resolver(session):
+    return(lambda target: session.f0_track if target == "F0"
+           else session.tracks)
+
+def drag(session, history, trackNo, steps, target="FF"):
+    """ Edits a track as a mouse drag would, one setPoints() per event. """
+    tracks = session.f0_track if target == "F0" else session.tracks
+    for cols, value in steps:
+        replaced = tracks.setPoints(trackNo, cols, value)
+        history.record(target, trackNo, tracks[trackNo], replaced)
+    return(history.end())
+
+
+def test_drag_is_one_entry(session, history):
+    before = session.tracks.points.copy()
+    entry = drag(session, history, 1, [([10], 1200), ([11, 12], 1300),
+                                       ([30], 1700), ([10], 1400)])
+    assert len(entry) == 1
+    assert len(history.undoStack) == 1
+    after = session.tracks.points.copy()
+    history.undo(resolver(session))
+    assert np.array_equal(session.tracks.points, before)
+    history.redo(resolver(session))
+    assert np.array_equal(session.tracks.points, after)
+
+def test_undo_restores_detail_from_another_grid(session, history):
+    track = session.tracks[0]
+    session.tracks.changeNoPoints(400)
+    session.tracks.setPoints(0, np.arange(100, 200),
+                             500 + 50*np.sin(np.arange(100)))
+    detail = track.breakpoints(0, 1)
+    session.tracks.changeNoPoints(20)
+    drag(session, history, 0, [(slice(5, 12), 800)])
+    assert track.breakpoints(0, 1) != detail
+    history.undo(resolver(session))
+    assert track.breakpoints(0, 1) == detail
+
+def test_undo_redo_order(session, history):
+    drag(session, history, 0, [([5], 600)])
+    drag(session, history, 0, [([5], 700)])
+    drag(session, history, 0, [([6], 800)], target="F0")
+    undo = resolver(session)
+    history.undo(undo)
+    assert session.f0_track.points[0, 6] == 100
+    history.undo(undo)
+    assert session.tracks.points[0, 5] == 600
+    history.undo(undo)
+    assert session.tracks.points[0, 5] == 500
+    assert history.undo(undo) == []
+    history.redo(undo)
+    history.redo(undo)
+    assert session.tracks.points[0, 5] == 700
+    assert len(history.redoStack) == 1
+
+def test_new_edit_clears_redo(session, history):
+    drag(session, history, 0, [([5], 600)])
+    history.undo(resolver(session))
+    assert len(history.redoStack) == 1
+    drag(session, history, 0, [([5], 650)])
+    assert len(history.redoStack) == 0
+
+def test_switching_tracks_ends_pending_entry(session, history):
+    for trackNo in (0, 1):
+        replaced = session.tracks.setPoints(trackNo, [3], 1000 + trackNo)
+        history.record("FF", trackNo, session.tracks[trackNo], replaced)
+    history.end()
+    assert len(history.undoStack) == 2
+
+def test_empty_drag_not_recorded(session, history):
+    assert drag(session, history, 0, [([], 600)]) is None
+    assert history.end() is None
+    assert len(history.undoStack) == 0
+
+def test_record_tracks(session, history):
+    old = session.tracks.copy()
+    session.tracks.setPoints(2, slice(None), 2000)
+    session.tracks.setPoints(3, [7], 3000)
+    history.recordTracks("FF", old, session.tracks)
+    assert len(history.undoStack) == 1
+    assert len(history.undoStack[0]) == 2
+    history.undo(resolver(session))
+    assert np.array_equal(session.tracks.points, old.points)
+
+def test_record_tracks_of_other_shape_clears(session, history):
+    drag(session, history, 0, [([5], 600)])
+    old = session.tracks.copy()
+    session.tracks.changeNoTracks(4, [])
+    history.recordTracks("FF", old, session.tracks)
+    assert len(history.undoStack) == 0
+
+def test_stale_history_cleared(session, history):
+    drag(session, history, 4, [([5], 4000)])
+    session.tracks.changeNoTracks(3, [])
+    assert history.undo(resolver(session)) == []
+    assert len(history.undoStack) == len(history.redoStack) == 0
+
+def test_max_entries():
+    session = TDD.Session()
+    history = TDH.EditHistory(max_entries=3)
+    for value in range(600, 1100, 100):
+        drag(session, history, 0, [([5], value)])
+    assert len(history.undoStack) == 3
+    for _ in range(5):
+        history.undo(resolver(session))
+    assert session.tracks.points[0, 5] == 700
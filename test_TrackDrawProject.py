@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of saving, journaling and reopening projects with TrackDrawProject.
+"""
+
+import os
+import numpy as np
+import pytest
+
+import TrackDrawData as TDD
+import TrackDrawHistory as TDH
+import TrackDrawProject as TDP
+
+
+@pytest.fixture
+def session():
+    session = TDD.Session()
+    rng = np.random.RandomState(0)
+    session.loaded_sound = TDD.Sound(rng.randn(12345), 10000)
+    session.synth_sound = TDD.Sound(rng.randn(5000, 2), 10000, nchannels=2)
+    return(session)
+
+@pytest.fixture
+def path(tmp_path):
+    return(str(tmp_path/"test.tdp"))
+
+def save(path, session):
+    project = TDP.Project(path)
+    project.create()
+    project.save(session.snapshot(), project.seq)
+    return(project)
+
+def edit(session, history, project, trackNo, cols, value):
+    """ Makes an undoable edit and journals it, as the GUI does. """
+    replaced = session.tracks.setPoints(trackNo, cols, value)
+    history.record("FF", trackNo, session.tracks[trackNo], replaced)
+    entry = history.end()
+    return(project.append([TDP.editRecord(e) for e in entry],
+                          session.parms))
+
+def assert_same(session, other):
+    assert other.parms.digest == session.parms.digest
+    for name in ("tracks", "f0_track"):
+        tracks, others = getattr(session, name), getattr(other, name)
+        assert others.track_npoints == tracks.track_npoints
+        assert [t.breakpoints(0, 1) for t in others] \
+               == [t.breakpoints(0, 1) for t in tracks]
+    for name in TDP.SOUNDS:
+        sound, others = getattr(session, name), getattr(other, name)
+        assert others.fs == sound.fs and others.nchannels == sound.nchannels
+        assert np.array_equal(others.waveform, sound.waveform)
+
+
+def test_save_and_open(path, session):
+    session.tracks.setPoints(1, [3, 4], 1700)
+    save(path, session).close()
+    project, opened = TDP.Project.open(path)
+    assert_same(session, opened)
+    # Mapped, not read into memory
+    assert isinstance(opened.loaded_sound.waveform.base, np.memmap)
+    project.close()
+
+def test_journal_replay(path, session):
+    history = TDH.EditHistory()
+    project = save(path, session)
+    edit(session, history, project, 0, [5, 6], 650)
+    edit(session, history, project, 2, slice(10, 40), 2200)
+    for entry in history.undo(lambda target: session.tracks):
+        project.append([TDP.editRecord(entry, 0)])
+    session.parms = session.parms.replace(AV=55)
+    project.append([], session.parms)
+    session.f0_track.setPoints(0, [0], 140)
+    project.append([TDP.tracksRecord("F0", session.f0_track)])
+    seq = project.seq
+    project.close()
+    project, opened = TDP.Project.open(path)
+    assert project.seq == seq
+    assert_same(session, opened)
+    project.close()
+
+def test_incomplete_record_dropped(path, session):
+    history = TDH.EditHistory()
+    project = save(path, session)
+    edit(session, history, project, 0, [5], 650)
+    project.close()
+    with open(path + ".journal", "a") as f:
+        f.write('{"op": "edit", "seq": 2, "tar')
+    project, opened = TDP.Project.open(path)
+    assert_same(session, opened)
+    edit(opened, history, project, 0, [6], 660)
+    project.close()
+    project, reopened = TDP.Project.open(path)
+    assert_same(opened, reopened)
+    project.close()
+
+def test_compaction(path, session):
+    history = TDH.EditHistory()
+    project = save(path, session)
+    project.compact_bytes = 1000
+    full = False
+    while not full:
+        full = edit(session, history, project, 0, [5],
+                    session.tracks.points[0, 5] + 1)
+    project.compact(session.snapshot(), project.seq)
+    assert os.path.getsize(path + ".journal") == 0
+    edit(session, history, project, 1, [7], 1600)
+    project.close()
+    project, opened = TDP.Project.open(path)
+    assert_same(session, opened)
+    project.close()
+
+def test_audio_generations(path, session):
+    project = save(path, session)
+    first = project.audio_path
+    project.save(session.snapshot(), project.seq)
+    assert project.audio_path == first
+    session.synth_sound = TDD.Sound(np.ones(100), 10000)
+    project.save(session.snapshot(), project.seq)
+    assert project.audio_path != first
+    assert not os.path.exists(first)
+    project.close()
+    stray = project.generationPath(99)
+    open(stray, "wb").close()
+    project, opened = TDP.Project.open(path)
+    assert not os.path.exists(stray)
+    assert_same(session, opened)
+    project.close()
+
+def test_open_errors(path, session):
+    with pytest.raises(TDP.ProjectError):
+        TDP.Project.open(path)
+    with open(path, "w") as f:
+        f.write('{"version": ' + str(TDP.FORMAT_VERSION + 1) + '}')
+    with pytest.raises(TDP.ProjectError):
+        TDP.Project.open(path)